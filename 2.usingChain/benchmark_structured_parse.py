@@ -0,0 +1,96 @@
+"""
+Parse overhead per response: with_structured_output() parsers vs structured_stream.py.
+
+Canned Code answers of several sizes are split into chunks of about one token (4 characters)
+and parsed the way each approach does it, without any model call:
+- PydanticToolsParser, streamed: what with_structured_output(Code, method="function_calling")
+  runs on every chunk (re-parse of the accumulated JSON + pydantic validation)
+- StreamingStructuredOutput, streamed: incremental decoding of `code`, one validation at the end
+  (function_calling: tool-call argument chunks; json_schema: content chunks)
+- complete (non-streamed) messages: PydanticToolsParser.invoke() vs parse_message()
+
+No API key is needed.
+
+    uv run benchmark_structured_parse.py --sizes 200 1000 4000 --repeat 50
+"""
+import argparse
+import json
+import statistics
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.output_parsers.openai_tools import PydanticToolsParser
+
+from main_lcel import Code
+from structured_stream import StreamingStructuredOutput
+from test_structured_stream import FakeToolCallChatModel
+
+
+def make_code(size: int) -> str:
+    line = '    print("value:", i, "\\tdone")  # a typical line of generated code\n'
+    return ("def print_numbers():\n" + line * (size // len(line) + 1))[:size]
+
+
+def tool_call_chunks(arguments: str, chunk_size: int) -> list[AIMessageChunk]:
+    return [
+        AIMessageChunk(content="", tool_call_chunks=[{
+            "name": "Code" if start == 0 else None,
+            "args": arguments[start:start + chunk_size],
+            "id": "call_0" if start == 0 else None,
+            "index": 0,
+        }])
+        for start in range(0, len(arguments), chunk_size)
+    ]
+
+
+def content_chunks(arguments: str, chunk_size: int) -> list[AIMessageChunk]:
+    return [AIMessageChunk(content=arguments[start:start + chunk_size]) for start in range(0, len(arguments), chunk_size)]
+
+
+def time_us(function, repeat: int) -> float:
+    """Median wall time of `function` in microseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structured output parse overhead per response")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 4000], help="Characters of code")
+    parser.add_argument("--chunk-size", type=int, default=4, help="Characters per streamed chunk (about a token)")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    tools_parser = PydanticToolsParser(tools=[Code], first_tool_only=True)
+    fake = FakeToolCallChatModel(responses=[{"code": ""}])
+    streaming_tools = StreamingStructuredOutput(fake, Code, field="code", method="function_calling")
+    streaming_json = StreamingStructuredOutput(fake, Code, field="code", method="json_schema")
+
+    print(f"{'code chars':>10} {'chunks':>7} {'PydanticToolsParser':>20} {'incremental tools':>18} "
+          f"{'incremental json':>17} {'complete: tools parser':>23} {'complete: incremental':>22}   (µs per response)")
+    for size in args.sizes:
+        code = make_code(size)
+        arguments = json.dumps({"code": code})
+        tools_stream = tool_call_chunks(arguments, args.chunk_size)
+        json_stream = content_chunks(arguments, args.chunk_size)
+        message = AIMessage(content="", tool_calls=[{"name": "Code", "args": {"code": code}, "id": "call_0"}])
+
+        # Every approach has to end with the same validated object
+        assert list(tools_parser.transform(iter(tools_stream)))[-1] == Code(code=code)
+        assert list(streaming_tools.parse_chunks(iter(tools_stream)))[-1] == Code(code=code)
+        assert list(streaming_json.parse_chunks(iter(json_stream)))[-1] == Code(code=code)
+
+        baseline = time_us(lambda: list(tools_parser.transform(iter(tools_stream))), args.repeat)
+        incremental_tools = time_us(lambda: list(streaming_tools.parse_chunks(iter(tools_stream))), args.repeat)
+        incremental_json = time_us(lambda: list(streaming_json.parse_chunks(iter(json_stream))), args.repeat)
+        complete_baseline = time_us(lambda: tools_parser.invoke(message), args.repeat)
+        complete_incremental = time_us(lambda: streaming_tools.parse_message(message), args.repeat)
+        print(f"{size:>10} {len(tools_stream):>7} {baseline:>20.0f} {incremental_tools:>18.0f} "
+              f"{incremental_json:>17.0f} {complete_baseline:>23.0f} {complete_incremental:>22.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+The generate -> check pipeline as one composable runnable.
+
+simple_chain_function used to call generate_code_chain.invoke() and then
+code_check_chain.invoke() inside a RunnableLambda. LCEL only saw one opaque function, so
+there was no async, no batching and no streaming of the inner calls. create_code_pipeline()
+builds the same pipeline out of RunnablePassthrough.assign() steps instead:
+
+- invoke/ainvoke/batch/abatch/astream_events all work, and every inner call is visible
+- the test generation starts as soon as the generated code is complete
+- the two stages are tagged "generate_code" and "check_code", so astream_events() can tell
+  their tokens apart (see main_stream.py)
+
+    pipeline = create_code_pipeline(generate_code_chain, code_check_chain)
+    result = pipeline.invoke({"language": "python", "task": "print 10 numbers"})
+    result["generated"], result["checked"]
+"""
+from typing import Any, Callable
+
+from langchain_core.runnables import Runnable, RunnableLambda, RunnablePassthrough
+
+GENERATE_TAG = "generate_code"
+CHECK_TAG = "check_code"
+
+
+def create_code_pipeline(
+    generate_code_chain: Runnable,
+    code_check_chain: Runnable,
+    get_code: Callable[[Any], str] = lambda generated: generated.code
+) -> Runnable:
+    """{"language", "task"} -> {"language", "task", "generated", "checked"}
+
+    get_code extracts the code from the output of generate_code_chain: .code for the
+    Pydantic Code model (default), .content for a plain message, the string itself after
+    StrOutputParser.
+    """
+
+    def extract_code_and_add_language(data):
+        """Extract code from the first chain and add language for the second chain"""
+        return {
+            "code": get_code(data["generated"]),
+            "language": data["language"]
+        }
+
+    return (
+        RunnablePassthrough.assign(
+            generated=generate_code_chain.with_config(run_name=GENERATE_TAG, tags=[GENERATE_TAG])
+        )
+        | RunnablePassthrough.assign(
+            checked=(RunnableLambda(extract_code_and_add_language) | code_check_chain).with_config(
+                run_name=CHECK_TAG, tags=[CHECK_TAG]
+            )
+        )
+    ).with_config(run_name="code_pipeline")
@@ -0,0 +1,308 @@
+"""
+Deduplicated LLM calls: in-flight coalescing and an exact-match response cache with TTL.
+
+main_lcel.main() runs the same (language, task) through Method 1, Method 2 and the manual
+path: six LLM calls for the same two results. This module removes the repeats:
+
+- CoalescingRunnable wraps a sub-chain (prompt | model). Concurrent calls with the same
+  input share one upstream call (invoke, ainvoke, batch; stream joins a call in flight).
+  With max_results > 0, repeated calls also get the result of the earlier one, kept in a
+  bounded in-process LRU for result_ttl seconds. Failures are never shared with later
+  callers, and a cancelled caller does not cancel the call for the others.
+- SQLiteTTLCache is a LangChain BaseCache. Every chat model call is looked up by the exact
+  prompt plus model parameters (model, temperature, tools, ...), so results survive between
+  runs until they are older than the TTL. Use it for temperature=0 calls only, where the
+  same request is expected to give the same answer.
+
+    set_llm_cache(SQLiteTTLCache(".llm_cache.db", ttl=24 * 3600))
+    generate_code_chain = CoalescingRunnable(code_prompt | llm.with_structured_output(Code), max_results=128, result_ttl=600)
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+def _generation_to_dict(generation: Generation) -> dict:
+    if isinstance(generation, ChatGeneration):
+        return {"message": message_to_dict(generation.message), "generation_info": generation.generation_info}
+    return {"text": generation.text, "generation_info": generation.generation_info}
+
+
+def _generation_from_dict(data: dict) -> Generation:
+    if "message" in data:
+        return ChatGeneration(message=messages_from_dict([data["message"]])[0], generation_info=data["generation_info"])
+    return Generation(text=data["text"], generation_info=data["generation_info"])
+
+
+def _input_key(value: Any) -> str:
+    # Prompt inputs are dicts of strings; anything else falls back to its repr
+    return json.dumps(value, sort_keys=True, default=repr)
+
+
+class CoalescingRunnable(Runnable):
+    """
+    Shares one call of the wrapped runnable between identical concurrent inputs, and
+    optionally (max_results > 0) between repeated ones within result_ttl seconds
+    """
+
+    def __init__(self, runnable: Runnable, max_results: int = 0, result_ttl: Optional[float] = None):
+        self.runnable = runnable
+        self.max_results = max_results
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+        # key -> (expires at, or None for never, result)
+        self._results: OrderedDict[str, tuple[Optional[float], Any]] = OrderedDict()
+        self._in_flight: dict[str, Future] = {}
+        # key -> [upstream task, callers waiting for it]
+        self._in_flight_async: dict[str, list] = {}
+        self.calls = 0
+        self.shared = 0
+
+    @property
+    def InputType(self):
+        return self.runnable.InputType
+
+    @property
+    def OutputType(self):
+        return self.runnable.OutputType
+
+    def _cached(self, key: str):
+        """(True, result) for a completed earlier call that has not expired; caller holds the lock"""
+        entry = self._results.get(key)
+        if entry is None:
+            return False, None
+        expires_at, result = entry
+        if expires_at is not None and time.monotonic() > expires_at:
+            del self._results[key]
+            return False, None
+        self._results.move_to_end(key)
+        self.shared += 1
+        return True, result
+
+    def _remember(self, key: str, result: Any):
+        if self.max_results <= 0:
+            return
+        expires_at = time.monotonic() + self.result_ttl if self.result_ttl is not None else None
+        with self._lock:
+            self._results[key] = (expires_at, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        key = _input_key(input)
+        with self._lock:
+            found, result = self._cached(key)
+            if found:
+                return result
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not owner:
+            return future.result()
+
+        try:
+            result = self.runnable.invoke(input, config, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self._remember(key, result)
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        key = _input_key(input)
+        with self._lock:
+            found, result = self._cached(key)
+            if found:
+                return result
+            in_flight = self._in_flight_async.get(key)
+            if in_flight is None:
+                # The upstream call is its own task: it belongs to no caller, so cancelling
+                # one caller does not cancel it for the others
+                task = asyncio.get_running_loop().create_task(self._aupstream(key, input, config, **kwargs))
+                in_flight = self._in_flight_async[key] = [task, 0]
+                self.calls += 1
+            else:
+                self.shared += 1
+            in_flight[1] += 1
+        task = in_flight[0]
+        try:
+            return await asyncio.shield(task)
+        finally:
+            with self._lock:
+                in_flight[1] -= 1
+                abandoned = in_flight[1] == 0 and not task.done()
+            # The last caller gave up (cancelled): nobody wants the result anymore
+            if abandoned:
+                task.cancel()
+
+    async def _aupstream(self, key: str, input: Any, config: Optional[RunnableConfig], **kwargs: Any) -> Any:
+        try:
+            result = await self.runnable.ainvoke(input, config, **kwargs)
+            self._remember(key, result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight_async.pop(key, None)
+
+    def batch(self, inputs: list[Any], config=None, *, return_exceptions: bool = False, **kwargs: Any) -> list[Any]:
+        """Identical inputs in one batch are called once"""
+        keys = [_input_key(value) for value in inputs]
+        first = {}
+        for position, key in enumerate(keys):
+            first.setdefault(key, position)
+        unique = list(first.values())
+        configs = config if isinstance(config, list) else None
+        results = super().batch(
+            [inputs[position] for position in unique],
+            [configs[position] for position in unique] if configs is not None else config,
+            return_exceptions=return_exceptions,
+            **kwargs
+        )
+        by_key = {keys[position]: result for position, result in zip(unique, results)}
+        with self._lock:
+            self.shared += len(inputs) - len(unique)
+        return [by_key[key] for key in keys]
+
+    async def abatch(self, inputs: list[Any], config=None, *, return_exceptions: bool = False, **kwargs: Any) -> list[Any]:
+        # ainvoke already coalesces identical inputs that run concurrently
+        return await super().abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        """
+        A cached or in-flight result is returned as one chunk; otherwise the wrapped runnable
+        is streamed and its combined output is remembered like an invoke() result
+        """
+        key = _input_key(input)
+        with self._lock:
+            found, result = self._cached(key)
+            future = None if found else self._in_flight.get(key)
+            if future is not None:
+                self.shared += 1
+        if found:
+            yield result
+            return
+        if future is not None:
+            yield future.result()
+            return
+
+        with self._lock:
+            self.calls += 1
+        final = None
+        for chunk in self.runnable.stream(input, config, **kwargs):
+            yield chunk
+            final = _combine(final, chunk)
+        self._remember(key, final)
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """stream() for async code, joining calls in flight from ainvoke()"""
+        key = _input_key(input)
+        with self._lock:
+            found, result = self._cached(key)
+            joins = not found and key in self._in_flight_async
+        if found:
+            yield result
+            return
+        if joins:
+            yield await self.ainvoke(input, config, **kwargs)
+            return
+
+        with self._lock:
+            self.calls += 1
+        final = None
+        async for chunk in self.runnable.astream(input, config, **kwargs):
+            yield chunk
+            final = _combine(final, chunk)
+        self._remember(key, final)
+
+    def stats(self) -> dict:
+        return {"upstream_calls": self.calls, "shared": self.shared}
+
+
+def _combine(final: Any, chunk: Any) -> Any:
+    """Add streamed chunks up like Runnable.transform(); chunks that can't be added replace the last"""
+    if final is None:
+        return chunk
+    try:
+        return final + chunk
+    except TypeError:
+        return chunk
+
+
+class SQLiteTTLCache(BaseCache):
+    """Exact-match LLM response cache in SQLite; entries older than ttl seconds are misses"""
+
+    def __init__(self, database_path: str = ".llm_cache.db", ttl: float = 24 * 3600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(database_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    prompt TEXT NOT NULL,
+                    llm_string TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (prompt, llm_string)
+                )
+                """
+            )
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created_at FROM llm_cache WHERE prompt = ? AND llm_string = ?",
+                (prompt, llm_string)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [_generation_from_dict(generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        response = json.dumps([_generation_to_dict(generation) for generation in return_val], default=repr)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (prompt, llm_string, response, created_at) VALUES (?, ?, ?, ?)",
+                (prompt, llm_string, response, time.time())
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM llm_cache")
+
+    def purge_expired(self) -> int:
+        """Delete expired entries; returns how many were removed"""
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
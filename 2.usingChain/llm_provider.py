@@ -0,0 +1,43 @@
+"""
+Chat model selection for the 2.usingChain scripts.
+
+MODEL_VENDOR=openai (the default) gives ChatOpenAI. MODEL_VENDOR=local gives the offline
+FakeChatModel from 4.context_with_embedding/local_providers.py: no API key or network,
+deterministic answers, streaming, tool calling / structured output, and a configurable
+latency (LOCAL_LLM_TTFT_MS, LOCAL_LLM_TOKENS_PER_SECOND, LOCAL_LLM_LATENCY, ...), so the
+pipelines can be load tested and benchmarked offline.
+
+    MODEL_VENDOR=local LOCAL_LLM_TTFT_MS=500 uv run main_batch.py --input tasks_example.jsonl
+"""
+import os
+import sys
+from typing import Any
+
+# The offline providers live in 4.context_with_embedding (like 3.memory_management's vector memory)
+LOCAL_PROVIDERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "4.context_with_embedding")
+if LOCAL_PROVIDERS_DIR not in sys.path:
+    sys.path.append(LOCAL_PROVIDERS_DIR)
+
+from local_providers import is_local_vendor, load_local_chat_model  # noqa: E402
+
+
+def api_key_missing() -> bool:
+    """Whether the selected vendor needs an OpenAI API key that is not set"""
+    return not is_local_vendor() and not os.getenv("OPENAI_API_KEY")
+
+
+def load_chat_model(model: str = "gpt-4o-mini", temperature: float = 0, **kwargs: Any):
+    """ChatOpenAI with these settings, or the local fake chat model with MODEL_VENDOR=local"""
+    if is_local_vendor():
+        return load_local_chat_model()
+    # Imported here: langchain_openai is the most expensive import of these scripts
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, temperature=temperature, **kwargs)
+
+
+def load_completion_model(model: str = "gpt-3.5-turbo-instruct", temperature: float = 0, **kwargs: Any):
+    """The OpenAI completion model used by the LLMChain scripts, or the local fake chat model with MODEL_VENDOR=local"""
+    if is_local_vendor():
+        return load_local_chat_model()
+    from langchain_openai import OpenAI
+    return OpenAI(model=model, temperature=temperature, **kwargs)
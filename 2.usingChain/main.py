@@ -1,8 +1,6 @@
-import os
 from dotenv import load_dotenv
-from langchain_openai import OpenAI
 from langchain_core.prompts import PromptTemplate
-from langchain.chains import LLMChain, SequentialChain
+from llm_provider import api_key_missing, load_completion_model
 
 load_dotenv()
 
@@ -19,15 +17,16 @@ code_check_prompt = PromptTemplate(
 
 def main():
     print("Hello from 2-usingchain!")
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+    if api_key_missing():
         print("⚠️  OpenAI API key not found!")
         print("Please set your OPENAI_API_KEY environment variable:")
         print("export OPENAI_API_KEY='your-api-key-here'")
         return
     
     try:
-        llm = OpenAI(model="gpt-3.5-turbo-instruct", temperature=0.2)
+        # Imported here, so a missing API key is reported without loading the OpenAI SDK
+        from langchain.chains import LLMChain, SequentialChain
+        llm = load_completion_model(model="gpt-3.5-turbo-instruct", temperature=0.2)
         code_chain = LLMChain(
             llm=llm, 
             prompt=code_prompt,
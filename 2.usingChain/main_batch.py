@@ -0,0 +1,125 @@
+"""
+Batch code generation: many (language, task) pairs through the generate -> test pipeline.
+
+main_lcel.py runs one --language/--task pair and waits for each call in turn. This script
+reads many pairs from a file and runs the whole pipeline with abatch_as_completed():
+- every item runs generate_code_chain and then code_check_chain on its own, so the test
+  call of an early item overlaps the generate calls of later items
+- at most --max-concurrency items are in flight at once, which keeps us under rate limits
+- results are written as JSONL as soon as each item finishes (in completion order, with
+  the item's input index), so a failure in one item does not lose the others
+
+Input file: JSONL ({"language": "Python", "task": "print 10 numbers"} per line) or CSV
+with a language,task header.
+
+    uv run main_batch.py --input tasks.jsonl --output results.jsonl --max-concurrency 16
+"""
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+
+from dotenv import load_dotenv
+from langchain_core.prompts import PromptTemplate
+from pydantic import BaseModel
+
+from code_pipeline import create_code_pipeline
+from llm_provider import api_key_missing, load_chat_model
+from structured_stream import StreamingStructuredOutput
+
+load_dotenv()
+
+
+# Define the models
+class Code(BaseModel):
+    code: str
+
+class CodeCheck(BaseModel):
+    final_code: str
+
+code_prompt = PromptTemplate(
+    input_variables=["language", "task"],
+    template="Write a very short {language} function that will {task}"
+)
+
+code_check_prompt = PromptTemplate(
+    input_variables=["language", "code"],
+    template="Write a test for the following {language} code:\n {code}"
+)
+
+
+def create_pipeline(llm):
+    """generate -> test for one {"language", "task"} item"""
+    # Same results as llm.with_structured_output(Code), validated once per response
+    generate_code_chain = code_prompt | StreamingStructuredOutput(llm, Code, field="code")
+    code_check_chain = code_check_prompt | StreamingStructuredOutput(llm, CodeCheck, field="final_code")
+    return create_code_pipeline(generate_code_chain, code_check_chain)
+
+
+def read_tasks(path: str) -> list[dict]:
+    """(language, task) pairs from a JSONL or CSV file"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return [{"language": row["language"].strip().lower(), "task": row["task"].strip().lower()} for row in rows]
+
+
+def to_record(index: int, item: dict, result) -> dict:
+    record = {"index": index, "language": item["language"], "task": item["task"]}
+    if isinstance(result, Exception):
+        record["error"] = f"{type(result).__name__}: {result}"
+    else:
+        record["code"] = result["generated"].code
+        record["test_code"] = result["checked"].final_code
+    return record
+
+
+async def run_batch(pipeline, tasks: list[dict], out, max_concurrency: int) -> int:
+    """Write one JSONL record per task as it completes; returns the number of failures"""
+    failures = 0
+    async for index, result in pipeline.abatch_as_completed(
+        tasks, config={"max_concurrency": max_concurrency}, return_exceptions=True
+    ):
+        record = to_record(index, tasks[index], result)
+        failures += "error" in record
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate code and tests for many (language, task) pairs")
+    parser.add_argument("--input", required=True, help="JSONL or CSV file with language and task")
+    parser.add_argument("--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--max-concurrency", type=int, default=16, help="Items in flight at the same time")
+    args = parser.parse_args()
+
+    if api_key_missing():
+        print("⚠️  OpenAI API key not found!", file=sys.stderr)
+        print("Please set your OPENAI_API_KEY environment variable:", file=sys.stderr)
+        print("export OPENAI_API_KEY='your-api-key-here'", file=sys.stderr)
+        return
+
+    tasks = read_tasks(args.input)
+    llm = load_chat_model(model="gpt-4o-mini", temperature=0, max_retries=6)
+    pipeline = create_pipeline(llm)
+
+    # Progress goes to stderr so stdout can carry the JSONL results
+    print(f"🔗 {len(tasks)} task(s), up to {args.max_concurrency} at a time...", file=sys.stderr)
+    start = time.perf_counter()
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        failures = asyncio.run(run_batch(pipeline, tasks, out, args.max_concurrency))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ {len(tasks) - failures} done, {failures} failed in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,26 @@
-import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel
-from langchain.chains import LLMChain
+from langchain_core.globals import set_llm_cache
 import argparse
 
+from llm_dedup import CoalescingRunnable, SQLiteTTLCache
+from llm_provider import api_key_missing, load_chat_model
+from structured_stream import StreamingStructuredOutput
+
 load_dotenv()
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--language", type=str, default="Python")
-parser.add_argument("--task", type=str, default="print 10 numbers")
-args = parser.parse_args()
-args.language = args.language.lower()
-args.task = args.task.lower()
+def parse_args():
+    # Parsed in main(), not at import time, so importing this module has no side effects
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--language", type=str, default="Python")
+    parser.add_argument("--task", type=str, default="print 10 numbers")
+    parser.add_argument("--cache-ttl", type=float, default=0,
+                        help="Cache identical LLM responses in SQLite for this many seconds (0 = off)")
+    args = parser.parse_args()
+    args.language = args.language.lower()
+    args.task = args.task.lower()
+    return args
 
 
 # Define the models
@@ -36,42 +43,39 @@ code_check_prompt = PromptTemplate(
 
 
 def main():
+    args = parse_args()
     print("Hello from 2-usingchain!")
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+    if api_key_missing():
         print("⚠️  OpenAI API key not found!")
         print("Please set your OPENAI_API_KEY environment variable:")
         print("export OPENAI_API_KEY='your-api-key-here'")
         return
     
     try:
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+        if args.cache_ttl > 0:
+            # Exact-match cache across runs; only sensible because temperature=0
+            set_llm_cache(SQLiteTTLCache(".llm_cache.db", ttl=args.cache_ttl))
+        llm = load_chat_model(model="gpt-4o-mini", temperature=0)
         # Instead of this.
         # code_chain = LLMChain(llm=llm, prompt=code_prompt)
         # The more modern way is to use LCEL
         # Create individual chains first
-        generate_code_chain = code_prompt | llm.with_structured_output(Code)
-        code_check_chain = code_check_prompt | llm.with_structured_output(CodeCheck)
+        # Method 1, Method 2 and the manual path send the same inputs: identical calls
+        # share one upstream request instead of being re-sent (results kept for 10 minutes).
+        # StreamingStructuredOutput returns the same objects as with_structured_output(Code),
+        # validated once instead of re-parsed on every chunk (see structured_stream.py)
+        generate_code_chain = CoalescingRunnable(code_prompt | StreamingStructuredOutput(llm, Code, field="code"),
+                                                 max_results=16, result_ttl=600)
+        code_check_chain = CoalescingRunnable(code_check_prompt | StreamingStructuredOutput(llm, CodeCheck, field="final_code"),
+                                              max_results=16, result_ttl=600)
         
         # Import required classes for chaining
         from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+        from code_pipeline import create_code_pipeline
         
-        # Method 1: Simple Chaining with RunnableLambda
-        def simple_chain_function(inputs):
-            """Simple function to chain the operations into a single runnable"""
-            # Execute first chain: Generate code
-            code_result = generate_code_chain.invoke(inputs)
-            # Execute second chain: Check/test the generated code
-            test_result = code_check_chain.invoke({
-                "code": code_result.code,
-                "language": inputs["language"]
-            })
-            return {
-                "original_code": code_result.code,
-                "test_code": test_result.final_code
-            }
-        
-        simple_chain = RunnableLambda(simple_chain_function)
+        # Method 1: Composable pipeline (generate -> check) built from LCEL steps,
+        # so invoke/ainvoke/batch/astream_events all see both inner calls
+        simple_chain = create_code_pipeline(generate_code_chain, code_check_chain)
         
         # Method 2: Complex Chaining with RunnablePassthrough
         def extract_code_and_add_language(data):
@@ -88,10 +92,10 @@ def main():
         )
         
         # Execute different chaining methods
-        print("🔗 Method 1: Simple chaining with RunnableLambda...")
+        print("🔗 Method 1: Composable pipeline (create_code_pipeline)...")
         result1 = simple_chain.invoke({"language": args.language, "task": args.task})
-        print(f"📝 Original Code: {result1['original_code']}")
-        print(f"🧪 Test Code: {result1['test_code']}")
+        print(f"📝 Original Code: {result1['generated'].code}")
+        print(f"🧪 Test Code: {result1['checked'].final_code}")
         
         print("\n" + "="*50)
         print("🔗 Method 2: Complex chaining with RunnablePassthrough...")
@@ -107,6 +111,10 @@ def main():
         
         step2 = code_check_chain.invoke({"code": step1.code, "language": args.language})
         print(f"🧪 Test Code: {step2.final_code}")
+        
+        print("\n" + "="*50)
+        print(f"♻️  Generate calls: {generate_code_chain.stats()}")
+        print(f"♻️  Check calls: {code_check_chain.stats()}")
     except Exception as e:
         print(f"❌ Error: {e}")
 
@@ -1,16 +1,23 @@
-import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from langchain_core.globals import set_llm_cache
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 import argparse
 
+from code_pipeline import create_code_pipeline
+from llm_dedup import CoalescingRunnable, SQLiteTTLCache
+from llm_provider import api_key_missing, load_chat_model
+
 load_dotenv()
 
-parser = argparse.ArgumentParser()
-parser.add_argument("--language", type=str, default="Python")
-parser.add_argument("--task", type=str, default="print 10 numbers")
-args = parser.parse_args()
+def parse_args():
+    # Parsed in main(), not at import time, so importing this module has no side effects
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--language", type=str, default="Python")
+    parser.add_argument("--task", type=str, default="print 10 numbers")
+    parser.add_argument("--cache-ttl", type=float, default=0,
+                        help="Cache identical LLM responses in SQLite for this many seconds (0 = off)")
+    return parser.parse_args()
 
 # Simple prompts without Pydantic parsers
 code_prompt = PromptTemplate(
@@ -24,37 +31,31 @@ code_check_prompt = PromptTemplate(
 )
 
 def main():
+    args = parse_args()
     print("Hello from simplified version!")
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+    if api_key_missing():
         print("⚠️  OpenAI API key not found!")
         print("Please set your OPENAI_API_KEY environment variable:")
         print("export OPENAI_API_KEY='your-api-key-here'")
         return
     
     try:
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+        if args.cache_ttl > 0:
+            # Exact-match cache across runs; only sensible because temperature=0
+            set_llm_cache(SQLiteTTLCache(".llm_cache.db", ttl=args.cache_ttl))
+        llm = load_chat_model(model="gpt-4o-mini", temperature=0)
         
         # Simple chains without structured output
-        generate_code_chain = code_prompt | llm
-        code_check_chain = code_check_prompt | llm
-        
-        # Method 1: Simple chaining with RunnableLambda
-        def simple_chain_function(inputs):
-            """Simple function to chain the operations"""
-            # Execute first chain: Generate code
-            code_result = generate_code_chain.invoke(inputs)
-            # Execute second chain: Check/test the generated code
-            test_result = code_check_chain.invoke({
-                "code": code_result.content,  # Note: .content instead of .code
-                "language": inputs["language"]
-            })
-            return {
-                "original_code": code_result.content,
-                "test_code": test_result.content
-            }
+        # Identical calls share one upstream request instead of being re-sent (results kept for 10 minutes)
+        generate_code_chain = CoalescingRunnable(code_prompt | llm, max_results=16, result_ttl=600)
+        code_check_chain = CoalescingRunnable(code_check_prompt | llm, max_results=16, result_ttl=600)
         
-        simple_chain = RunnableLambda(simple_chain_function)
+        # Method 1: Composable pipeline (generate -> check) built from LCEL steps
+        simple_chain = create_code_pipeline(
+            generate_code_chain,
+            code_check_chain,
+            get_code=lambda generated: generated.content  # Note: .content instead of .code
+        )
         
         # Method 2: Complex chaining with RunnablePassthrough
         def extract_code_and_add_language(data):
@@ -71,10 +72,10 @@ def main():
         )
         
         # Execute different approaches
-        print("🔗 Method 1: Simple chaining (WITHOUT Pydantic)...")
+        print("🔗 Method 1: Composable pipeline (WITHOUT Pydantic)...")
         result1 = simple_chain.invoke({"language": args.language, "task": args.task})
-        print(f"📝 Original Code: {result1['original_code']}")
-        print(f"🧪 Test Code: {result1['test_code']}")
+        print(f"📝 Original Code: {result1['generated'].content}")
+        print(f"🧪 Test Code: {result1['checked'].content}")
         
         print("\n" + "="*50)
         print("🔗 Method 2: Complex chaining (WITHOUT Pydantic)...")
@@ -91,6 +92,10 @@ def main():
         step2 = code_check_chain.invoke({"code": step1.content, "language": args.language})
         print(f"🧪 Test Code: {step2.content}")
         
+        print("\n" + "="*50)
+        print(f"♻️  Generate calls: {generate_code_chain.stats()}")
+        print(f"♻️  Check calls: {code_check_chain.stats()}")
+        
     except Exception as e:
         print(f"❌ Error: {e}")
 
@@ -0,0 +1,92 @@
+"""
+Stream the generated code while the pipeline runs, and measure time to first output.
+
+Uses create_code_pipeline() from code_pipeline.py with plain text chains (like
+main_simple.py), so the model's tokens can be shown as they arrive:
+- the generated code is printed token by token
+- the test generation starts as soon as the code is complete, and its tokens follow
+- astream_events() timestamps: time to first code token, code complete, time to first
+  test token, total
+
+    uv run main_stream.py --language Python --task "calculate factorial"
+"""
+import argparse
+import asyncio
+import time
+
+from dotenv import load_dotenv
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from code_pipeline import CHECK_TAG, GENERATE_TAG, create_code_pipeline
+from llm_provider import api_key_missing, load_chat_model
+
+load_dotenv()
+
+code_prompt = PromptTemplate(
+    input_variables=["language", "task"],
+    template="Write a very short {language} function that will {task}"
+)
+
+code_check_prompt = PromptTemplate(
+    input_variables=["language", "code"],
+    template="Write a test for the following {language} code:\n{code}"
+)
+
+
+def create_streaming_pipeline(llm):
+    generate_code_chain = code_prompt | llm | StrOutputParser()
+    code_check_chain = code_check_prompt | llm | StrOutputParser()
+    return create_code_pipeline(generate_code_chain, code_check_chain, get_code=lambda generated: generated)
+
+
+async def stream_pipeline(pipeline, inputs: dict) -> dict:
+    """Print both stages' tokens as they arrive; returns the timings in seconds"""
+    start = time.perf_counter()
+    timings = {}
+    stage = None
+    async for event in pipeline.astream_events(inputs, version="v2"):
+        now = time.perf_counter() - start
+        tags = event.get("tags", [])
+        if event["event"] == "on_chat_model_stream":
+            current = GENERATE_TAG if GENERATE_TAG in tags else CHECK_TAG
+            if current != stage:
+                stage = current
+                timings.setdefault(f"first {stage} token", now)
+                print("\n📝 Generated Code:\n" if stage == GENERATE_TAG else "\n\n🧪 Test Code:\n")
+            print(event["data"]["chunk"].content, end="", flush=True)
+        elif event["event"] == "on_chain_end" and event["name"] == GENERATE_TAG:
+            timings["code complete"] = now
+    timings["total"] = time.perf_counter() - start
+    print()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--language", type=str, default="Python")
+    parser.add_argument("--task", type=str, default="print 10 numbers")
+    args = parser.parse_args()
+
+    print("Hello from the streaming version!")
+    if api_key_missing():
+        print("⚠️  OpenAI API key not found!")
+        print("Please set your OPENAI_API_KEY environment variable:")
+        print("export OPENAI_API_KEY='your-api-key-here'")
+        return
+
+    try:
+        llm = load_chat_model(model="gpt-4o-mini", temperature=0)
+        pipeline = create_streaming_pipeline(llm)
+        timings = asyncio.run(stream_pipeline(pipeline, {"language": args.language, "task": args.task}))
+
+        print("\n" + "="*50)
+        print("⏱️  Timings:")
+        for name, seconds in timings.items():
+            print(f"   {name:<24} {seconds:6.2f}s")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
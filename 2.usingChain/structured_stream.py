@@ -0,0 +1,235 @@
+"""
+Streaming structured output for single-string models like Code and CodeCheck.
+
+llm.with_structured_output(Code) asks ChatOpenAI for a JSON answer (method="json_schema",
+the default) or binds Code as a tool (method="function_calling"). Neither parser streams
+the code: the json_schema parser waits for the complete message, and PydanticToolsParser
+re-parses the whole accumulated JSON (partial JSON repair included) and re-validates it with
+pydantic on every chunk, so a response of n chunks costs O(n^2).
+
+StreamingStructuredOutput supports both methods and works incrementally:
+- IncrementalFieldParser decodes one string field of the JSON as the text arrives, so the
+  generated code can be shown while it is being written
+- the complete JSON is validated once at the end with the model's compiled pydantic
+  validator (model_validate_json), not once per chunk
+
+    generate_code = code_prompt | StreamingStructuredOutput(llm, Code, field="code")
+    for partial in generate_code.stream({"language": "python", "task": "print 10 numbers"}):
+        print(partial.code)                  # grows as tokens arrive; the last one is validated
+    code = generate_code.invoke(inputs)      # Code, like with_structured_output(Code)
+
+See benchmark_structured_parse.py for the per-response overhead of both parsers and
+test_structured_stream.py for tests driven by a fake chat model.
+"""
+import json
+import re
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import Runnable, RunnableConfig
+from pydantic import BaseModel
+
+# The longest run of complete string content: anything but a quote or a backslash, or an escape pair
+_STRING_RUN = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+# An escape at the end of a run that may continue in the next chunk: \u with fewer than 4
+# hex digits, or a high surrogate whose low surrogate has not arrived yet
+_UNFINISHED_ESCAPE = re.compile(r'\\u(?:[dD][89abAB][0-9a-fA-F]{2}|[0-9a-fA-F]{0,3})$')
+_WHITESPACE = " \t\r\n"
+
+_SEEK, _AFTER_KEY, _BEFORE_VALUE, _IN_VALUE, _DONE = range(5)
+
+
+def _is_escape(text: str, position: int) -> bool:
+    """Whether the backslash at position starts an escape (is not itself escaped)"""
+    backslashes = 0
+    while position - backslashes >= 0 and text[position - backslashes] == "\\":
+        backslashes += 1
+    return backslashes % 2 == 1
+
+
+class IncrementalFieldParser:
+    """Decodes one top-level string field of a JSON object as the JSON text arrives"""
+
+    def __init__(self, field: str):
+        self.field = field
+        self._state = _SEEK
+        # Scanner state while looking for the key
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._expect_key = False
+        self._string: list[str] = []
+        self._last_key: Optional[str] = None
+        # Value text held back until the rest of an escape sequence arrives
+        self._pending = ""
+        self._raw: list[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    @property
+    def raw(self) -> str:
+        """All JSON text fed so far"""
+        return "".join(self._raw)
+
+    def feed(self, text: str) -> str:
+        """Add the next piece of JSON text; returns the newly decoded part of the field"""
+        self._raw.append(text)
+        position = 0
+        while position < len(text) and self._state != _IN_VALUE and self._state != _DONE:
+            position = self._scan(text, position)
+        if self._state == _IN_VALUE:
+            return self._decode(text[position:])
+        return ""
+
+    def _scan(self, text: str, position: int) -> int:
+        """Advance through the object until the field's string value starts"""
+        char = text[position]
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+                # At the top level, a string right after { or , is a key; other strings are values
+                if self._depth == 1 and self._expect_key:
+                    self._last_key = json.loads('"' + "".join(self._string) + '"')
+                    self._state = _AFTER_KEY
+                self._expect_key = False
+                return position + 1
+            self._string.append(char)
+            return position + 1
+
+        if char in _WHITESPACE:
+            return position + 1
+        if self._state == _AFTER_KEY:
+            if char == ":" and self._last_key == self.field:
+                self._state = _BEFORE_VALUE
+                return position + 1
+            self._state = _SEEK
+        elif self._state == _BEFORE_VALUE:
+            # A null or non-string value: there is nothing to stream
+            self._state = _IN_VALUE if char == '"' else _DONE
+            return position + 1
+
+        if char == '"':
+            self._in_string = True
+            self._string = []
+        elif char in "{[":
+            self._depth += 1
+            self._expect_key = char == "{" and self._depth == 1
+        elif char in "}]":
+            self._depth -= 1
+        elif char == ",":
+            self._expect_key = self._depth == 1
+        return position + 1
+
+    def _decode(self, text: str) -> str:
+        text = self._pending + text
+        run = _STRING_RUN.match(text).group()
+        end = len(run)
+        if end < len(text) and text[end] == '"':
+            # Closing quote: the value is complete
+            self._state = _DONE
+            self._pending = ""
+        else:
+            # Keep a trailing lone backslash or an unfinished \u escape for the next chunk;
+            # twice, for a high surrogate followed by the start of its low surrogate
+            unfinished = _UNFINISHED_ESCAPE.search(run, 0, end)
+            while unfinished and _is_escape(run, unfinished.start()):
+                end = unfinished.start()
+                unfinished = _UNFINISHED_ESCAPE.search(run, 0, end)
+            self._pending = text[end:]
+        if not end:
+            return ""
+        return json.loads('"' + text[:end] + '"')
+
+
+class StreamingStructuredOutput(Runnable):
+    """A chat model that returns `schema` objects and streams one of their string fields"""
+
+    def __init__(self, llm: BaseChatModel, schema: type[BaseModel], field: str, method: str = "json_schema"):
+        self.schema = schema
+        self.field = field
+        self.method = method
+        # Same bindings as with_structured_output(schema, method=method)
+        if method == "json_schema":
+            self.model = llm.bind(response_format=schema)
+        elif method == "function_calling":
+            self.model = llm.bind_tools([schema], tool_choice=schema.__name__)
+        else:
+            raise ValueError(f"Unsupported method: {method}")
+
+    @property
+    def InputType(self):
+        return self.model.InputType
+
+    @property
+    def OutputType(self):
+        return self.schema
+
+    def parse_message(self, message: AIMessage) -> BaseModel:
+        """The validated object from a complete (non-streamed) response"""
+        if self.method == "json_schema":
+            return self.schema.model_validate_json(message.content)
+        if not message.tool_calls:
+            raise ValueError(f"The model did not call the {self.schema.__name__} tool: {message.content!r}")
+        return self.schema.model_validate(message.tool_calls[0]["args"])
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseModel:
+        return self.parse_message(self.model.invoke(input, config, **kwargs))
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> BaseModel:
+        return self.parse_message(await self.model.ainvoke(input, config, **kwargs))
+
+    def _partial(self, text: str) -> BaseModel:
+        # model_construct skips validation; only the final object is validated
+        return self.schema.model_construct(**{self.field: text})
+
+    def _finish(self, parser: IncrementalFieldParser) -> BaseModel:
+        # One validation of the complete arguments with the compiled validator
+        return self.schema.model_validate_json(parser.raw or "{}")
+
+    def _json_text(self, chunk: AIMessageChunk) -> str:
+        """The piece of the answer's JSON carried by this chunk"""
+        if self.method == "json_schema":
+            return chunk.content if isinstance(chunk.content, str) else ""
+        # Only the first tool call carries the answer
+        return "".join(
+            tool_call_chunk.get("args") or ""
+            for tool_call_chunk in chunk.tool_call_chunks
+            if tool_call_chunk.get("index") in (0, None)
+        )
+
+    def _feed(self, parser: IncrementalFieldParser, parts: list[str], chunk: AIMessageChunk) -> Optional[BaseModel]:
+        """The partial object after this chunk, or None when the field did not grow"""
+        delta = parser.feed(self._json_text(chunk))
+        if not delta:
+            return None
+        parts.append(delta)
+        return self._partial("".join(parts))
+
+    def parse_chunks(self, chunks: Iterator[AIMessageChunk]) -> Iterator[BaseModel]:
+        """Partial objects while the field streams in, then the validated object"""
+        parser = IncrementalFieldParser(self.field)
+        parts: list[str] = []
+        for chunk in chunks:
+            partial = self._feed(parser, parts, chunk)
+            if partial is not None:
+                yield partial
+        yield self._finish(parser)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[BaseModel]:
+        yield from self.parse_chunks(self.model.stream(input, config, **kwargs))
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[BaseModel]:
+        parser = IncrementalFieldParser(self.field)
+        parts: list[str] = []
+        async for chunk in self.model.astream(input, config, **kwargs):
+            partial = self._feed(parser, parts, chunk)
+            if partial is not None:
+                yield partial
+        yield self._finish(parser)
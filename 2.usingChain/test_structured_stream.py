@@ -0,0 +1,173 @@
+"""
+Tests for structured_stream.py, driven by a fake chat model that emits canned tool-call chunks.
+
+FakeToolCallChatModel answers every call with the next canned JSON answer, split into small
+chunks the way a streaming API sends them: as message content (json_schema) or, once
+bind_tools() was called, as tool-call argument chunks (function_calling). The tests check that:
+- the streamed partial field content always adds up to the final, validated value
+- escapes, unicode and surrogate pairs split across chunk boundaries decode correctly
+- other fields (including ones that contain the field's name) are skipped
+- invoke/ainvoke/astream return the same objects as with_structured_output(), for both methods
+- an invalid response raises a validation error once, at the end
+
+No API key is needed.
+
+    uv run test_structured_stream.py
+"""
+import asyncio
+import itertools
+import json
+import random
+import uuid
+from typing import Any, Iterator, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import PromptTemplate
+from pydantic import PrivateAttr, ValidationError
+
+from main_lcel import Code, CodeCheck
+from structured_stream import IncrementalFieldParser, StreamingStructuredOutput
+
+
+class FakeToolCallChatModel(BaseChatModel):
+    """Answers with canned JSON, streamed in chunks of chunk_size characters"""
+    responses: list[dict]
+    chunk_size: int = 4
+    # Set by bind_tools(): answer with a call of this tool instead of JSON content
+    tool_name: Optional[str] = None
+    _calls: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-tool-call"
+
+    def bind_tools(self, tools: list, tool_choice: Optional[str] = None, **kwargs: Any):
+        return self.model_copy(update={"tool_name": tool_choice or tools[0].__name__})
+
+    def _next_arguments(self) -> str:
+        arguments = self.responses[self._calls % len(self.responses)]
+        self._calls += 1
+        return arguments if isinstance(arguments, str) else json.dumps(arguments)
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        arguments = self._next_arguments()
+        if self.tool_name is None:
+            message = AIMessage(content=arguments)
+        else:
+            message = AIMessage(content="", tool_calls=[{"name": self.tool_name, "args": json.loads(arguments), "id": "call_0"}])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: list[BaseMessage], stop=None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        arguments = self._next_arguments()
+        call_id = f"call_{uuid.uuid4().hex[:8]}"
+        for start in range(0, len(arguments), self.chunk_size):
+            if self.tool_name is None:
+                yield ChatGenerationChunk(message=AIMessageChunk(content=arguments[start:start + self.chunk_size]))
+                continue
+            first = start == 0
+            chunk = AIMessageChunk(content="", tool_call_chunks=[{
+                "name": self.tool_name if first else None,
+                "args": arguments[start:start + self.chunk_size],
+                "id": call_id if first else None,
+                "index": 0,
+            }])
+            yield ChatGenerationChunk(message=chunk)
+
+
+CANNED_CODE = [
+    {"code": "def print_numbers():\n    for i in range(10):\n        print(i)\n"},
+    {"code": 'print("tab\\tquote\\" backslash\\\\ é 😀")'},
+    {"language": "python", "note": "the code field comes later", "code": "x = {\"code\": 1}"},
+    {"code": ""},
+]
+
+prompt = PromptTemplate.from_template("Write a very short {language} function that will {task}")
+
+
+def split_everywhere(raw: str) -> Iterator[list[str]]:
+    """Every way to split raw into two pieces, plus random small chunks"""
+    for cut in range(len(raw) + 1):
+        yield [raw[:cut], raw[cut:]]
+    rng = random.Random(0)
+    for _ in range(200):
+        pieces, position = [], 0
+        while position < len(raw):
+            size = rng.randint(1, 5)
+            pieces.append(raw[position:position + size])
+            position += size
+        yield pieces
+
+
+def test_incremental_parser_matches_json():
+    for arguments in CANNED_CODE:
+        for ensure_ascii in (True, False):
+            raw = json.dumps(arguments, ensure_ascii=ensure_ascii)
+            for pieces in split_everywhere(raw):
+                parser = IncrementalFieldParser("code")
+                decoded = "".join(parser.feed(piece) for piece in pieces)
+                assert decoded == arguments["code"], pieces
+                assert parser.done
+
+
+def test_incremental_parser_non_string_value():
+    parser = IncrementalFieldParser("code")
+    assert parser.feed('{"code": null}') == ""
+    assert parser.done
+
+
+def test_stream_yields_growing_partials_then_validated():
+    for method, chunk_size in itertools.product(("json_schema", "function_calling"), (1, 3, 16)):
+        llm = FakeToolCallChatModel(responses=CANNED_CODE, chunk_size=chunk_size)
+        chain = prompt | StreamingStructuredOutput(llm, Code, field="code", method=method)
+        for arguments in CANNED_CODE:
+            results = list(chain.stream({"language": "python", "task": "print 10 numbers"}))
+            partials, final = results[:-1], results[-1]
+            assert final == Code(code=arguments["code"])
+            # Every partial extends the previous one and is a prefix of the final value
+            previous = ""
+            for partial in partials:
+                assert partial.code.startswith(previous) and arguments["code"].startswith(partial.code)
+                previous = partial.code
+            if len(arguments["code"]) > chunk_size:
+                assert len(partials) > 1
+
+
+def test_invoke_and_astream_match_with_structured_output_result():
+    for method in ("json_schema", "function_calling"):
+        check_method(method)
+
+
+def check_method(method: str):
+    llm = FakeToolCallChatModel(responses=[{"final_code": "assert f() == 1"}])
+    check = StreamingStructuredOutput(llm, CodeCheck, field="final_code", method=method)
+    assert check.invoke("test this") == CodeCheck(final_code="assert f() == 1")
+    assert asyncio.run(check.ainvoke("test this")) == CodeCheck(final_code="assert f() == 1")
+
+    async def collect():
+        return [partial async for partial in check.astream("test this")]
+    results = asyncio.run(collect())
+    assert results[-1] == CodeCheck(final_code="assert f() == 1")
+    assert results[-2].final_code == "assert f() == 1"
+
+
+def test_invalid_response_fails_validation_at_the_end():
+    llm = FakeToolCallChatModel(responses=[{"cod": "typo in the field name"}])
+    generate = StreamingStructuredOutput(llm, Code, field="code", method="function_calling")
+    for run in (lambda: list(generate.stream("write code")), lambda: generate.invoke("write code")):
+        try:
+            run()
+        except ValidationError:
+            continue
+        raise AssertionError("expected a ValidationError")
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} tests passed")
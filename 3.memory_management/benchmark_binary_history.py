@@ -0,0 +1,122 @@
+"""
+Bytes on disk and load time: FileChatMessageHistory JSON vs BinaryChatMessageHistory.
+
+Every conversation_*.json file in --dir (the FileChatMessageHistory files of
+main_with_file_persistence.py before the JSONL migration) is converted to the binary format
+with each codec, then compared on:
+- bytes on disk
+- full load: json.load + messages_from_dict vs reading every record
+- tail load: the last --window messages, which is all a session needs to open
+
+When --dir has no JSON conversations, synthetic ones are generated (AI messages carry the
+ids, response metadata and token usage the OpenAI API returns). No API key is needed.
+
+    uv run benchmark_binary_history.py --dir conversations
+    uv run benchmark_binary_history.py --sessions 20 --messages 2000
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, messages_from_dict, messages_to_dict
+
+from binary_chat_history import (
+    CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD, BinaryChatMessageHistory, migrate_json_to_binary, zstandard
+)
+
+
+def make_message(i: int):
+    if i % 2 == 0:
+        return HumanMessage(content=f"Question number {i}: what else can you tell me about this topic?")
+    return AIMessage(
+        content=f"Answer number {i}: here is a reasonably sized reply with a few more details. " * 3,
+        id=f"run-{uuid.uuid4()}-0",
+        response_metadata={
+            "token_usage": {"completion_tokens": 60, "prompt_tokens": 40 + i, "total_tokens": 100 + i},
+            "model_name": "gpt-4o-mini-2024-07-18",
+            "system_fingerprint": "fp_0123456789",
+            "finish_reason": "stop",
+            "logprobs": None,
+        },
+        usage_metadata={"input_tokens": 40 + i, "output_tokens": 60, "total_tokens": 100 + i},
+    )
+
+
+def generate_conversations(directory: str, sessions: int, messages: int) -> list[str]:
+    paths = []
+    for s in range(sessions):
+        path = os.path.join(directory, f"conversation_synthetic_{s}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            # The same layout FileChatMessageHistory writes
+            json.dump(messages_to_dict([make_message(i) for i in range(messages)]), f)
+        paths.append(path)
+    return paths
+
+
+def time_ms(function, repeat: int = 3) -> float:
+    """Median wall time of `function` in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def load_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return messages_from_dict(json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON and binary chat history files")
+    parser.add_argument("--dir", default="conversations", help="Directory with conversation_*.json files")
+    parser.add_argument("--sessions", type=int, default=20, help="Synthetic sessions when --dir has none")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages per synthetic session")
+    parser.add_argument("--window", type=int, default=20, help="Messages loaded by a tail read")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="binary_history_")
+    json_paths = sorted(glob.glob(os.path.join(args.dir, "conversation_*.json")))
+    if json_paths:
+        print(f"📁 {len(json_paths)} conversation(s) from {args.dir}")
+    else:
+        print(f"📁 No JSON conversations in {args.dir}, generating {args.sessions} x {args.messages} messages")
+        json_paths = generate_conversations(work_dir, args.sessions, args.messages)
+
+    codecs = [("binary", CODEC_NONE), ("binary+zlib", CODEC_ZLIB)]
+    if zstandard is not None:
+        codecs.append(("binary+zstd", CODEC_ZSTD))
+
+    total_messages = sum(len(load_json(path)) for path in json_paths)
+    json_bytes = sum(os.path.getsize(path) for path in json_paths)
+    json_load = sum(time_ms(lambda path=path: load_json(path)) for path in json_paths)
+    print(f"   {total_messages} messages\n")
+    print(f"{'format':<14} {'bytes':>12} {'ratio':>7} {'full load ms':>13} {f'last {args.window} ms':>11}")
+    print(f"{'json':<14} {json_bytes:>12} {1.0:>7.2f} {json_load:>13.1f} {json_load:>11.1f}")
+
+    for name, codec in codecs:
+        binary_paths = []
+        for path in json_paths:
+            binary_path = os.path.join(work_dir, f"{os.path.basename(path)}.{codec}.bin")
+            migrate_json_to_binary(path, binary_path, codec=codec)
+            binary_paths.append(binary_path)
+        size = sum(os.path.getsize(path) for path in binary_paths)
+        # A new history object per load, so nothing is served from its in-memory cache
+        full_load = sum(time_ms(lambda path=path: BinaryChatMessageHistory(path).messages) for path in binary_paths)
+        tail_load = sum(
+            time_ms(lambda path=path: BinaryChatMessageHistory(path, window=args.window).messages)
+            for path in binary_paths
+        )
+        print(f"{name:<14} {size:>12} {size / json_bytes:>7.2f} {full_load:>13.1f} {tail_load:>11.1f}")
+
+    print("\nJSON has to be parsed completely even when only the last messages are needed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Per-message write latency: FileChatMessageHistory vs JSONLChatMessageHistory.
+
+FileChatMessageHistory rewrites the whole JSON file on every message, so its latency grows
+with the conversation. JSONLChatMessageHistory appends one line, so it should stay flat.
+No API key is needed, the messages are synthetic.
+
+    uv run benchmark_file_history.py --messages 10000
+
+The baseline stops at --baseline-messages (2000 by default): FileChatMessageHistory is O(n²)
+in total and takes about a minute for 2000 messages, so 10,000 would take far longer.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from langchain_community.chat_message_histories import FileChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+
+from jsonl_chat_history import FsyncPolicy, JSONLChatMessageHistory
+
+
+def make_message(i: int):
+    if i % 2 == 0:
+        return HumanMessage(content=f"Question number {i}: what else can you tell me about this topic?")
+    return AIMessage(content=f"Answer number {i}: here is a reasonably sized reply with a few more details.")
+
+
+def measure(history, count: int) -> list[float]:
+    """Latency of every add_message() call in milliseconds"""
+    latencies = []
+    for i in range(count):
+        message = make_message(i)
+        start = time.perf_counter()
+        history.add_message(message)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name: str, latencies: list[float], window: int):
+    """Mean latency of the first and last `window` messages, plus the total"""
+    first = statistics.mean(latencies[:window])
+    last = statistics.mean(latencies[-window:])
+    print(f"{name:<40} first {window}: {first:8.3f} ms   last {window}: {last:8.3f} ms   "
+          f"total: {sum(latencies) / 1000:7.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--window", type=int, default=500)
+    parser.add_argument("--baseline-messages", type=int, default=2_000, help="0 skips FileChatMessageHistory")
+    args = parser.parse_args()
+
+    print(f"Adding {args.messages} messages, latency per add_message()")
+    with tempfile.TemporaryDirectory() as directory:
+        if args.baseline_messages:
+            history = FileChatMessageHistory(os.path.join(directory, "conversation.json"))
+            report(f"FileChatMessageHistory ({args.baseline_messages} msgs)",
+                   measure(history, args.baseline_messages), args.window)
+
+        for policy in FsyncPolicy:
+            history = JSONLChatMessageHistory(os.path.join(directory, f"conversation_{policy.value}.jsonl"), fsync=policy)
+            latencies = measure(history, args.messages)
+            history.close()
+            report(f"JSONLChatMessageHistory (fsync={policy.value})", latencies, args.window)
+
+
+if __name__ == "__main__":
+    main()
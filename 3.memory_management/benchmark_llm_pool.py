@@ -0,0 +1,155 @@
+"""
+Client constructions and connections per 1000 turns: per-session clients vs llm_pool.
+
+Replays the same workload twice against a local stub of the OpenAI chat completions API:
+- before: a new ChatOpenAI per session (the old create_summarizing_history()) and a new
+  ChatOpenAI + prompt + chain every time a summary is triggered (the old timing demo)
+- after: every session and every summary uses llm_pool.get_chat_model() and shared_chain()
+
+and counts model constructions, OpenAI/httpx client constructions, and the TCP connections
+the stub accepted. Against the real API every new connection costs a TLS handshake, so the
+connection count is the handshake count. No API key is needed.
+
+    uv run benchmark_llm_pool.py --sessions 100 --turns 10
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import openai
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.messages import HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_openai import ChatOpenAI
+
+import llm_pool
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every POST like /v1/chat/completions, keeping the connection alive"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def process_request(self, request, client_address):
+        # Called once per accepted TCP connection
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+class ConstructionCounter:
+    """Counts constructions of the given classes while active"""
+
+    def __init__(self, *classes):
+        self.classes = classes
+        self.counts = {cls.__name__: 0 for cls in classes}
+        self._originals = {}
+
+    def __enter__(self):
+        for cls in self.classes:
+            original = cls.__init__
+            self._originals[cls] = original
+
+            def counting_init(instance, *args, __original=original, __name=cls.__name__, **kwargs):
+                self.counts[__name] += 1
+                __original(instance, *args, **kwargs)
+
+            cls.__init__ = counting_init
+        return self
+
+    def __exit__(self, *exc):
+        for cls, original in self._originals.items():
+            cls.__init__ = original
+
+
+def summary_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", "Summarize this conversation in 2-3 sentences:"),
+        ("human", "{conversation}")
+    ])
+
+
+def run_session_before(base_url: str, turns: int, summarize_every: int):
+    # One model per session, and one model + chain per summary trigger
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, base_url=base_url, api_key="stub")
+    for turn in range(turns):
+        llm.invoke([HumanMessage(content=f"turn {turn}")])
+        if (turn + 1) % summarize_every == 0:
+            summary_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, base_url=base_url, api_key="stub")
+            chain = summary_prompt() | summary_llm | StrOutputParser()
+            chain.invoke({"conversation": f"conversation up to turn {turn}"})
+
+
+def run_session_after(base_url: str, turns: int, summarize_every: int):
+    # Every session and every summary draws from the process-wide pool
+    llm = llm_pool.get_chat_model("gpt-4o-mini", temperature=0, base_url=base_url, api_key="stub")
+    for turn in range(turns):
+        llm.invoke([HumanMessage(content=f"turn {turn}")])
+        if (turn + 1) % summarize_every == 0:
+            chain = llm_pool.shared_chain(("benchmark_summary", id(llm)), lambda: summary_prompt() | llm | StrOutputParser())
+            chain.invoke({"conversation": f"conversation up to turn {turn}"})
+
+
+def run_scenario(name: str, run_session, args) -> None:
+    server = CountingServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    with ConstructionCounter(ChatOpenAI, openai.OpenAI, openai.AsyncOpenAI, httpx.Client, httpx.AsyncClient) as counter:
+        start = time.perf_counter()
+        # Sessions are served concurrently, like requests in a web server
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(lambda _: run_session(base_url, args.turns, args.summarize_every), range(args.sessions)))
+        elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+
+    turns = args.sessions * args.turns
+    per_1000 = 1000 / turns
+    print(f"{name:<8} {turns} turns in {elapsed:5.2f}s   per 1000 turns: "
+          f"ChatOpenAI {counter.counts['ChatOpenAI'] * per_1000:6.0f}   "
+          f"OpenAI clients {(counter.counts['OpenAI'] + counter.counts['AsyncOpenAI']) * per_1000:6.0f}   "
+          f"httpx clients {(counter.counts['Client'] + counter.counts['AsyncClient']) * per_1000:5.0f}   "
+          f"connections (TLS handshakes) {server.connections * per_1000:5.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count client constructions and connections per 1000 turns")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=10, help="Turns per session")
+    parser.add_argument("--summarize-every", type=int, default=4, help="A summary is triggered every N turns")
+    parser.add_argument("--workers", type=int, default=8, help="Sessions served at the same time")
+    args = parser.parse_args()
+
+    run_scenario("before", run_session_before, args)
+    run_scenario("after", run_session_after, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Memory-subsystem benchmark: every history strategy under the same multi-session workload.
+
+The demo_*.py scripts explain how the histories behave; this measures it. --sessions
+conversations are played round-robin, one turn (a human message and the reply) at a time, up
+to the largest --checkpoints length, against each strategy:
+- in_memory: ChatMessageHistory, the whole history goes into the prompt
+- file: FileChatMessageHistory (rewrites the whole file per message, capped at --file-max-turns)
+- jsonl: JSONLChatMessageHistory (appends one line per message)
+- binary: BinaryChatMessageHistory with a 20 message window
+- sqlite: SQLiteChatMessageHistory with a 20 message window (like main.py)
+- summarizing: SummarizingChatMessageHistory, summary + history trimmed to HISTORY_TOKEN_BUDGET
+- vector: VectorMemoryChatMessageHistory, recent window + the most relevant older turns
+  (capped at --vector-max-turns: every query scores all indexed turns)
+
+Replies and summaries come from FakeChatModel (local_providers.py, no latency), and the vector
+memory uses the `local` embeddings without the on-disk cache, so no API key is needed.
+
+For each strategy and conversation length it reports:
+- per-turn latency (p50/p95): building the prompt history and saving the turn; the model call
+  is not included
+- prompt tokens of the history plus the new message, at that turn
+- bytes written per turn (write() calls of the process, from /proc/self/io; file growth elsewhere)
+- memory per session (tracemalloc, in a separate pass so it does not slow down the timings)
+
+    uv run benchmark_memory.py
+    uv run benchmark_memory.py --strategies jsonl sqlite summarizing --checkpoints 10 100 1000 --output memory.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from langchain_community.chat_message_histories import ChatMessageHistory, FileChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from binary_chat_history import BinaryChatMessageHistory
+from jsonl_chat_history import JSONLChatMessageHistory
+from llm_pool import LOCAL_PROVIDERS_DIR
+from sqlite_chat_history import create_session_history_factory
+from token_budget import count_message_tokens, trim_to_budget
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+if LOCAL_PROVIDERS_DIR not in sys.path:
+    sys.path.append(LOCAL_PROVIDERS_DIR)
+
+from local_providers import FakeChatModel  # noqa: E402
+
+STRATEGIES = ["in_memory", "file", "jsonl", "binary", "sqlite", "summarizing", "vector"]
+
+_TOPICS = "job family travel cooking music books health garden project weekend".split()
+
+
+@dataclass
+class Strategy:
+    name: str
+    # session_id -> a new, empty history
+    create: Callable[[str], Any]
+    # (history, new message) -> the history that goes into the prompt
+    prompt: Callable[[Any, BaseMessage], list[BaseMessage]]
+    max_turns: Optional[int] = None
+
+
+def full_history(history, message: BaseMessage) -> list[BaseMessage]:
+    # A copy, like the prompt gets: ChatMessageHistory.messages is the live list
+    return list(history.messages)
+
+
+def summary_prompt(history, message: BaseMessage) -> list[BaseMessage]:
+    from main_with_summary_lcel import HISTORY_TOKEN_BUDGET
+    summary = [SystemMessage(content=history.summary)] if history.summary else []
+    return summary + trim_to_budget(history.messages, HISTORY_TOKEN_BUDGET)
+
+
+def vector_prompt(history, message: BaseMessage) -> list[BaseMessage]:
+    relevant = history.relevant_turns(message.content)
+    return [SystemMessage(content="\n\n".join(relevant) or "(none)")] + history.recent_window()
+
+
+def build_strategies(workdir: str, llm: FakeChatModel, file_max_turns: int, vector_max_turns: int) -> dict[str, Strategy]:
+    def path(name: str) -> str:
+        return os.path.join(workdir, name)
+
+    def sqlite_history(session_id: str):
+        return create_session_history_factory(path("conversations.db"), window=20)(session_id)
+
+    def summarizing_history(session_id: str):
+        from main_with_summary_lcel import SummarizingChatMessageHistory
+        return SummarizingChatMessageHistory(llm=llm, max_tokens=2000, recent_tokens=500)
+
+    def vector_history(session_id: str):
+        from vector_memory import ModelVendor, VectorMemoryChatMessageHistory
+        from embedding_providers import load_embedding_model
+        return VectorMemoryChatMessageHistory(load_embedding_model(ModelVendor.LOCAL), recent_messages=6, top_k=4)
+
+    strategies = [
+        Strategy("in_memory", lambda session_id: ChatMessageHistory(), full_history),
+        Strategy("file", lambda session_id: FileChatMessageHistory(path(f"file_{session_id}.json")), full_history,
+                 max_turns=file_max_turns),
+        Strategy("jsonl", lambda session_id: JSONLChatMessageHistory(path(f"jsonl_{session_id}.jsonl")), full_history),
+        Strategy("binary", lambda session_id: BinaryChatMessageHistory(path(f"binary_{session_id}.bin"), window=20),
+                 full_history),
+        Strategy("sqlite", sqlite_history, full_history),
+        Strategy("summarizing", summarizing_history, summary_prompt),
+        Strategy("vector", vector_history, vector_prompt, max_turns=vector_max_turns),
+    ]
+    return {strategy.name: strategy for strategy in strategies}
+
+
+def make_message(session: int, turn: int) -> HumanMessage:
+    topic = _TOPICS[(session * 7 + turn) % len(_TOPICS)]
+    return HumanMessage(content=f"Turn {turn}: let me tell you more about my {topic}, "
+                                f"it has been on my mind for a while and I would like your advice on it.")
+
+
+def bytes_written() -> Optional[int]:
+    """Bytes this process passed to write() so far (Linux), or None"""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def settle(histories: list):
+    """Let background work finish: summaries in flight, JSONL compactions"""
+    for history in histories:
+        for method in ("wait_for_summary", "wait_for_compaction"):
+            if hasattr(history, method):
+                getattr(history, method)()
+
+
+def close(histories: list):
+    settle(histories)
+    for history in histories:
+        if hasattr(history, "close"):
+            history.close()
+
+
+def reply_for(llm: FakeChatModel, message: HumanMessage) -> BaseMessage:
+    return llm.invoke([message])
+
+
+def run_timings(strategy: Strategy, llm: FakeChatModel, workdir: str, sessions: int, checkpoints: list[int]) -> list[dict]:
+    """Latency, prompt tokens and bytes written per turn, for the turns up to each checkpoint"""
+    histories = [strategy.create(f"s{session}") for session in range(sessions)]
+    # Without /proc/self/io, count the growth of the strategy's files instead
+    use_wchar = bytes_written() is not None
+    rows = []
+    latencies, written, previous = [], 0, 0
+    try:
+        for turn in range(max(checkpoints)):
+            prompt_tokens = []
+            for session, history in enumerate(histories):
+                message = make_message(session, turn)
+                reply = reply_for(llm, message)
+                before = bytes_written() if use_wchar else directory_size(workdir)
+                start = time.perf_counter()
+                prompt = strategy.prompt(history, message)
+                history.add_messages([message, reply])
+                latencies.append(time.perf_counter() - start)
+                written += (bytes_written() if use_wchar else directory_size(workdir)) - before
+                if turn + 1 in checkpoints:
+                    prompt_tokens.append(sum(count_message_tokens(m) for m in prompt) + count_message_tokens(message))
+            if turn + 1 in checkpoints:
+                turns = (turn + 1 - previous) * sessions
+                rows.append({
+                    "turns": turn + 1,
+                    "p50_ms": round(statistics.median(latencies) * 1000, 3),
+                    "p95_ms": round(statistics.quantiles(latencies, n=20)[18] * 1000, 3) if len(latencies) > 1 else round(latencies[0] * 1000, 3),
+                    "prompt_tokens": round(statistics.mean(prompt_tokens)),
+                    "bytes_per_turn": round(written / turns),
+                })
+                latencies, written, previous = [], 0, turn + 1
+    finally:
+        close(histories)
+    return rows
+
+
+def run_memory(strategy: Strategy, llm: FakeChatModel, checkpoints: list[int]) -> dict[int, int]:
+    """Bytes held by one session at each checkpoint, traced with tracemalloc"""
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    history = strategy.create("memory")
+    sizes = {}
+    try:
+        for turn in range(max(checkpoints)):
+            message = make_message(0, turn)
+            strategy.prompt(history, message)
+            history.add_messages([message, reply_for(llm, message)])
+            if turn + 1 in checkpoints:
+                settle([history])
+                sizes[turn + 1] = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+        close([history])
+    return sizes
+
+
+def print_strategy(name: str, rows: list[dict]):
+    print(f"\n🧠 {name}")
+    print(f"   {'turns':>6} {'p50 ms':>8} {'p95 ms':>8} {'prompt tokens':>14} {'bytes/turn':>11} {'KB/session':>11}")
+    for row in rows:
+        print(f"   {row['turns']:>6} {row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} {row['prompt_tokens']:>14} "
+              f"{row['bytes_per_turn']:>11} {row['memory_per_session_bytes'] / 1024:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="History strategies under a multi-session workload")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, help="Strategies to run (default: all)")
+    parser.add_argument("--sessions", type=int, default=4, help="Conversations played round-robin")
+    parser.add_argument("--checkpoints", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="Conversation lengths (turns) to report")
+    parser.add_argument("--file-max-turns", type=int, default=1000,
+                        help="Longest conversation for FileChatMessageHistory, which is O(n^2) in total")
+    parser.add_argument("--vector-max-turns", type=int, default=1000,
+                        help="Longest conversation for the vector memory, which scans every turn per query")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    llm = FakeChatModel(ttft_ms=0, tokens_per_second=0, latency="constant", response_tokens=30)
+    results = {"sessions": args.sessions, "strategies": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        # main_with_summary_lcel.py opens its SQLite store on import; keep it out of the project
+        os.chdir(workdir)
+        for name in args.strategies or STRATEGIES:
+            # Each strategy writes to its own directory, so its bytes can be told apart
+            strategy_dir = os.path.join(workdir, name)
+            os.makedirs(strategy_dir)
+            strategy = build_strategies(strategy_dir, llm, args.file_max_turns, args.vector_max_turns)[name]
+            checkpoints = sorted(c for c in args.checkpoints if strategy.max_turns is None or c <= strategy.max_turns)
+            if not checkpoints:
+                continue
+            # The summarizing history reports every summary on stdout
+            with contextlib.redirect_stdout(io.StringIO()):
+                rows = run_timings(strategy, llm, strategy_dir, args.sessions, checkpoints)
+                memory = run_memory(strategy, llm, checkpoints)
+            for row in rows:
+                row["memory_per_session_bytes"] = memory[row["turns"]]
+            results["strategies"][name] = rows
+            print_strategy(name, rows)
+        os.chdir(HERE)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"\n💾 Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Compact binary chat history with lazy tail reads.
+
+FileChatMessageHistory stores every message as a verbose JSON dict
+({"type": ..., "data": {"content": ..., "additional_kwargs": {}, ...}}) and json.load()s the
+whole file on every open. BinaryChatMessageHistory stores length-prefixed records instead:
+
+    file    = MAGIC, codec byte, record*
+    record  = u32 length, u8 tag, payload, u32 length
+
+- the tag interns the message type (human, ai, ...) in its low bits; fields that still have
+  their default value (empty additional_kwargs, id None, ...) are not stored at all, so a
+  plain message is just its UTF-8 content
+- payloads of COMPRESS_MIN_BYTES or more are compressed with zstd (zlib when zstandard is
+  not installed), when that makes them smaller
+- the length is repeated after each record, so the file can be walked backwards:
+  get_messages(last_n) and a `window` only read the tail of the file, however long the
+  conversation is
+- add_messages() appends all records in one write, like JSONLChatMessageHistory; a torn
+  record left by a crash is dropped before the next append
+
+    history = BinaryChatMessageHistory("conversations/conversation_1.bin", window=20)
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from jsonl_chat_history import FsyncPolicy
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+MAGIC = b"LCMB"
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+HEADER_SIZE = len(MAGIC) + 1
+
+_LENGTH = struct.Struct("<I")
+_RECORD_HEAD = struct.Struct("<IB")
+RECORD_OVERHEAD = _RECORD_HEAD.size + _LENGTH.size
+
+# Interned message types; the index is stored in the low bits of the tag
+TYPE_TAGS = ("human", "ai", "system", "tool", "function", "chat")
+# Any other type (e.g. a chunk type) is stored by name in the extra fields
+OTHER_TYPE = 0x0F
+TYPE_MASK = 0x0F
+HAS_EXTRAS = 0x10
+COMPRESSED = 0x20
+
+# Values that every message type fills in by default; they are not written
+DEFAULT_FIELDS = {
+    "additional_kwargs": {},
+    "response_metadata": {},
+    "name": None,
+    "id": None,
+    "example": False,
+    "tool_calls": [],
+    "invalid_tool_calls": [],
+    "usage_metadata": None,
+}
+
+# Short payloads do not compress well and are not worth the CPU
+COMPRESS_MIN_BYTES = 256
+
+
+def default_codec() -> int:
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def encode_message(message: BaseMessage) -> tuple[int, bytes]:
+    """(tag, payload) of a message: its content plus only the fields that are not defaults"""
+    item = message_to_dict(message)
+    data = dict(item["data"])
+    data.pop("type", None)
+    content = data.pop("content", "")
+    extras = {key: value for key, value in data.items() if DEFAULT_FIELDS.get(key, object()) != value}
+    if not isinstance(content, str):
+        # e.g. a list of content blocks
+        extras["content"] = content
+        content = ""
+
+    tag = TYPE_TAGS.index(item["type"]) if item["type"] in TYPE_TAGS else OTHER_TYPE
+    if tag == OTHER_TYPE:
+        extras["__type__"] = item["type"]
+
+    content_bytes = content.encode("utf-8")
+    if not extras:
+        return tag, content_bytes
+    extras_bytes = json.dumps(extras, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return tag | HAS_EXTRAS, _LENGTH.pack(len(content_bytes)) + content_bytes + extras_bytes
+
+
+def decode_message_dicts(records: list[tuple[int, bytes]]) -> list[dict]:
+    """Message dicts of decompressed (tag, payload) records"""
+    items = []
+    extras_json = []
+    with_extras = []
+    for tag, payload in records:
+        if tag & HAS_EXTRAS:
+            (content_length,) = _LENGTH.unpack_from(payload)
+            start = _LENGTH.size
+            data = {"content": payload[start:start + content_length].decode("utf-8")}
+            extras_json.append(payload[start + content_length:].decode("utf-8"))
+            with_extras.append(data)
+        else:
+            data = {"content": payload.decode("utf-8")}
+        type_index = tag & TYPE_MASK
+        items.append({"type": TYPE_TAGS[type_index] if type_index != OTHER_TYPE else None, "data": data})
+
+    # One json.loads for all extra fields is much faster than one per message
+    if extras_json:
+        for data, extras in zip(with_extras, json.loads("[" + ",".join(extras_json) + "]")):
+            data.update(extras)
+    for item in items:
+        if item["type"] is None:
+            item["type"] = item["data"].pop("__type__")
+    return items
+
+
+class _Codec:
+    """Compresses record payloads with the codec named in the file header"""
+
+    def __init__(self, codec: int):
+        self.codec = codec
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("This history file is zstd-compressed, install zstandard to read it")
+            self._compressor = zstandard.ZstdCompressor(level=3)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, payload: bytes) -> bytes | None:
+        """The compressed payload, or None when compression does not pay off"""
+        if self.codec == CODEC_NONE or len(payload) < COMPRESS_MIN_BYTES:
+            return None
+        if self.codec == CODEC_ZSTD:
+            compressed = self._compressor.compress(payload)
+        else:
+            compressed = zlib.compress(payload, 6)
+        return compressed if len(compressed) < len(payload) else None
+
+    def decompress(self, payload: bytes) -> bytes:
+        if self.codec == CODEC_ZSTD:
+            return self._decompressor.decompress(payload)
+        return zlib.decompress(payload)
+
+
+class BinaryChatMessageHistory(BaseChatMessageHistory):
+    """Chat message history stored as compact length-prefixed binary records"""
+
+    def __init__(
+            self,
+            file_path: str,
+            window: int | None = None,
+            codec: int | None = None,
+            fsync: FsyncPolicy = FsyncPolicy.INTERVAL,
+            fsync_interval: float = 1.0):
+        self.file_path = file_path
+        # When set, .messages only returns (and only reads) the last `window` messages
+        self.window = window
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = threading.RLock()
+        self._file = None
+        self._last_fsync = time.monotonic()
+        # Codec of a new file; an existing file keeps the codec in its header
+        self._new_codec = default_codec() if codec is None else codec
+        self._codec: _Codec | None = None
+        # Messages read so far: the newest ones, or all of them when _complete. With a window
+        # the cache is trimmed back to the last `window` messages after every append.
+        self._cache: list[BaseMessage] | None = None
+        self._complete = False
+        # Number of messages in the file, once known
+        self._length: int | None = None
+
+    @property
+    def messages(self) -> list[BaseMessage]:  # type: ignore[override]
+        return self.get_messages(self.window)
+
+    def get_messages(self, last_n: int | None = None) -> list[BaseMessage]:
+        """All messages in order, or only the last `last_n`, read from the end of the file"""
+        with self._lock:
+            cached = self._cache is not None and (
+                self._complete or (last_n is not None and len(self._cache) >= last_n))
+            if not cached:
+                self._cache, self._complete = self._read(last_n)
+                if self._complete:
+                    self._length = len(self._cache)
+            if last_n is None:
+                return list(self._cache)
+            return self._cache[len(self._cache) - min(last_n, len(self._cache)):]
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._length is None:
+                self._cache, self._complete = self._read(None)
+                self._length = len(self._cache)
+            return self._length
+
+    def _read(self, last_n: int | None) -> tuple[list[BaseMessage], bool]:
+        """(messages, whether they are all messages of the file)"""
+        if not os.path.exists(self.file_path):
+            return [], True
+        with open(self.file_path, "rb") as f:
+            codec = self._read_header(f)
+            size = f.seek(0, os.SEEK_END)
+            records = None
+            if last_n is not None:
+                records = self._read_tail(f, size, last_n)
+            if records is None:
+                records, _ = self._read_forward(f)
+        items = decode_message_dicts([
+            (tag, codec.decompress(payload) if tag & COMPRESSED else payload) for tag, payload in records
+        ])
+        complete = last_n is None or len(records) < last_n
+        return messages_from_dict(items), complete
+
+    def _read_header(self, f) -> _Codec:
+        header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.file_path} is not a binary chat history")
+        if self._codec is None:
+            self._codec = _Codec(header[len(MAGIC)])
+        return self._codec
+
+    @staticmethod
+    def _read_forward(f) -> tuple[list[tuple[int, bytes]], int]:
+        """Every complete record and the offset where the valid data ends"""
+        f.seek(HEADER_SIZE)
+        data = f.read()
+        records = []
+        offset = 0
+        while offset + RECORD_OVERHEAD <= len(data):
+            length, tag = _RECORD_HEAD.unpack_from(data, offset)
+            end = offset + _RECORD_HEAD.size + length
+            if end + _LENGTH.size > len(data) or _LENGTH.unpack_from(data, end)[0] != length:
+                break  # A torn record from a crash mid-write
+            records.append((tag, data[offset + _RECORD_HEAD.size:end]))
+            offset = end + _LENGTH.size
+        return records, HEADER_SIZE + offset
+
+    @staticmethod
+    def _read_tail(f, size: int, last_n: int) -> list[tuple[int, bytes]] | None:
+        """The last `last_n` records, walking backwards; None if the tail is torn"""
+        records = []
+        end = size
+        while end > HEADER_SIZE and len(records) < last_n:
+            if end - HEADER_SIZE < RECORD_OVERHEAD:
+                return None
+            f.seek(end - _LENGTH.size)
+            (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+            start = end - RECORD_OVERHEAD - length
+            if start < HEADER_SIZE:
+                return None
+            f.seek(start)
+            record = f.read(RECORD_OVERHEAD + length)
+            head_length, tag = _RECORD_HEAD.unpack_from(record)
+            if head_length != length:
+                return None
+            records.append((tag, record[_RECORD_HEAD.size:_RECORD_HEAD.size + length]))
+            end = start
+        records.reverse()
+        return records
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Append the messages as records in a single write"""
+        if not messages:
+            return
+        with self._lock:
+            self._open()
+            chunks = []
+            for message in messages:
+                tag, payload = encode_message(message)
+                compressed = self._codec.compress(payload)
+                if compressed is not None:
+                    tag, payload = tag | COMPRESSED, compressed
+                chunks.append(_RECORD_HEAD.pack(len(payload), tag) + payload + _LENGTH.pack(len(payload)))
+            self._write(b"".join(chunks))
+            if self._length is not None:
+                self._length += len(messages)
+            if self._cache is not None:
+                self._cache.extend(messages)
+                if self.window is not None and len(self._cache) > self.window:
+                    del self._cache[:-self.window]
+                    self._complete = False
+
+    def _open(self):
+        if self._file is not None:
+            return
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(self.file_path) or os.path.getsize(self.file_path) == 0:
+            with open(self.file_path, "wb") as f:
+                f.write(MAGIC + bytes([self._new_codec]))
+        self._file = open(self.file_path, "r+b")
+        self._read_header(self._file)
+        size = self._file.seek(0, os.SEEK_END)
+        # After a crash mid-write the last record is incomplete; cut it off before appending
+        if size > HEADER_SIZE and self._read_tail(self._file, size, 1) is None:
+            _, valid_end = self._read_forward(self._file)
+            self._file.truncate(valid_end)
+        self._file.seek(0, os.SEEK_END)
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        # Hand the records to the OS right away, so a crash of this process loses nothing
+        self._file.flush()
+        if self.fsync == FsyncPolicy.ALWAYS:
+            os.fsync(self._file.fileno())
+        elif self.fsync == FsyncPolicy.INTERVAL:
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+
+    def clear(self) -> None:
+        """Replace the file with an empty history"""
+        with self._lock:
+            self.close()
+            temp_path = f"{self.file_path}.clear"
+            with open(temp_path, "wb") as f:
+                f.write(MAGIC + bytes([self._new_codec]))
+            os.replace(temp_path, self.file_path)
+            self._codec = None
+            self._cache = []
+            self._complete = True
+            self._length = 0
+
+    def close(self):
+        """fsync pending writes (unless the policy is NEVER) and close the file"""
+        with self._lock:
+            if self._file is None:
+                return
+            if self.fsync != FsyncPolicy.NEVER:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+def migrate_json_to_binary(json_path: str, binary_path: str, codec: int | None = None):
+    """Convert a FileChatMessageHistory JSON array into a binary history, keeping the original"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    temp_path = f"{binary_path}.migrate"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    history = BinaryChatMessageHistory(temp_path, codec=codec, fsync=FsyncPolicy.NEVER)
+    history.add_messages(messages_from_dict(items))
+    history.close()
+    with open(temp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, binary_path)
@@ -0,0 +1,185 @@
+"""
+Concurrency layer for session histories.
+
+RunnableWithMessageHistory reads a session's history, runs the chain and only then
+appends the new human and AI messages. Two concurrent turns of the same session
+therefore both answer without seeing each other, and their messages are appended in
+completion order instead of arrival order. SessionSerializedRunnable runs the turns of
+one session one after the other:
+
+- locks are striped: a session maps to one of `stripes` locks by a stable hash, so memory
+  stays fixed however many sessions there are, and sessions on different stripes never
+  contend
+- waiters get the lock in FIFO order (asyncio.Lock is fair; threading.Lock makes no such
+  promise, so sync turns use FifoLock, which hands the lock to the oldest waiter), so the
+  turns of a session are applied in the order they arrived, and every turn sees all
+  earlier turns
+- it is a Runnable: invoke/ainvoke/stream/astream hold the session's lock for the whole
+  turn, and batch, with_config and | work as usual
+- stats() reports turns, how many had to wait, and the largest number of turns waiting
+  on one stripe
+
+    chain_with_memory = SessionSerializedRunnable(RunnableWithMessageHistory(chain, ...))
+    await asyncio.gather(*(chain_with_memory.ainvoke(...) for ...))
+
+The async locks belong to the event loop that first waits on them, so share one
+SessionSerializedRunnable per event loop. Sync and async calls are serialized separately,
+so do not mix invoke() and ainvoke() on the same session.
+"""
+import asyncio
+import threading
+import zlib
+from collections import deque
+from typing import Any, AsyncIterator, Iterator
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+class FifoLock:
+    """A thread lock that is handed to waiters in the order they called acquire()"""
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._locked = False
+        # One parked (already acquired) lock per waiting thread; release() unparks the oldest
+        self._waiters: deque[threading.Lock] = deque()
+
+    def acquire(self):
+        with self._mutex:
+            if not self._locked:
+                self._locked = True
+                return
+            parked = threading.Lock()
+            parked.acquire()
+            self._waiters.append(parked)
+        # Blocks until release() hands the lock over; _locked stays True in between
+        parked.acquire()
+
+    def release(self):
+        with self._mutex:
+            if self._waiters:
+                self._waiters.popleft().release()
+            else:
+                self._locked = False
+
+    def locked(self) -> bool:
+        return self._locked
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class StripedLocks:
+    """A fixed pool of asyncio and FIFO thread locks, one stripe per session by hash"""
+
+    def __init__(self, stripes: int = 256):
+        self.stripes = stripes
+        self._async_locks = [asyncio.Lock() for _ in range(stripes)]
+        self._thread_locks = [FifoLock() for _ in range(stripes)]
+
+    def stripe(self, session_id: str) -> int:
+        # crc32 is stable across processes, unlike hash() of a str
+        return zlib.crc32(session_id.encode("utf-8")) % self.stripes
+
+    def async_lock(self, session_id: str) -> asyncio.Lock:
+        return self._async_locks[self.stripe(session_id)]
+
+    def thread_lock(self, session_id: str) -> FifoLock:
+        return self._thread_locks[self.stripe(session_id)]
+
+
+class SessionSerializedRunnable(Runnable):
+    """Runs the turns of each session one at a time, in arrival order; different sessions run concurrently"""
+
+    def __init__(self, runnable: Runnable, stripes: int = 256, session_key: str = "session_id"):
+        self.runnable = runnable
+        self.session_key = session_key
+        self.locks = StripedLocks(stripes)
+        self._stats_lock = threading.Lock()
+        self._waiting = [0] * stripes
+        self.turns = 0
+        self.contended_turns = 0
+        self.max_waiting = 0
+
+    @property
+    def InputType(self):
+        return self.runnable.InputType
+
+    @property
+    def OutputType(self):
+        return self.runnable.OutputType
+
+    def _session_id(self, config: RunnableConfig | None) -> str:
+        try:
+            return str(config["configurable"][self.session_key])
+        except (TypeError, KeyError):
+            raise ValueError(f"config['configurable']['{self.session_key}'] is required") from None
+
+    def _arrive(self, session_id: str, locked: bool):
+        """Count the turn, and whether it has to wait behind another one"""
+        stripe = self.locks.stripe(session_id)
+        with self._stats_lock:
+            self.turns += 1
+            if locked:
+                self.contended_turns += 1
+            self._waiting[stripe] += 1
+            self.max_waiting = max(self.max_waiting, self._waiting[stripe])
+
+    def _depart(self, session_id: str):
+        with self._stats_lock:
+            self._waiting[self.locks.stripe(session_id)] -= 1
+
+    def invoke(self, input: Any, config: RunnableConfig | None = None, **kwargs: Any) -> Any:
+        session_id = self._session_id(config)
+        lock = self.locks.thread_lock(session_id)
+        self._arrive(session_id, lock.locked())
+        try:
+            with lock:
+                return self.runnable.invoke(input, config, **kwargs)
+        finally:
+            self._depart(session_id)
+
+    async def ainvoke(self, input: Any, config: RunnableConfig | None = None, **kwargs: Any) -> Any:
+        session_id = self._session_id(config)
+        lock = self.locks.async_lock(session_id)
+        self._arrive(session_id, lock.locked())
+        try:
+            async with lock:
+                return await self.runnable.ainvoke(input, config, **kwargs)
+        finally:
+            self._depart(session_id)
+
+    def stream(self, input: Any, config: RunnableConfig | None = None, **kwargs: Any) -> Iterator[Any]:
+        """Stream one turn; the session stays locked until the stream is exhausted"""
+        session_id = self._session_id(config)
+        lock = self.locks.thread_lock(session_id)
+        self._arrive(session_id, lock.locked())
+        try:
+            with lock:
+                yield from self.runnable.stream(input, config, **kwargs)
+        finally:
+            self._depart(session_id)
+
+    async def astream(self, input: Any, config: RunnableConfig | None = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """Stream one turn; the session stays locked until the stream is exhausted"""
+        session_id = self._session_id(config)
+        lock = self.locks.async_lock(session_id)
+        self._arrive(session_id, lock.locked())
+        try:
+            async with lock:
+                async for chunk in self.runnable.astream(input, config, **kwargs):
+                    yield chunk
+        finally:
+            self._depart(session_id)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "turns": self.turns,
+                "contended_turns": self.contended_turns,
+                "max_waiting": self.max_waiting,
+            }
@@ -3,7 +3,7 @@ Exploration of built-in LangChain options for conversation summarization
 """
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain.memory import ConversationSummaryBufferMemory
-from langchain_openai import ChatOpenAI
+from llm_pool import get_chat_model
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -60,7 +60,7 @@ def explore_legacy_options():
 def try_summary_buffer_memory():
     print("\n\n=== Can We Adapt ConversationSummaryBufferMemory? ===\n")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
     print("🧪 Testing ConversationSummaryBufferMemory...")
     
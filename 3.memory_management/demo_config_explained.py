@@ -2,7 +2,7 @@
 Detailed explanation of the config parameter in RunnableWithMessageHistory
 """
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from llm_pool import get_chat_model
 from langchain_core.runnables import RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
 from langchain_community.chat_message_histories import ChatMessageHistory
@@ -26,7 +26,7 @@ def get_session_history(session_id: str) -> ChatMessageHistory:
 def demo_config_parameter():
     print("=== Understanding the config parameter ===\n")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a helpful assistant."),
@@ -99,7 +99,7 @@ def demo_config_flow():
 def demo_what_if_no_config():
     print("\n\n=== What happens without config? ===\n")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a helpful assistant."),
@@ -2,10 +2,10 @@
 Demonstration of CORRECT summarization timing in LCEL
 """
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
 from langchain_community.chat_message_histories import ChatMessageHistory
+from llm_pool import get_chat_model, shared_chain
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,6 +13,15 @@ load_dotenv()
 # Store for session histories
 store = {}
 
+def create_summary_chain():
+    """Summarization chain on the shared model client"""
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
+    summary_prompt = ChatPromptTemplate.from_messages([
+        ("system", "Summarize this conversation in 2-3 sentences:"),
+        ("human", "{conversation}")
+    ])
+    return summary_prompt | llm | StrOutputParser()
+
 def verbose_get_session_history(session_id: str) -> ChatMessageHistory:
     """Session history with verbose logging to show when summarization happens"""
     if session_id not in store:
@@ -26,13 +35,8 @@ def verbose_get_session_history(session_id: str) -> ChatMessageHistory:
     if len(history.messages) > 10:  # This is the key check
         print(f"📝 TRIGGERING SUMMARY: {len(history.messages)} messages > 10 limit")
         
-        # Create summarization chain
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-        summary_prompt = ChatPromptTemplate.from_messages([
-            ("system", "Summarize this conversation in 2-3 sentences:"),
-            ("human", "{conversation}")
-        ])
-        summary_chain = summary_prompt | llm | StrOutputParser()
+        # Get the summarization chain: built on the first trigger, reused by every later one
+        summary_chain = shared_chain("timing_demo_summary", create_summary_chain)
         
         # Get messages to summarize (all but last 4)
         messages_to_summarize = history.messages[:-4]
@@ -66,7 +70,7 @@ def demo_correct_timing():
     """Show the CORRECT timing of when summarization happens"""
     print("=== CORRECT Summarization Timing Demo ===\n")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a helpful assistant. Be brief."),
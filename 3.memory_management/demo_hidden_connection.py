@@ -2,7 +2,7 @@
 Demonstration showing the hidden connection in main.py
 """
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from llm_pool import get_chat_model
 from langchain_core.runnables import RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
 from langchain_community.chat_message_histories import ChatMessageHistory
@@ -20,7 +20,7 @@ def get_session_history(session_id: str) -> ChatMessageHistory:
 def show_hidden_connection():
     print("=== The Hidden Connection in main.py ===\n")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
     # This is EXACTLY what's in main.py
     prompt = ChatPromptTemplate.from_messages([
@@ -82,7 +82,7 @@ def show_hidden_connection():
 def show_what_if_names_dont_match():
     print("\n\n=== What if the names DON'T match? ===\n")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
     # Mismatched names - this will break!
     prompt = ChatPromptTemplate.from_messages([
@@ -2,7 +2,7 @@
 Detailed demonstration showing exactly what MessagesPlaceholder does
 """
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from llm_pool import get_chat_model
 from langchain_core.runnables import RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
 from langchain_community.chat_message_histories import ChatMessageHistory
@@ -69,7 +69,7 @@ def demo_memory_mapping():
         return store[session_id]
     
     # Setup
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a helpful assistant."),
@@ -2,7 +2,7 @@
 Comparison: Legacy ConversationSummaryMemory vs Modern LCEL approach
 """
 from langchain.memory import ConversationSummaryMemory
-from langchain_openai import ChatOpenAI
+from llm_pool import get_chat_model
 from langchain_community.chat_message_histories import ChatMessageHistory
 from dotenv import load_dotenv
 
@@ -14,7 +14,7 @@ def demo_legacy_approach():
     print("🔺 OLD WAY (with actual working code):")
     
     # Actually demonstrate the legacy approach
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
     # Create legacy summary memory
     print("📝 Creating ConversationSummaryMemory...")
@@ -124,7 +124,7 @@ def demo_modern_approach():
             print(f"   Kept {len(recent_messages)} recent messages")
             print(f"   Total messages now: {len(self.messages)}")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
     print("📝 Creating SummarizingChatMessageHistory...")
     modern_memory = SummarizingChatMessageHistory(llm, max_messages=8, summary_message_count=4)
@@ -2,7 +2,7 @@
 Show exactly when FileChatMessageHistory saves during RunnableWithMessageHistory execution
 """
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from llm_pool import get_chat_model
 from langchain_core.runnables import RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
 from langchain_community.chat_message_histories import FileChatMessageHistory
@@ -37,7 +37,7 @@ def demo_save_timing():
     if os.path.exists(demo_file):
         os.remove(demo_file)
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a helpful assistant. Keep responses brief."),
@@ -0,0 +1,210 @@
+"""
+Append-only JSONL chat history.
+
+FileChatMessageHistory re-reads and rewrites the whole JSON array on every add_message()
+(see demo_file_autosave_internals.py), so one turn costs O(n) and a long conversation O(n²).
+JSONLChatMessageHistory writes one JSON line per message instead:
+
+- add_message() appends a single line, so a write costs the same at message 10 and 10,000
+- the file is only read the first time .messages is accessed (lazy load), later reads
+  come from memory
+- clear() appends a marker line instead of truncating, so the log stays append-only
+- lines made obsolete by clear() (and a torn last line after a crash) are dropped by a
+  background compaction that rewrites the file and atomically swaps it in
+- fsync is configurable: after every write, at most once per interval, or never
+
+The lines use the same message dicts as FileChatMessageHistory, so a legacy
+conversation_<id>.json file converts with migrate_json_history().
+"""
+import json
+import os
+import threading
+import time
+from enum import Enum
+from typing import Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+# Written by clear(): every line before it is obsolete
+CLEAR_MARKER = {"type": "__clear__"}
+
+
+class FsyncPolicy (Enum):
+    # fsync after every write: survives power loss, slowest
+    ALWAYS = "always"
+    # fsync at most once per fsync_interval seconds (and on close)
+    INTERVAL = "interval"
+    # leave it to the OS: survives a process crash, not a power loss
+    NEVER = "never"
+
+
+class JSONLChatMessageHistory(BaseChatMessageHistory):
+    """Chat message history stored as one JSON line per message"""
+
+    def __init__(
+            self,
+            file_path: str,
+            fsync: FsyncPolicy = FsyncPolicy.INTERVAL,
+            fsync_interval: float = 1.0,
+            compact_min_dead_lines: int = 1000,
+            compact_dead_ratio: float = 0.5):
+        self.file_path = file_path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compact_min_dead_lines = compact_min_dead_lines
+        self.compact_dead_ratio = compact_dead_ratio
+        self._lock = threading.RLock()
+        self._file = None
+        self._last_fsync = time.monotonic()
+        # None until the file is read for the first time
+        self._messages: list[BaseMessage] | None = None
+        # Lines in the file that compaction would drop; counted when the file is loaded
+        self._dead_lines = 0
+        self._total_lines = 0
+        self._compaction: threading.Thread | None = None
+
+    @property
+    def messages(self) -> list[BaseMessage]:  # type: ignore[override]
+        """Messages of the conversation, read from the file on first access only"""
+        with self._lock:
+            if self._messages is None:
+                self._load()
+                # e.g. a log that was cleared many times before the last restart
+                self._maybe_compact()
+            return list(self._messages)
+
+    def _load(self):
+        items = []
+        total = dead = 0
+        if os.path.exists(self.file_path):
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    total += 1
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash mid-write
+                        dead += 1
+                        continue
+                    if item == CLEAR_MARKER:
+                        dead += len(items) + 1
+                        items = []
+                    else:
+                        items.append(item)
+        self._messages = messages_from_dict(items)
+        self._total_lines = total
+        self._dead_lines = dead
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Append the messages as JSON lines in a single write"""
+        if not messages:
+            return
+        lines = "".join(
+            json.dumps(item, ensure_ascii=False) + "\n" for item in messages_to_dict(list(messages))
+        )
+        with self._lock:
+            self._append(lines)
+            self._total_lines += len(messages)
+            if self._messages is not None:
+                self._messages.extend(messages)
+
+    def clear(self) -> None:
+        """Forget the conversation by appending a clear marker; compaction reclaims the space"""
+        with self._lock:
+            if self._messages is None:
+                self._load()
+            self._append(json.dumps(CLEAR_MARKER) + "\n")
+            self._total_lines += 1
+            self._dead_lines = self._total_lines
+            self._messages = []
+        self._maybe_compact()
+
+    def _append(self, data: str):
+        if self._file is None:
+            directory = os.path.dirname(self.file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.file_path, "a", encoding="utf-8")
+            # After a crash mid-write the last line has no newline; start on a fresh line
+            # so the torn line does not swallow the next message
+            if self._file.tell() > 0 and not self._ends_with_newline():
+                data = "\n" + data
+        self._file.write(data)
+        # Hand the line to the OS right away, so a crash of this process loses nothing
+        self._file.flush()
+        if self.fsync == FsyncPolicy.ALWAYS:
+            os.fsync(self._file.fileno())
+        elif self.fsync == FsyncPolicy.INTERVAL:
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.file_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _maybe_compact(self):
+        with self._lock:
+            if self._dead_lines < self.compact_min_dead_lines:
+                return
+            if self._dead_lines < self._total_lines * self.compact_dead_ratio:
+                return
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = threading.Thread(target=self.compact, daemon=True)
+            self._compaction.start()
+
+    def compact(self):
+        """Rewrite the file with only the live messages and atomically replace it"""
+        with self._lock:
+            if self._messages is None:
+                self._load()
+            if self._dead_lines == 0:
+                return
+            temp_path = f"{self.file_path}.compact"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for item in messages_to_dict(self._messages):
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            os.replace(temp_path, self.file_path)
+            self._total_lines = len(self._messages)
+            self._dead_lines = 0
+
+    def wait_for_compaction(self):
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+
+    def close(self):
+        """fsync pending writes (unless the policy is NEVER) and close the file"""
+        self.wait_for_compaction()
+        with self._lock:
+            if self._file is None:
+                return
+            if self.fsync != FsyncPolicy.NEVER:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+def migrate_json_history(json_path: str, jsonl_path: str):
+    """Convert a FileChatMessageHistory JSON array into a JSONL history, keeping the original"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    temp_path = f"{jsonl_path}.migrate"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, jsonl_path)
@@ -0,0 +1,116 @@
+"""
+Process-wide pool of chat model clients.
+
+The summarizing histories used to build a new ChatOpenAI for every session, and the
+timing demo built a ChatOpenAI, a prompt and a chain every time a summary was triggered.
+Each ChatOpenAI constructs its own OpenAI sync and async clients. This module hands out
+shared instances instead:
+
+- get_chat_model() returns one ChatOpenAI per (model, temperature, options), created on
+  first use and reused by every history and chain in the process
+- all of them send their requests through one httpx.Client / httpx.AsyncClient with a
+  bounded, keep-alive connection pool, so a turn reuses an open (already TLS-handshaked)
+  connection instead of opening a new one
+- shared_chain() builds a chain (e.g. the summarization chain) once per key
+- with MODEL_VENDOR=local, get_chat_model() returns the offline FakeChatModel from
+  4.context_with_embedding/local_providers.py instead (no API key, configurable latency)
+
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
+    summary_chain = shared_chain(("summary", id(llm)), lambda: summary_prompt | llm | StrOutputParser())
+
+The async client's connections belong to the event loop that opened them, so use one event
+loop per process for async calls, as a server does.
+"""
+import asyncio
+import os
+import sys
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Hashable
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+
+# Connections kept open between requests, shared by every model in the process
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+# The offline providers live in 4.context_with_embedding, like the embedding providers
+LOCAL_PROVIDERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "4.context_with_embedding")
+if LOCAL_PROVIDERS_DIR not in sys.path:
+    sys.path.append(LOCAL_PROVIDERS_DIR)
+
+from local_providers import is_local_vendor, load_local_chat_model  # noqa: E402
+
+_lock = threading.Lock()
+_models: dict[tuple, BaseChatModel] = {}
+_chains: dict[Hashable, Runnable] = {}
+
+
+@lru_cache(maxsize=1)
+def shared_http_client() -> httpx.Client:
+    return httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+
+@lru_cache(maxsize=1)
+def shared_async_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+
+def get_chat_model(model: str = "gpt-4o-mini", temperature: float = 0, **kwargs: Any) -> BaseChatModel:
+    """The shared ChatOpenAI for these settings; extra options (e.g. base_url) must be hashable"""
+    local = is_local_vendor()
+    key = (local, model, temperature, tuple(sorted(kwargs.items())))
+    with _lock:
+        llm = _models.get(key)
+        if llm is None:
+            if local:
+                llm = load_local_chat_model()
+            else:
+                llm = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    http_client=shared_http_client(),
+                    http_async_client=shared_async_http_client(),
+                    **kwargs
+                )
+            _models[key] = llm
+        return llm
+
+
+def shared_chain(key: Hashable, build: Callable[[], Runnable]) -> Runnable:
+    """The chain built by `build` for this key, built once per process"""
+    with _lock:
+        chain = _chains.get(key)
+    if chain is not None:
+        return chain
+    # Built outside the lock: `build` usually calls get_chat_model(), which takes it too.
+    # If two threads race, both build and the first one stored wins.
+    chain = build()
+    with _lock:
+        return _chains.setdefault(key, chain)
+
+
+def close():
+    """Close the shared connections, e.g. on shutdown"""
+    if shared_http_client.cache_info().currsize:
+        shared_http_client().close()
+    if shared_async_http_client.cache_info().currsize:
+        client = shared_async_http_client()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(client.aclose())
+        else:
+            # Called from async code: the close finishes on this loop
+            loop.create_task(client.aclose())
+
+
+async def aclose():
+    """close() for async code: waits until the async client's connections are closed"""
+    if shared_http_client.cache_info().currsize:
+        shared_http_client().close()
+    if shared_async_http_client.cache_info().currsize:
+        await shared_async_http_client().aclose()
@@ -1,27 +1,23 @@
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from llm_pool import get_chat_model
 from langchain_core.runnables import RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.chat_message_histories import ChatMessageHistory
+from sqlite_chat_history import create_session_history_factory
+from concurrent_history import SessionSerializedRunnable
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
-# Store for session histories - in production, this would be a database
-store = {}
-
-def get_session_history(session_id: str) -> ChatMessageHistory:
-    """Get or create a chat message history for the given session ID"""
-    if session_id not in store:
-        store[session_id] = ChatMessageHistory()
-    return store[session_id]
+# Session histories live in a SQLite database, so they survive restarts and can be shared
+# between worker processes. Only the last 20 messages are loaded into the prompt.
+get_session_history = create_session_history_factory("conversations.db", window=20)
 
 
 def main():
     print("Hello from 3-memory-management!")
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
 
     # Create a prompt template that includes a placeholder for chat history
     prompt = ChatPromptTemplate.from_messages([
@@ -33,13 +29,14 @@ def main():
     # Create a chain
     chain = prompt | llm | StrOutputParser()
 
-    # Create a chain that will use the memory
-    chain_with_memory = RunnableWithMessageHistory(
+    # Create a chain that will use the memory. Turns of the same session run one at a time,
+    # in arrival order, so concurrent requests never lose or reorder messages.
+    chain_with_memory = SessionSerializedRunnable(RunnableWithMessageHistory(
         chain,
         get_session_history,
         input_messages_key="content",
         history_messages_key="history" # This must match the variable_name in the MessagesPlaceholder
-    )
+    ))
 
     while True:
         user_input = input(">> ")
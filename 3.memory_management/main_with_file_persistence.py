@@ -2,39 +2,103 @@
 Memory management with file persistence using modern LCEL approach
 """
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from llm_pool import get_chat_model
 from langchain_core.runnables import RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.chat_message_histories import FileChatMessageHistory
+from jsonl_chat_history import JSONLChatMessageHistory, migrate_json_history
+from binary_chat_history import BinaryChatMessageHistory, migrate_json_to_binary
+from session_cache import SessionCache
+from session_catalog import CatalogedChatMessageHistory, SessionCatalog, session_file_name, shard_dir
 from dotenv import load_dotenv
 import os
+import time
 
 load_dotenv()
-#   How does the message get saved automatically in FileChatMessageHistory?
-#   The magic is simple: FileChatMessageHistory overrides the add_message() method to save to disk every
+
+# File format of new conversations: "jsonl" (readable, one line per message) or "binary"
+# (compact records, opening a session only reads the last HISTORY_WINDOW messages)
+HISTORY_FORMAT = os.getenv("HISTORY_FORMAT", "jsonl").lower()
+HISTORY_WINDOW = 50
+
+# Number of sessions listed at startup
+RECENT_SESSIONS_SHOWN = 20
+#   How does the message get saved automatically in JSONLChatMessageHistory?
+#   The magic is simple: JSONLChatMessageHistory overrides the add_message() method to save to disk every
 #   time it's called. Since RunnableWithMessageHistory calls this method for both user input and AI
 #   responses, everything gets saved automatically!
-def get_session_history(session_id: str) -> FileChatMessageHistory:
-    """Get or create a file-based chat message history for the given session ID"""
-    # Create a directory for conversation files if it doesn't exist
-    conversations_dir = "conversations"
-    if not os.path.exists(conversations_dir):
-        os.makedirs(conversations_dir)
-    
-    # Each session gets its own file
-    file_path = os.path.join(conversations_dir, f"conversation_{session_id}.json")
+#   Unlike FileChatMessageHistory, which rewrites the whole JSON file on every message, it only appends
+#   one line per message, so saving stays fast no matter how long the conversation gets.
+
+CONVERSATIONS_DIR = "conversations"
+
+# Index of every session (path, message count, last update, size), so listing sessions
+# never has to scan the conversation directories. The database is opened on first use.
+catalog = SessionCatalog(os.path.join(CONVERSATIONS_DIR, "catalog.db"))
+
+def open_file_history(path: str) -> JSONLChatMessageHistory | BinaryChatMessageHistory:
+    if path.endswith(".bin"):
+        # Only the tail of the file is read when the session is opened
+        return BinaryChatMessageHistory(path, window=HISTORY_WINDOW)
+    # JSONLChatMessageHistory loads the existing conversation on first use
+    return JSONLChatMessageHistory(path)
+
+def open_session_history(session_id: str) -> CatalogedChatMessageHistory:
+    """Open the file-based chat message history of the given session ID"""
+    info = catalog.get(session_id)
+    if info is not None:
+        # A known session: the catalog has its path, no filesystem checks needed
+        file_path = info.path
+    else:
+        # A new session gets a file in its shard directory (created once per process)
+        extension = ".bin" if HISTORY_FORMAT == "binary" else ".jsonl"
+        file_path = os.path.join(shard_dir(CONVERSATIONS_DIR, session_id), session_file_name(session_id, extension))
     
     print(f"💾 Using conversation file: {file_path}")
     
-    # FileChatMessageHistory automatically loads existing conversations from the file
-    return FileChatMessageHistory(file_path)
+    # The wrapper keeps the session's catalog entry up to date as messages are added
+    return CatalogedChatMessageHistory(open_file_history(file_path), catalog, session_id, file_path)
+
+def import_unsharded_conversations():
+    """Move conversations saved directly in conversations/ into shard directories and the catalog"""
+    entries = [entry for entry in os.scandir(CONVERSATIONS_DIR) if entry.is_file() and entry.name.startswith("conversation_")]
+    for entry in sorted(entries, key=lambda entry: entry.name):
+        session_id, extension = os.path.splitext(entry.name[len("conversation_"):])
+        if extension not in (".json", ".jsonl", ".bin") or catalog.get(session_id) is not None:
+            continue
+        updated_at = entry.stat().st_mtime
+        target_dir = shard_dir(CONVERSATIONS_DIR, session_id)
+        if extension == ".json":
+            # Conversations saved by FileChatMessageHistory are converted once
+            if HISTORY_FORMAT == "binary":
+                file_path = os.path.join(target_dir, f"conversation_{session_id}.bin")
+                migrate_json_to_binary(entry.path, file_path)
+            else:
+                file_path = os.path.join(target_dir, f"conversation_{session_id}.jsonl")
+                migrate_json_history(entry.path, file_path)
+            os.remove(entry.path)
+        else:
+            file_path = os.path.join(target_dir, entry.name)
+            os.replace(entry.path, file_path)
+        history = open_file_history(file_path)
+        message_count = len(history) if isinstance(history, BinaryChatMessageHistory) else len(history.messages)
+        catalog.reset(session_id, file_path, message_count=message_count, updated_at=updated_at)
+        print(f"🔁 Moved {entry.path} to {file_path}")
+
+# Open histories are cached, so a file is only loaded once while its session is active.
+# The cache is bounded: idle and least recently used sessions are closed and dropped from
+# memory (their messages are already on disk).
+histories = SessionCache(create_history=open_session_history, max_sessions=256, idle_ttl=30 * 60)
+
+def get_session_history(session_id: str) -> CatalogedChatMessageHistory:
+    """Get or create a file-based chat message history for the given session ID"""
+    return histories.get_session_history(session_id)
 
 def main():
     print("Hello from 3-memory-management with file persistence!")
     print("💾 Conversations will be saved to files automatically")
     print("🔄 Previous conversations will be loaded when you restart")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
 
     # Create a prompt template that includes a placeholder for chat history
     prompt = ChatPromptTemplate.from_messages([
@@ -49,20 +113,23 @@ def main():
     # Create a chain that will use the memory
     chain_with_memory = RunnableWithMessageHistory(
         chain,
-        get_session_history,  # Now returns FileChatMessageHistory instead of ChatMessageHistory
+        get_session_history,  # Now returns a cataloged JSONL or binary file history instead of ChatMessageHistory
         input_messages_key="content",
         history_messages_key="history"
     )
 
-    # Show existing conversations
-    conversations_dir = "conversations"
-    if os.path.exists(conversations_dir):
-        existing_files = [f for f in os.listdir(conversations_dir) if f.endswith('.json')]
-        if existing_files:
-            print(f"\n📁 Found {len(existing_files)} existing conversation(s):")
-            for file in existing_files:
-                session_id = file.replace('conversation_', '').replace('.json', '')
-                print(f"   - Session ID: {session_id}")
+    # Conversations from before the catalog (including legacy .json files) are imported once
+    import_unsharded_conversations()
+
+    # Show existing conversations: an index scan of the catalog, however many sessions there are
+    session_count = len(catalog)
+    if session_count:
+        print(f"\n📁 Found {session_count} existing conversation(s), most recent first:")
+        for info in catalog.most_recent(RECENT_SESSIONS_SHOWN):
+            updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(info.updated_at))
+            print(f"   - Session ID: {info.session_id} ({info.message_count} messages, updated {updated})")
+        if session_count > RECENT_SESSIONS_SHOWN:
+            print(f"   ... and {session_count - RECENT_SESSIONS_SHOWN} more")
 
     print("\n💬 Start chatting! Type 'exit' to quit.")
     print("🔧 Try different session IDs to create separate conversations.")
@@ -77,6 +144,8 @@ def main():
     while True:
         user_input = input(">> ")
         if user_input == "exit":
+            histories.close()
+            catalog.close()
             print("💾 Conversation automatically saved to file!")
             print("🔄 Restart the program to load this conversation again.")
             break
@@ -2,128 +2,211 @@
 Production-ready LCEL conversation with automatic summarization
 """
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
-from langchain_core.runnables import RunnableWithMessageHistory
+from langchain_core.runnables import RunnablePassthrough, RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.messages import SystemMessage
 from langchain_community.chat_message_histories import ChatMessageHistory
+from sqlite_chat_history import create_session_history_factory
+from session_cache import SessionCache
+from token_budget import TokenCounter, trim_to_budget
+from llm_pool import get_chat_model, shared_chain
+from typing import Any
+from concurrent.futures import Future, ThreadPoolExecutor
+from pydantic import PrivateAttr
+import threading
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+# Marks the persisted message that carries the summary (see export_messages)
+SUMMARY_KEY = "conversation_summary"
+
+# Hard cap for the history placeholder: also holds while a summary is still being created
+HISTORY_TOKEN_BUDGET = 3000
+
+def create_summary_chain(llm):
+    summary_prompt = ChatPromptTemplate.from_messages([
+        ("system", "Summarize the following conversation concisely. Focus on key information about the person, important topics discussed, and any relevant context. Keep it brief but informative."),
+        ("human", "Previous summary: {summary}\n\nNew messages:\n{conversation}")
+    ])
+    return summary_prompt | llm | StrOutputParser()
+
 class SummarizingChatMessageHistory(ChatMessageHistory):
     """Enhanced ChatMessageHistory that automatically summarizes long conversations"""
+
+    # ChatMessageHistory is a pydantic model, so every attribute has to be declared as a field
+    llm: Any = None
+    # Summarize once the history is larger than max_tokens...
+    max_tokens: int = 2000
+    # ...keeping the newest messages that fit in recent_tokens as-is
+    recent_tokens: int = 500
+    # Rolling summary of everything before `messages`; `messages` only holds what is not summarized yet
+    summary: str = ""
+    summary_chain: Any = None
+    # Background summary state, guarded by _lock
+    _lock: Any = PrivateAttr(default_factory=threading.RLock)
+    _pending_summary: Future | None = PrivateAttr(default=None)
+    _generation: int = PrivateAttr(default=0)
+    # Token count of every message, updated as messages are added
+    _tokens: TokenCounter = PrivateAttr(default_factory=TokenCounter)
     
-    def __init__(self, llm, max_messages=10, summary_message_count=6):
-        super().__init__()
-        self.llm = llm
-        self.max_messages = max_messages
-        self.summary_message_count = summary_message_count
-        self.summary_prefix = "[CONVERSATION SUMMARY]"
+    def __init__(self, llm, max_tokens=2000, recent_tokens=500):
+        super().__init__(
+            llm=llm,
+            max_tokens=max_tokens,
+            recent_tokens=recent_tokens
+        )
         
-        # Create summarization chain
-        summary_prompt = ChatPromptTemplate.from_messages([
-            ("system", "Summarize the following conversation concisely. Focus on key information about the person, important topics discussed, and any relevant context. Keep it brief but informative."),
-            ("human", "{conversation}")
-        ])
-        self.summary_chain = summary_prompt | llm | StrOutputParser()
+        # Summarization chain: it only ever sees the previous summary plus the new messages.
+        # Built once per model and shared by every session.
+        self.summary_chain = shared_chain(("summary", id(llm)), lambda: create_summary_chain(llm))
     
     def add_message(self, message):
-        """Add message and summarize if conversation gets too long"""
-        super().add_message(message)
-        
-        # Check if we need to summarize
-        if len(self.messages) > self.max_messages:
-            self._summarize_conversation()
+        """Add message and start a background summary if conversation gets too long"""
+        with self._lock:
+            super().add_message(message)
+            self._tokens.append(message)
+            
+            # Check if we need to summarize; never more than one summary in flight per session
+            if self._tokens.total > self.max_tokens and self._pending_summary is None:
+                self._summarize_conversation()
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self.summary = ""
+            self._tokens.reset()
+            # A summary that is still running belongs to the old conversation
+            self._generation += 1
     
     def _summarize_conversation(self):
-        """Summarize older messages and keep recent ones"""
-        print(f"📝 Conversation has {len(self.messages)} messages, summarizing...")
-        
-        # Find existing summary
-        summary_index = None
-        for i, msg in enumerate(self.messages):
-            if msg.content.startswith(self.summary_prefix):
-                summary_index = i
-                break
-        
-        # Determine which messages to summarize
-        if summary_index is not None:
-            # There's already a summary, update it with messages after the summary
-            # but keep the last few messages as-is
-            messages_to_summarize = self.messages[summary_index+1:-self.summary_message_count]
-            recent_messages = self.messages[-self.summary_message_count:]
-            old_summary = self.messages[summary_index].content[len(self.summary_prefix):].strip()
-        else:
-            # No existing summary, summarize all but recent messages
-            messages_to_summarize = self.messages[:-self.summary_message_count]
-            recent_messages = self.messages[-self.summary_message_count:]
-            old_summary = ""
+        """Summarize the messages added since the last summary in the background; recent ones are kept as-is"""
+        print(f"📝 Conversation has {self._tokens.total} tokens, summarizing in the background...")
         
-        if not messages_to_summarize:
+        # The newest messages that fit in recent_tokens are kept as-is (at least the last one).
+        # Everything before them arrived after the last summary, so only this delta is sent.
+        recent_start = self._tokens.recent_start(self.recent_tokens)
+        if recent_start == 0:
             return  # Nothing to summarize
         
-        # Convert messages to text
-        conversation_text = ""
-        if old_summary:
-            conversation_text += f"Previous summary: {old_summary}\n\nRecent conversation:\n"
-        
-        conversation_text += "\n".join([
-            f"{msg.type}: {msg.content}" for msg in messages_to_summarize
+        # Convert the new messages to text
+        conversation_text = "\n".join([
+            f"{msg.type}: {msg.content}" for msg in self.messages[:recent_start]
         ])
-        
-        # Create new summary
+
+        # The summarized messages are dropped once the summary is ready. Messages added
+        # while the summary is being created come after them and are kept.
+        self._pending_summary = summary_executor.submit(
+            self._create_summary, self.summary, conversation_text, recent_start, self._generation
+        )
+
+    def _create_summary(self, old_summary, conversation_text, summarized_count, generation):
+        """Runs on the summary worker pool, off the request path"""
         try:
-            new_summary = self.summary_chain.invoke({"conversation": conversation_text})
-            print(f"📄 Created summary: {new_summary[:100]}...")
-            
-            # Rebuild messages list with new summary + recent messages
-            self.messages = []
-            self.add_ai_message(f"{self.summary_prefix} {new_summary}")
-            
-            for msg in recent_messages:
-                super().add_message(msg)  # Use super() to avoid recursion
-            
-            print(f"📊 Conversation summarized: now {len(self.messages)} messages")
-            
+            new_summary = self.summary_chain.invoke({
+                "summary": old_summary or "(none yet)",
+                "conversation": conversation_text
+            })
         except Exception as e:
             print(f"❌ Failed to create summary: {e}")
+            with self._lock:
+                self._pending_summary = None
+            return
+        print(f"📄 Created summary: {new_summary[:100]}...")
+
+        # Swap the summary in atomically: until this point every turn used the un-summarized window
+        with self._lock:
+            self._pending_summary = None
+            if generation != self._generation:
+                return  # The conversation was cleared in the meantime
+            self.summary = new_summary
+            # Drop the summarized messages in place, the rest of the list is untouched
+            del self.messages[:summarized_count]
+            self._tokens.replace_prefix(summarized_count, [])
+            print(f"📊 Conversation summarized: now {len(self.messages)} messages, {self._tokens.total} tokens")
+
+    def wait_for_summary(self, timeout=None):
+        """Block until the summary in flight (if any) has been swapped in"""
+        pending = self._pending_summary
+        if pending is not None:
+            pending.result(timeout=timeout)
+
+    def export_messages(self):
+        """Messages to persist: the summary, flagged in additional_kwargs, then the un-summarized messages"""
+        with self._lock:
+            if not self.summary:
+                return list(self.messages)
+            summary_message = SystemMessage(content=self.summary, additional_kwargs={SUMMARY_KEY: True})
+            return [summary_message] + self.messages
 
-# Store for session histories
-store = {}
+    def import_messages(self, messages):
+        """Restore a history saved with export_messages()"""
+        if messages and messages[0].additional_kwargs.get(SUMMARY_KEY):
+            self.summary = messages[0].content
+            messages = messages[1:]
+        # Loading never starts a summary: an over-budget history is summarized on its next turn
+        with self._lock:
+            self.messages.extend(messages)
+            self._tokens.extend(messages)
+
+# Summaries are created on a shared worker pool, so a user's turn never waits for one
+summary_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="summarizer")
+
+def create_summarizing_history(session_id: str) -> SummarizingChatMessageHistory:
+    """Create an empty summarizing history; the cache fills it from SQLite"""
+    # Every session shares one model client and its HTTP connection pool
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
+    print(f"✨ Created new summarizing history for session: {session_id}")
+    return SummarizingChatMessageHistory(
+        llm=llm,
+        max_tokens=2000,  # Start summarizing when the history exceeds 2000 tokens
+        recent_tokens=500  # Keep the newest ~500 tokens of messages as-is
+    )
+
+# Store for session histories: a bounded cache instead of a dict that grows forever.
+# Every turn is written through to SQLite; least recently used and idle sessions are dropped
+# from memory and loaded again from SQLite the next time they are used. Summaries are swapped
+# in by a background thread, so they are also flushed every 30 seconds.
+store = SessionCache(
+    create_history=create_summarizing_history,
+    persistent_tier=create_session_history_factory("summary_conversations.db"),
+    max_sessions=1000,
+    max_bytes=64 * 1024 * 1024,
+    idle_ttl=30 * 60,
+    flush_interval=30
+)
 
 def get_session_history(session_id: str) -> SummarizingChatMessageHistory:
     """Get or create a summarizing chat message history for the given session ID"""
-    if session_id not in store:
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-        store[session_id] = SummarizingChatMessageHistory(
-            llm=llm,
-            max_messages=12,  # Start summarizing after 12 messages
-            summary_message_count=4  # Keep last 4 messages as-is
-        )
-        print(f"✨ Created new summarizing history for session: {session_id}")
-    else:
-        print(f"📚 Using existing history for session: {session_id} ({len(store[session_id].messages)} messages)")
-    
-    return store[session_id]
+    history = store.get_session_history(session_id)
+    print(f"📚 Using history for session: {session_id} ({len(history.messages)} messages)")
+    return history
 
 def main():
     print("Hello from LCEL Conversation Summary Memory!")
     print("🧠 This version automatically summarizes long conversations")
-    print("📏 Conversations are summarized when they exceed 12 messages")
-    print("🔄 Recent 4 messages are always kept for context\n")
+    print("📏 Conversations are summarized when they exceed 2000 tokens")
+    print("🔄 The newest ~500 tokens of messages are always kept for context\n")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
 
     # Create a prompt template that works well with summaries
     prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a helpful assistant. Use the conversation history (including any summaries) to provide contextual and personalized responses."),
+        ("system", "You are a helpful assistant. Use the conversation summary and history to provide contextual and personalized responses."),
+        ("system", "Summary of the earlier conversation: {summary}"),
         MessagesPlaceholder(variable_name="history"),
         ("human", "{content}")
     ])
 
-    # Create a chain
-    chain = prompt | llm | StrOutputParser()
+    # Create a chain; the history is trimmed to the token budget so the prompt size stays
+    # predictable even before a summary has been swapped in. The summary is read straight
+    # from the session's history object, which RunnableWithMessageHistory puts in the config.
+    fit_history = RunnablePassthrough.assign(
+        history=lambda x: trim_to_budget(x["history"], HISTORY_TOKEN_BUDGET),
+        summary=lambda x, config: config["configurable"]["message_history"].summary or "(none yet)"
+    )
+    chain = fit_history | prompt | llm | StrOutputParser()
 
     # Create a chain that will use the summarizing memory
     chain_with_memory = RunnableWithMessageHistory(
@@ -145,17 +228,25 @@ def main():
         user_input = input(">> ")
         
         if user_input == "exit":
+            # Let a summary that is still running finish, then write every cached session back to SQLite
+            history = store.peek(session_id)
+            if history is not None:
+                history.wait_for_summary()
+            store.close()
             print("👋 Goodbye! Your conversation summary is preserved.")
+            print(f"📈 Session cache: {store.stats()}")
             break
         elif user_input == "history":
             # Show current conversation state
-            history = store.get(session_id)
+            history = store.peek(session_id)
             if history:
                 print(f"\n📊 Conversation state: {len(history.messages)} messages")
+                if history.summary:
+                    summary = history.summary[:80] + "..." if len(history.summary) > 80 else history.summary
+                    print(f"   📄 summary: {summary}")
                 for i, msg in enumerate(history.messages):
-                    prefix = "📄" if msg.content.startswith("[CONVERSATION SUMMARY]") else "💬"
                     content = msg.content[:80] + "..." if len(msg.content) > 80 else msg.content
-                    print(f"   {i+1}. {prefix} {msg.type}: {content}")
+                    print(f"   {i+1}. 💬 {msg.type}: {content}")
                 print()
             else:
                 print("📭 No conversation history yet.\n")
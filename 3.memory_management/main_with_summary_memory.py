@@ -2,16 +2,20 @@
 Modern LCEL approach to conversation summary memory
 """
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
-from langchain_core.runnables import RunnableWithMessageHistory
+from langchain_core.runnables import RunnablePassthrough, RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain.memory import ConversationSummaryBufferMemory
+from llm_pool import get_chat_model
 from dotenv import load_dotenv
+from collections import OrderedDict
 import os
 
 load_dotenv()
 
+# Rolling summaries kept for the most recently used sessions; older ones are dropped
+MAX_SUMMARIES = 1000
+
 # Store for session histories - in production, this would be a database
 store = {}
 
@@ -24,7 +28,7 @@ def get_session_history(session_id: str) -> ChatMessageHistory:
 def create_summary_chain():
     """Create a chain that uses conversation summary for long conversations"""
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, verbose=True)
+    llm = get_chat_model("gpt-4o-mini", temperature=0, verbose=True)
     
     # Create prompt template for the main conversation
     prompt = ChatPromptTemplate.from_messages([
@@ -93,15 +97,32 @@ def create_manual_summary_approach():
     """Show how to manually implement summary in modern LCEL"""
     print("\n\n=== Manual Summary Implementation in LCEL ===\n")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
     
-    # Create a summarization chain
+    # Create a summarization chain: it extends the previous summary with the new messages only,
+    # so the summarized text is never sent to the LLM again
     summary_prompt = ChatPromptTemplate.from_messages([
         ("system", "Summarize the following conversation in 2-3 sentences, focusing on key information about the person and topics discussed."),
-        ("human", "Conversation to summarize:\n{conversation}")
+        ("human", "Previous summary: {summary}\n\nNew messages to add to the summary:\n{conversation}")
     ])
     
     summary_chain = summary_prompt | llm | StrOutputParser()
+
+    # The rolling summary of every session lives next to its history, not inside it,
+    # in LRU order and bounded to MAX_SUMMARIES sessions
+    summaries = OrderedDict()
+
+    def get_summary(session_id: str) -> str:
+        if session_id not in summaries:
+            return "(none yet)"
+        summaries.move_to_end(session_id)
+        return summaries[session_id]
+
+    def set_summary(session_id: str, summary: str):
+        summaries[session_id] = summary
+        summaries.move_to_end(session_id)
+        while len(summaries) > MAX_SUMMARIES:
+            summaries.popitem(last=False)
     
     def get_session_history_with_summary(session_id: str) -> ChatMessageHistory:
         """Enhanced session history that maintains summaries"""
@@ -114,7 +135,7 @@ def create_manual_summary_approach():
         if len(history.messages) > 10:  # Summarize when more than 10 messages
             print("📝 Conversation getting long, creating summary...")
             
-            # Get messages to summarize (all but last 4)
+            # Get messages to summarize (all but last 4); they all arrived after the previous summary
             messages_to_summarize = history.messages[:-4]
             
             # Convert messages to text for summarization
@@ -122,36 +143,37 @@ def create_manual_summary_approach():
                 f"{msg.type}: {msg.content}" for msg in messages_to_summarize
             ])
             
-            # Create summary
-            summary = summary_chain.invoke({"conversation": conversation_text})
+            # Create summary from the previous summary plus the new messages
+            summary = summary_chain.invoke({
+                "summary": get_summary(session_id),
+                "conversation": conversation_text
+            })
+            set_summary(session_id, summary)
             print(f"📄 Created summary: {summary}")
             
-            # Keep only recent messages + summary
+            # Keep only the recent messages; clear() + add_messages() works for any history
+            # backend, while trimming .messages in place only changes an in-memory list
             recent_messages = history.messages[-4:]
+            history.clear()
+            history.add_messages(recent_messages)
             
-            # Create new history with summary + recent messages
-            new_history = ChatMessageHistory()
-            new_history.add_ai_message(f"[SUMMARY] {summary}")
-            
-            for msg in recent_messages:
-                new_history.add_message(msg)
-            
-            # Replace the history
-            store[session_id] = new_history
-            history = new_history
-            
-            print(f"📊 Reduced from {len(messages_to_summarize) + len(recent_messages)} to {len(history.messages)} messages")
+            print(f"📊 Reduced from {len(messages_to_summarize) + len(history.messages)} to {len(history.messages)} messages")
         
         return history
     
     # Create chain with summary-aware history
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a helpful assistant. Use any summary information and recent conversation history to provide contextual responses."),
+        ("system", "Previous conversation summary: {summary}"),
         MessagesPlaceholder(variable_name="history"),
         ("human", "{content}")
     ])
     
-    chain = prompt | llm | StrOutputParser()
+    # The summary is looked up for the session of the current call
+    add_summary = RunnablePassthrough.assign(
+        summary=lambda x, config: get_summary(config["configurable"]["session_id"])
+    )
+    chain = add_summary | prompt | llm | StrOutputParser()
     
     chain_with_summary = RunnableWithMessageHistory(
         chain,
@@ -0,0 +1,102 @@
+"""
+Conversation with vector-retrieval long-term memory using LCEL
+"""
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from llm_pool import get_chat_model
+from langchain_core.runnables import RunnablePassthrough, RunnableWithMessageHistory
+from langchain_core.output_parsers import StrOutputParser
+from sqlite_chat_history import create_session_history_factory
+from session_cache import SessionCache
+from vector_memory import ModelVendor, create_vector_memory_factory
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# Last messages that always go into the prompt, and how many older turns are retrieved
+RECENT_MESSAGES = 6
+TOP_K = 4
+
+# Embedding vendor for the turn index (openai or local, see 4.context_with_embedding/embedding_providers.py)
+model_vendor = ModelVendor(os.getenv("MODEL_VENDOR", ModelVendor.OPENAI.value).lower())
+
+# Sessions are kept in memory with their vector index and written back to SQLite when evicted.
+# A session loaded again re-indexes its turns from the shared embedding cache.
+store = SessionCache(
+    create_history=create_vector_memory_factory(model_vendor, recent_messages=RECENT_MESSAGES, top_k=TOP_K),
+    persistent_tier=create_session_history_factory("vector_conversations.db"),
+    max_sessions=1000,
+    idle_ttl=30 * 60
+)
+
+def format_relevant_turns(turns: list[str]) -> str:
+    return "\n\n".join(turns) if turns else "(none)"
+
+def main():
+    print("Hello from LCEL Vector Memory!")
+    print("🧠 Every turn is embedded into a per-session vector index")
+    print(f"🔎 Each prompt gets the last {RECENT_MESSAGES} messages plus the {TOP_K} most relevant older turns\n")
+
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "You are a helpful assistant. Use the relevant earlier conversation and the recent messages to provide contextual and personalized responses."),
+        ("system", "Relevant earlier conversation:\n{relevant}"),
+        MessagesPlaceholder(variable_name="history"),
+        ("human", "{content}")
+    ])
+
+    # The prompt size stays constant however long the conversation runs: only the recent window
+    # and the top-k retrieved turns are used. RunnableWithMessageHistory puts the session's
+    # history object in the config.
+    recall = RunnablePassthrough.assign(
+        history=lambda x, config: config["configurable"]["message_history"].recent_window(),
+        relevant=lambda x, config: format_relevant_turns(
+            config["configurable"]["message_history"].relevant_turns(x["content"])
+        )
+    )
+    chain = recall | prompt | llm | StrOutputParser()
+
+    chain_with_memory = RunnableWithMessageHistory(
+        chain,
+        store.get_session_history,
+        input_messages_key="content",
+        history_messages_key="history"
+    )
+
+    # Get session ID from user
+    session_id = input("Enter session ID (or press Enter for 'default'): ").strip()
+    if not session_id:
+        session_id = "default"
+
+    print(f"📂 Using session: {session_id}")
+    print("💬 Start chatting! Type 'exit' to quit, 'recall <text>' to see what would be retrieved.\n")
+
+    while True:
+        user_input = input(">> ")
+
+        if user_input == "exit":
+            # Write every cached session back to SQLite
+            store.close()
+            print("👋 Goodbye! Your conversation is saved.")
+            print(f"📈 Session cache: {store.stats()}")
+            break
+        elif user_input.startswith("recall "):
+            history = store.get_session_history(session_id)
+            turns = history.relevant_turns(user_input[len("recall "):])
+            print(f"\n🔎 {len(turns)} relevant turn(s) out of {len(history.messages)} messages:")
+            for turn in turns:
+                print(f"   💬 {turn[:120]}")
+            print()
+            # Only read: let the cache evict this session again when it needs to
+            store.release(session_id)
+            continue
+
+        result = chain_with_memory.invoke(
+            {"content": user_input},
+            config={"configurable": {"session_id": session_id}}
+        )
+        print(f"AI: {result}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Bounded in-memory cache of chat message histories.
+
+The scripts keep every session they have ever seen in a `store = {}` dict, with its full
+message list, so a long-running server leaks memory forever. SessionCache keeps the hot
+sessions in memory and bounds the rest:
+
+- at most `max_sessions` sessions and, optionally, `max_bytes` of message content, checked
+  on every access and every append
+- least recently used sessions are evicted first, and sessions idle for `idle_ttl`
+  seconds are evicted as well
+- a session handed out by get_session_history() is pinned until its turn appends its
+  messages (or `lease_timeout` passes, for a turn that failed), so it is not evicted mid-turn
+- appends are written through to a pluggable persistent tier (any get_session_history-style
+  factory, e.g. the SQLite store), so a crash loses nothing; changes made in the background
+  (e.g. a summary swapped in) are written on the next append, every `flush_interval`
+  seconds and on eviction
+- an evicted session is loaded from the persistent tier again on the next miss; the object
+  handed out keeps working after an eviction, it always uses the cached session
+- hits, misses, evictions and write-backs are counted
+
+    cache = SessionCache(
+        create_history=lambda session_id: ChatMessageHistory(),
+        persistent_tier=create_session_history_factory("conversations.db"),
+        max_sessions=1000,
+    )
+    chain_with_memory = RunnableWithMessageHistory(chain, cache.get_session_history, ...)
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage
+
+# Rough per-message overhead (object, type, metadata) on top of the content length
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+def estimate_size(messages: list[BaseMessage]) -> int:
+    """Approximate memory footprint of a message list in bytes"""
+    size = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        size += len(content.encode("utf-8")) + MESSAGE_OVERHEAD_BYTES
+    return size
+
+
+@dataclass
+class _CachedSession:
+    history: BaseChatMessageHistory
+    size: int = 0
+    # Message count when `size` was measured
+    measured_count: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    # Turns handed out by get_session_history() that have not appended yet
+    leases: int = 0
+    leased_at: float = 0.0
+    # Messages as they were loaded from / last written to the persistent tier
+    persisted: list[BaseMessage] = field(default_factory=list)
+    # Serializes appends and write-backs of this session
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class CachedSessionHistory(BaseChatMessageHistory):
+    """
+    The history handed out by SessionCache: appends go through the cache (write-through,
+    byte budget, lease release) and everything else to the session's cached history, which
+    is loaded again if it has been evicted in the meantime
+    """
+
+    def __init__(self, cache: "SessionCache", session_id: str):
+        self.cache = cache
+        self.session_id = session_id
+
+    @property
+    def history(self) -> BaseChatMessageHistory:
+        return self.cache._entry(self.session_id).history
+
+    @property
+    def messages(self) -> list[BaseMessage]:  # type: ignore[override]
+        return self.history.messages
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.cache._add_messages(self.session_id, list(messages))
+
+    def clear(self) -> None:
+        self.cache._clear(self.session_id)
+
+    def __len__(self) -> int:
+        return len(self.history.messages)
+
+    def __getattr__(self, name: str):
+        # e.g. SummarizingChatMessageHistory.summary or wait_for_summary()
+        if name in ("cache", "session_id"):
+            raise AttributeError(name)
+        return getattr(self.history, name)
+
+
+class SessionCache:
+    """LRU + idle-TTL cache of session histories, written through to a persistent tier"""
+
+    def __init__(
+            self,
+            create_history: Callable[[str], BaseChatMessageHistory],
+            persistent_tier: Callable[[str], BaseChatMessageHistory] | None = None,
+            max_sessions: int = 1000,
+            max_bytes: int | None = None,
+            idle_ttl: float | None = 3600.0,
+            lease_timeout: float = 300.0,
+            flush_interval: float | None = None):
+        self.create_history = create_history
+        self.persistent_tier = persistent_tier
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.lease_timeout = lease_timeout
+        self._sessions: OrderedDict[str, _CachedSession] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.write_backs = 0
+        self._stop = threading.Event()
+        if flush_interval is not None and persistent_tier is not None:
+            threading.Thread(target=self._flush_every, args=(flush_interval,), daemon=True).start()
+
+    def get_session_history(self, session_id: str) -> CachedSessionHistory:
+        """Drop-in replacement for get_session_history() in RunnableWithMessageHistory"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self.hits += 1
+                self._sessions.move_to_end(session_id)
+            else:
+                self.misses += 1
+                entry = self._sessions[session_id] = self._load(session_id)
+            entry.last_used = time.monotonic()
+            # The turn holds this history until it appends its messages
+            entry.leases += 1
+            entry.leased_at = entry.last_used
+            self._resize(entry)
+            self._evict(keep=session_id)
+        return CachedSessionHistory(self, session_id)
+
+    def release(self, session_id: str):
+        """Unpin a session handed out by get_session_history() that will not be appended to"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry.leases:
+                entry.leases -= 1
+
+    def peek(self, session_id: str) -> BaseChatMessageHistory | None:
+        """The cached history without loading, counting or touching the LRU order"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry.history if entry is not None else None
+
+    def _entry(self, session_id: str) -> _CachedSession:
+        """The cached session, loaded again (as a miss) if it was evicted"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self.misses += 1
+                entry = self._sessions[session_id] = self._load(session_id)
+                self._resize(entry)
+                self._evict(keep=session_id)
+            return entry
+
+    def _load(self, session_id: str) -> _CachedSession:
+        history = self.create_history(session_id)
+        persisted = []
+        if self.persistent_tier is not None:
+            persisted = self.persistent_tier(session_id).messages
+            if persisted:
+                # A history with extra state (e.g. a summary) restores itself with import_messages()
+                import_messages = getattr(history, "import_messages", None)
+                if import_messages is not None:
+                    import_messages(persisted)
+                else:
+                    history.add_messages(persisted)
+        return _CachedSession(history=history, persisted=list(persisted))
+
+    def _add_messages(self, session_id: str, messages: list[BaseMessage]):
+        while True:
+            entry = self._entry(session_id)
+            with entry.lock:
+                # Evicted between the lookup and the lock: use the reloaded session
+                if self._sessions.get(session_id) is not entry:
+                    continue
+                entry.history.add_messages(messages)
+                self._write_back(session_id, entry)
+            break
+        with self._lock:
+            if entry.leases:
+                entry.leases -= 1
+            entry.last_used = time.monotonic()
+            if self._sessions.get(session_id) is entry:
+                self._total_bytes += estimate_size(messages)
+                entry.size += estimate_size(messages)
+                entry.measured_count += len(messages)
+                self._evict(keep=session_id)
+
+    def _clear(self, session_id: str):
+        entry = self._entry(session_id)
+        with entry.lock:
+            entry.history.clear()
+            self._write_back(session_id, entry)
+        with self._lock:
+            self._resize(entry)
+
+    def _resize(self, entry: _CachedSession):
+        messages = entry.history.messages
+        # Appends are counted as they happen; re-measure when the history changed otherwise
+        if len(messages) == entry.measured_count:
+            return
+        size = estimate_size(messages)
+        self._total_bytes += size - entry.size
+        entry.size = size
+        entry.measured_count = len(messages)
+
+    def _evict(self, keep: str | None = None):
+        now = time.monotonic()
+        cutoff = now - self.idle_ttl if self.idle_ttl is not None else None
+        # The OrderedDict is in LRU order, the most recently used session is at the end
+        for session_id in list(self._sessions):
+            entry = self._sessions[session_id]
+            over_count = len(self._sessions) > self.max_sessions
+            over_bytes = self.max_bytes is not None and self._total_bytes > self.max_bytes
+            idle = cutoff is not None and entry.last_used < cutoff
+            if not (over_count or over_bytes or idle):
+                break
+            # Sessions with a turn in progress stay, unless the turn gave up long ago
+            pinned = entry.leases and now - entry.leased_at < self.lease_timeout
+            if session_id == keep or pinned:
+                continue
+            self._remove(session_id)
+
+    def _remove(self, session_id: str):
+        entry = self._sessions.pop(session_id)
+        self._total_bytes -= entry.size
+        self.evictions += 1
+        with entry.lock:
+            self._write_back(session_id, entry)
+            # e.g. JSONLChatMessageHistory keeps its file open
+            close = getattr(entry.history, "close", None)
+            if close is not None:
+                close()
+
+    def _write_back(self, session_id: str, entry: _CachedSession):
+        """Bring the persistent tier up to date: append new messages, or replace a rewritten history"""
+        if self.persistent_tier is None:
+            return
+        export_messages = getattr(entry.history, "export_messages", None)
+        messages = export_messages() if export_messages is not None else entry.history.messages
+        persisted = entry.persisted
+        target = self.persistent_tier(session_id)
+        if _starts_with(messages, persisted):
+            if len(messages) == len(persisted):
+                return
+            target.add_messages(messages[len(persisted):])
+        else:
+            replace_messages = getattr(target, "replace_messages", None)
+            if replace_messages is not None:
+                replace_messages(messages)
+            else:
+                target.clear()
+                target.add_messages(messages)
+        entry.persisted = list(messages)
+        self.write_backs += 1
+
+    def _flush_every(self, interval: float):
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def evict_idle(self):
+        """Evict every session that has been idle for longer than idle_ttl"""
+        with self._lock:
+            self._evict()
+
+    def flush(self):
+        """Write every cached session back to the persistent tier, keeping it cached"""
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for session_id, entry in sessions:
+            with entry.lock:
+                if self._sessions.get(session_id) is entry:
+                    self._write_back(session_id, entry)
+
+    def close(self):
+        """Write back and evict every session, e.g. on shutdown"""
+        self._stop.set()
+        with self._lock:
+            for session_id in list(self._sessions):
+                self._remove(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._total_bytes,
+                "pinned": sum(1 for entry in self._sessions.values() if entry.leases),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "write_backs": self.write_backs,
+            }
+
+
+def _starts_with(messages: list[BaseMessage], prefix: list[BaseMessage]) -> bool:
+    if len(messages) < len(prefix):
+        return False
+    # Usually the very same objects, so the identity check avoids comparing contents
+    return all(a is b or a == b for a, b in zip(messages, prefix))
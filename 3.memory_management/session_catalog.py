@@ -0,0 +1,247 @@
+"""
+Session catalog for conversation directories.
+
+Listing sessions with os.listdir() and parsing file names is O(directory), and every
+session open used to check os.path.exists() and call makedirs(). With 100k+ sessions in
+one flat directory both get slow. This module keeps:
+
+- a SQLite catalog (session ID, file path, message count, last update, bytes on disk), so
+  listing, paging and "most recent sessions" are index scans that cost O(result)
+- sharded directories: a session's file lives in <root>/<2 hex chars of a hash of its ID>/,
+  so no directory holds more than a fraction of the sessions
+- a per-process cache of the directories already created, so makedirs() runs once per shard
+- appends are counted in memory and written in one transaction per `flush_interval` seconds
+  (or `max_pending` sessions, or before any read), so an append costs no SQLite write or stat
+- session IDs that are not safe as file names get a hashed file name (session_file_name())
+- the database is opened on first use, not when the catalog is created
+
+    catalog = SessionCatalog("conversations/catalog.db")
+    history = CatalogedChatMessageHistory(JSONLChatMessageHistory(path), catalog, session_id, path)
+    catalog.most_recent(10)
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage
+
+from sqlite_chat_history import SQLiteConnectionPool
+
+_CATALOG_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        message_count INTEGER NOT NULL DEFAULT 0,
+        updated_at REAL NOT NULL,
+        bytes INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)",
+]
+
+_COLUMNS = "session_id, path, message_count, updated_at, bytes"
+_SELECT_ONE = f"SELECT {_COLUMNS} FROM sessions WHERE session_id = ?"
+_SELECT_PAGE = f"SELECT {_COLUMNS} FROM sessions WHERE session_id > ? ORDER BY session_id LIMIT ?"
+_SELECT_RECENT = f"SELECT {_COLUMNS} FROM sessions ORDER BY updated_at DESC LIMIT ?"
+_COUNT = "SELECT COUNT(*) FROM sessions"
+_UPSERT = """
+    INSERT INTO sessions (session_id, path, message_count, updated_at, bytes) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (session_id) DO UPDATE SET
+        path = excluded.path,
+        message_count = message_count + excluded.message_count,
+        updated_at = excluded.updated_at,
+        bytes = excluded.bytes
+"""
+_RESET = """
+    INSERT INTO sessions (session_id, path, message_count, updated_at, bytes) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (session_id) DO UPDATE SET
+        path = excluded.path,
+        message_count = excluded.message_count,
+        updated_at = excluded.updated_at,
+        bytes = excluded.bytes
+"""
+_DELETE = "DELETE FROM sessions WHERE session_id = ?"
+
+# Directories known to exist, so makedirs() runs once per directory and process
+_created_dirs: set[str] = set()
+_created_dirs_lock = threading.Lock()
+
+
+def ensure_dir(path: str) -> str:
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        with _created_dirs_lock:
+            _created_dirs.add(path)
+    return path
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+# Session IDs used as they are in file names; anything else is hashed
+_SAFE_SESSION_ID = re.compile(r"[A-Za-z0-9_-]{1,100}")
+
+
+def session_file_name(session_id: str, extension: str) -> str:
+    """conversation_<session_id><extension>; IDs like "../x" or "a/b" are replaced by a hash"""
+    if not _SAFE_SESSION_ID.fullmatch(session_id):
+        session_id = hashlib.blake2b(session_id.encode("utf-8"), digest_size=16).hexdigest()
+    return f"conversation_{session_id}{extension}"
+
+
+def shard_dir(root: str, session_id: str, create: bool = True) -> str:
+    """<root>/<shard>: 256 shards by the first byte of a hash of the session ID"""
+    shard = hashlib.blake2b(session_id.encode("utf-8"), digest_size=1).hexdigest()
+    path = os.path.join(root, shard)
+    return ensure_dir(path) if create else path
+
+
+@dataclass(frozen=True)
+class SessionInfo:
+    session_id: str
+    path: str
+    message_count: int
+    updated_at: float
+    bytes: int
+
+
+class SessionCatalog:
+    """SQLite index of the sessions in a conversations directory"""
+
+    def __init__(self, db_path: str, pool_size: int = 2, flush_interval: float = 1.0, max_pending: int = 256):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pool: SQLiteConnectionPool | None = None
+        self._lock = threading.Lock()
+        # session_id -> [path, messages appended, last append time], not written yet
+        self._pending: dict[str, list] = {}
+        self._last_flush = time.monotonic()
+
+    @property
+    def pool(self) -> SQLiteConnectionPool:
+        """The catalog database, created on first use"""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    directory = os.path.dirname(self.db_path)
+                    if directory:
+                        ensure_dir(directory)
+                    self._pool = SQLiteConnectionPool(self.db_path, size=self.pool_size, schema=_CATALOG_SCHEMA)
+        return self._pool
+
+    def get(self, session_id: str) -> SessionInfo | None:
+        self.flush()
+        with self.pool.connection() as connection:
+            row = connection.execute(_SELECT_ONE, (session_id,)).fetchone()
+        return SessionInfo(*row) if row else None
+
+    def record(self, session_id: str, path: str, added_messages: int = 0):
+        """Register a session, or count messages that were appended to it (written on the next flush)"""
+        with self._lock:
+            pending = self._pending.get(session_id)
+            if pending is None:
+                self._pending[session_id] = [path, added_messages, time.time()]
+            else:
+                pending[0] = path
+                pending[1] += added_messages
+                pending[2] = time.time()
+            due = (len(self._pending) >= self.max_pending
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the pending appends in one transaction; file sizes are read once per session"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        rows = [
+            (session_id, path, added, updated_at, _file_size(path))
+            for session_id, (path, added, updated_at) in pending.items()
+        ]
+        with self.pool.transaction() as connection:
+            connection.executemany(_UPSERT, rows)
+
+    def reset(self, session_id: str, path: str, message_count: int = 0, size: int | None = None,
+              updated_at: float | None = None):
+        """Set a session's counts, e.g. after clear() or when importing an existing file"""
+        with self._lock:
+            self._pending.pop(session_id, None)
+        if size is None:
+            size = _file_size(path)
+        with self.pool.transaction() as connection:
+            connection.execute(_RESET, (session_id, path, message_count, updated_at or time.time(), size))
+
+    def remove(self, session_id: str):
+        with self._lock:
+            self._pending.pop(session_id, None)
+        with self.pool.transaction() as connection:
+            connection.execute(_DELETE, (session_id,))
+
+    def page(self, after: str = "", limit: int = 50) -> list[SessionInfo]:
+        """One page of sessions ordered by ID; pass the last ID of a page to get the next one"""
+        self.flush()
+        with self.pool.connection() as connection:
+            rows = connection.execute(_SELECT_PAGE, (after, limit)).fetchall()
+        return [SessionInfo(*row) for row in rows]
+
+    def most_recent(self, limit: int = 10) -> list[SessionInfo]:
+        self.flush()
+        with self.pool.connection() as connection:
+            rows = connection.execute(_SELECT_RECENT, (limit,)).fetchall()
+        return [SessionInfo(*row) for row in rows]
+
+    def __len__(self) -> int:
+        self.flush()
+        with self.pool.connection() as connection:
+            return connection.execute(_COUNT).fetchone()[0]
+
+    def close(self):
+        self.flush()
+        if self._pool is not None:
+            self._pool.close()
+
+
+class CatalogedChatMessageHistory(BaseChatMessageHistory):
+    """Wraps a file-based history and keeps its catalog entry up to date"""
+
+    def __init__(self, history: BaseChatMessageHistory, catalog: SessionCatalog, session_id: str, path: str):
+        self.history = history
+        self.catalog = catalog
+        self.session_id = session_id
+        self.path = path
+
+    @property
+    def messages(self) -> list[BaseMessage]:  # type: ignore[override]
+        return self.history.messages
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        self.history.add_messages(messages)
+        self.catalog.record(self.session_id, self.path, added_messages=len(messages))
+
+    def clear(self) -> None:
+        self.history.clear()
+        self.catalog.reset(self.session_id, self.path)
+
+    def __getattr__(self, name):
+        # get_messages(), close(), wait_for_compaction(), ... of the wrapped history
+        return getattr(self.history, name)
@@ -0,0 +1,197 @@
+"""
+SQLite-backed chat message history for RunnableWithMessageHistory.
+
+The scripts keep their sessions in a module-level `store = {}` dict, which is lost on
+restart and cannot be shared between worker processes. This module stores every message
+as a row in one SQLite database instead:
+
+- WAL journal mode: readers never block the writer and the writer never blocks readers,
+  across threads and processes
+- a small connection pool, so a request reuses an open connection (and its cache of
+  prepared statements) instead of opening the database every time
+- an index on (session_id, seq), so loading a session, or only its last N messages,
+  reads just that session's rows in order
+- a message's seq is assigned inside a BEGIN IMMEDIATE transaction, so concurrent writers
+  from different processes never hand out the same seq
+
+    get_session_history = create_session_history_factory("conversations.db", window=20)
+"""
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        message TEXT NOT NULL
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_session_seq ON messages (session_id, seq)",
+]
+
+# The statements are constant strings, so sqlite3 prepares each one once per connection
+# and reuses it from the connection's statement cache afterwards
+_SELECT_ALL = "SELECT message FROM messages WHERE session_id = ? ORDER BY seq"
+_SELECT_LAST = "SELECT message FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?"
+_SELECT_MAX_SEQ = "SELECT COALESCE(MAX(seq), 0) FROM messages WHERE session_id = ?"
+_INSERT = "INSERT INTO messages (session_id, seq, message) VALUES (?, ?, ?)"
+_DELETE = "DELETE FROM messages WHERE session_id = ?"
+_COUNT = "SELECT COUNT(*) FROM messages WHERE session_id = ?"
+
+
+class SQLiteConnectionPool:
+    """Fixed-size pool of connections to one SQLite database, safe to share between threads"""
+
+    def __init__(self, db_path: str, size: int = 4, busy_timeout: float = 5.0, schema: Sequence[str] = _SCHEMA):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._connections: queue.Queue[sqlite3.Connection] = queue.Queue(maxsize=size)
+        for i in range(size):
+            connection = self._connect()
+            if i == 0:
+                with self._transaction(connection):
+                    for statement in schema:
+                        connection.execute(statement)
+            self._connections.put(connection)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            # Transactions are started explicitly with BEGIN IMMEDIATE
+            isolation_level=None,
+            # Connections move between threads through the pool, one thread at a time
+            check_same_thread=False,
+            cached_statements=64,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Durable at every checkpoint, and much faster than FULL in WAL mode
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @contextmanager
+    def connection(self):
+        connection = self._connections.get()
+        try:
+            yield connection
+        finally:
+            self._connections.put(connection)
+
+    @staticmethod
+    @contextmanager
+    def _transaction(connection: sqlite3.Connection):
+        # IMMEDIATE takes the write lock up front, so two writers never both read the same MAX(seq)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as connection, self._transaction(connection):
+            yield connection
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """Chat message history of one session, stored in a shared SQLite database"""
+
+    def __init__(self, session_id: str, pool: SQLiteConnectionPool, window: int | None = None):
+        self.session_id = session_id
+        self.pool = pool
+        # When set, .messages only returns the last `window` messages
+        self.window = window
+
+    @property
+    def messages(self) -> list[BaseMessage]:  # type: ignore[override]
+        return self.get_messages(self.window)
+
+    def get_messages(self, last_n: int | None = None) -> list[BaseMessage]:
+        """All messages of the session in order, or only the last `last_n`"""
+        with self.pool.connection() as connection:
+            if last_n is None:
+                rows = connection.execute(_SELECT_ALL, (self.session_id,)).fetchall()
+            else:
+                # Walk the index backwards and stop after last_n rows
+                rows = connection.execute(_SELECT_LAST, (self.session_id, last_n)).fetchall()
+                rows.reverse()
+        return messages_from_dict([json.loads(row[0]) for row in rows])
+
+    def __len__(self) -> int:
+        with self.pool.connection() as connection:
+            return connection.execute(_COUNT, (self.session_id,)).fetchone()[0]
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Append the messages in one transaction"""
+        if not messages:
+            return
+        with self.pool.transaction() as connection:
+            self._insert(connection, messages)
+
+    def replace_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Atomically replace the whole session, e.g. with a summary plus the recent messages"""
+        with self.pool.transaction() as connection:
+            connection.execute(_DELETE, (self.session_id,))
+            self._insert(connection, messages)
+
+    def _insert(self, connection: sqlite3.Connection, messages: Sequence[BaseMessage]):
+        last_seq = connection.execute(_SELECT_MAX_SEQ, (self.session_id,)).fetchone()[0]
+        connection.executemany(_INSERT, [
+            (self.session_id, last_seq + offset, json.dumps(message_to_dict(message), ensure_ascii=False))
+            for offset, message in enumerate(messages, start=1)
+        ])
+
+    def clear(self) -> None:
+        with self.pool.transaction() as connection:
+            connection.execute(_DELETE, (self.session_id,))
+
+
+# One pool per database file, shared by every factory in the process
+_pools: dict[str, SQLiteConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: str, size: int = 4) -> SQLiteConnectionPool:
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = SQLiteConnectionPool(db_path, size=size)
+        return _pools[db_path]
+
+
+def create_session_history_factory(
+        db_path: str = "conversations.db",
+        window: int | None = None,
+        pool_size: int = 4) -> Callable[[str], SQLiteChatMessageHistory]:
+    """
+    Build a get_session_history(session_id) function for RunnableWithMessageHistory.
+
+    Args:
+        db_path: SQLite database file, shared by every process that uses the same path
+        window: Only load the last `window` messages into the prompt (None loads everything)
+        pool_size: Number of pooled connections in this process
+    """
+    pool = get_connection_pool(db_path, size=pool_size)
+
+    def get_session_history(session_id: str) -> SQLiteChatMessageHistory:
+        """Get the SQLite-backed chat message history for the given session ID"""
+        return SQLiteChatMessageHistory(session_id, pool, window=window)
+
+    return get_session_history
@@ -0,0 +1,128 @@
+"""
+Stress test for concurrent turns on shared session histories.
+
+Fires thousands of concurrent turns across many sessions through RunnableWithMessageHistory,
+with and without SessionSerializedRunnable, and checks every session afterwards:
+- no lost messages: every turn's human and AI message is stored
+- no reordering: turn i is stored at position 2i, in arrival order
+- every turn saw all earlier turns of its session
+
+A fake echo model with a random delay stands in for the LLM, so no API key is needed.
+
+    uv run test_concurrent_history.py --sessions 50 --turns 40
+"""
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda, RunnableWithMessageHistory
+from langchain_community.chat_message_histories import ChatMessageHistory
+from concurrent_history import SessionSerializedRunnable
+from sqlite_chat_history import create_session_history_factory
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+
+def create_echo_chain(seen_history: dict):
+    """Echoes the input after a random delay and records how much history each turn saw"""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "You are a helpful assistant."),
+        MessagesPlaceholder(variable_name="history"),
+        ("human", "{content}")
+    ])
+
+    async def echo(prompt_value):
+        messages = prompt_value.to_messages()
+        content = messages[-1].content
+        # Every message except the system prompt and the new input came from the history
+        seen_history[content] = len(messages) - 2
+        await asyncio.sleep(random.uniform(0, 0.002))
+        return f"echo {content}"
+
+    return prompt | RunnableLambda(echo)
+
+
+def check_sessions(get_session_history, seen_history: dict, sessions: int, turns: int) -> dict:
+    lost = reordered = stale = 0
+    for s in range(sessions):
+        messages = get_session_history(f"session-{s}").messages
+        expected = []
+        for t in range(turns):
+            expected += [f"s{s} t{t}", f"echo s{s} t{t}"]
+        actual = [message.content for message in messages]
+        if len(actual) != len(expected):
+            lost += 1
+        elif actual != expected:
+            reordered += 1
+        stale += sum(1 for t in range(turns) if seen_history.get(f"s{s} t{t}") != 2 * t)
+    return {"lost": lost, "reordered": reordered, "stale_turns": stale}
+
+
+async def run_turns(chain, sessions: int, turns: int) -> float:
+    """Submit every turn of every session at once; the turns of a session in order"""
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        chain.ainvoke({"content": f"s{s} t{t}"}, config={"configurable": {"session_id": f"session-{s}"}})
+        for t in range(turns)
+        for s in range(sessions)
+    ))
+    return time.perf_counter() - start
+
+
+def run_scenario(name: str, get_session_history, serialized: bool, sessions: int, turns: int) -> dict:
+    seen_history = {}
+    chain = RunnableWithMessageHistory(
+        create_echo_chain(seen_history),
+        get_session_history,
+        input_messages_key="content",
+        history_messages_key="history"
+    )
+    if serialized:
+        chain = SessionSerializedRunnable(chain)
+
+    elapsed = asyncio.run(run_turns(chain, sessions, turns))
+    result = check_sessions(get_session_history, seen_history, sessions, turns)
+    total = sessions * turns
+    print(f"{name:<28} {total} turns in {elapsed:6.2f}s ({total / elapsed:7.0f} turns/s)  "
+          f"lost sessions: {result['lost']}  reordered sessions: {result['reordered']}  "
+          f"stale turns: {result['stale_turns']}")
+    if serialized:
+        print(f"{'':<28} {chain.stats()}")
+    return result
+
+
+def in_memory_store():
+    store = {}
+
+    def get_session_history(session_id: str) -> ChatMessageHistory:
+        if session_id not in store:
+            store[session_id] = ChatMessageHistory()
+        return store[session_id]
+
+    return get_session_history
+
+
+def test_concurrent_history(sessions: int = 50, turns: int = 40):
+    print(f"🧪 {sessions} sessions x {turns} concurrent turns\n")
+
+    # Without the concurrency layer, turns of the same session race each other
+    run_scenario("in-memory, unserialized", in_memory_store(), False, sessions, turns)
+
+    for name, get_session_history in [
+        ("in-memory, serialized", in_memory_store()),
+        ("sqlite, serialized", create_session_history_factory(
+            os.path.join(tempfile.mkdtemp(), "stress.db"), pool_size=8)),
+    ]:
+        result = run_scenario(name, get_session_history, True, sessions, turns)
+        assert result == {"lost": 0, "reordered": 0, "stale_turns": 0}, f"{name}: {result}"
+
+    print("\n✅ No lost or reordered messages with SessionSerializedRunnable")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress test concurrent turns on session histories")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=40)
+    args = parser.parse_args()
+    test_concurrent_history(args.sessions, args.turns)
@@ -1,26 +1,20 @@
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from llm_pool import get_chat_model
 from langchain_core.runnables import RunnableWithMessageHistory
 from langchain_core.output_parsers import StrOutputParser
-from langchain_community.chat_message_histories import ChatMessageHistory
+from sqlite_chat_history import create_session_history_factory
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
-# Store for session histories - in production, this would be a database
-store = {}
-
-def get_session_history(session_id: str) -> ChatMessageHistory:
-    """Get or create a chat message history for the given session ID"""
-    if session_id not in store:
-        store[session_id] = ChatMessageHistory()
-    return store[session_id]
+# Session histories live in their own SQLite database, separate from the interactive chats
+get_session_history = create_session_history_factory("test_memory.db")
 
 def test_memory():
     print("🧪 Testing memory management...")
     
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = get_chat_model("gpt-4o-mini", temperature=0)
 
     # Create a prompt template that includes a placeholder for chat history
     prompt = ChatPromptTemplate.from_messages([
@@ -40,6 +34,9 @@ def test_memory():
         history_messages_key="history"
     )
 
+    # Start from an empty session, the database keeps messages from previous runs
+    get_session_history("test_session").clear()
+
     # Test conversation with memory
     session_config = {"configurable": {"session_id": "test_session"}}
     
@@ -58,7 +55,7 @@ def test_memory():
     print(f"AI: {response2}")
     
     print("\n✅ Memory test completed!")
-    print(f"📊 Messages in memory: {len(store['test_session'].messages)}")
+    print(f"📊 Messages in memory: {len(get_session_history('test_session').messages)}")
 
 if __name__ == "__main__":
     test_memory()
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Token-budgeted conversation history.
+
+Message-count thresholds (summarize after 12 messages, keep the last 4) say nothing about
+prompt size: one pasted document can blow the context window while twelve one-word turns
+trigger a needless summary. This module measures history in tokens instead:
+
+- the tokenizer (shared with 4.context_with_embedding/embedding_providers.py) is loaded
+  once and the count of every distinct message text is cached,
+  so re-counting a history that was already seen is a dictionary lookup
+- TokenCounter keeps one count per message plus a running total, updated incrementally
+  as messages are added, so checking the budget never re-tokenizes the whole history
+- trim_to_budget() keeps the newest messages that fit a budget (and always the newest
+  one, even when it alone is over), so the `history` placeholder has a predictable size
+"""
+import os
+import sys
+from functools import lru_cache
+from typing import Sequence
+
+from langchain_core.messages import BaseMessage
+
+# The cl100k tokenizer (with its offline fallback) lives in 4.context_with_embedding
+EMBEDDING_PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "4.context_with_embedding")
+if EMBEDDING_PROJECT_DIR not in sys.path:
+    sys.path.append(EMBEDDING_PROJECT_DIR)
+
+from embedding_providers import count_tokens  # noqa: E402
+
+# Chat formats add a few tokens per message for the role and separators
+MESSAGE_TOKEN_OVERHEAD = 4
+
+
+@lru_cache(maxsize=8192)
+def count_text_tokens(text: str) -> int:
+    return count_tokens([text])[0]
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_text_tokens(content) + MESSAGE_TOKEN_OVERHEAD
+
+
+class TokenCounter:
+    """Per-message token counts and their running total, kept in step with a message list"""
+
+    def __init__(self, messages: Sequence[BaseMessage] = ()):
+        self.counts: list[int] = []
+        self.total = 0
+        self.extend(messages)
+
+    def append(self, message: BaseMessage):
+        count = count_message_tokens(message)
+        self.counts.append(count)
+        self.total += count
+
+    def extend(self, messages: Sequence[BaseMessage]):
+        for message in messages:
+            self.append(message)
+
+    def reset(self, messages: Sequence[BaseMessage] = ()):
+        self.counts = []
+        self.total = 0
+        self.extend(messages)
+
+    def replace_prefix(self, count: int, messages: Sequence[BaseMessage]):
+        """Replace the counts of the first `count` messages by those of `messages` (e.g. a summary)"""
+        new_counts = [count_message_tokens(message) for message in messages]
+        self.total += sum(new_counts) - sum(self.counts[:count])
+        self.counts[:count] = new_counts
+
+    def recent_start(self, budget: int, minimum: int = 1) -> int:
+        """Index of the first message of the longest suffix that fits in `budget` tokens"""
+        used = 0
+        start = len(self.counts)
+        while start > 0:
+            count = self.counts[start - 1]
+            if used + count > budget and len(self.counts) - start >= minimum:
+                break
+            used += count
+            start -= 1
+        return start
+
+
+def trim_to_budget(messages: Sequence[BaseMessage], max_tokens: int, minimum: int = 1) -> list[BaseMessage]:
+    """Keep the newest messages that fit in `max_tokens`, and at least the newest `minimum`"""
+    messages = list(messages)
+    used = 0
+    start = len(messages)
+    while start > 0:
+        count = count_message_tokens(messages[start - 1])
+        if used + count > max_tokens and len(messages) - start >= minimum:
+            break
+        used += count
+        start -= 1
+    return messages[start:]
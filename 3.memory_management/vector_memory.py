@@ -0,0 +1,123 @@
+"""
+Vector-retrieval long-term memory for conversations.
+
+Raw-message histories grow the prompt with every turn, and summaries lose details. This
+history keeps every message, but only a constant amount of it reaches the prompt:
+
+- each completed turn (a human message and the replies to it) is embedded into a
+  per-session local vector index (InMemoryVectorStore) as soon as it is complete
+- at prompt time, recent_window() returns the last `recent_messages` messages as-is and
+  relevant_turns(query) returns the `top_k` older turns most similar to the new input
+
+Embeddings come from the provider registry of 4.context_with_embedding, behind its shared
+on-disk embedding cache: a turn is only sent to the embedding API once, so rebuilding the
+index of a session that is loaded again (e.g. from SQLite) costs no API calls.
+
+    get_session_history = create_vector_memory_factory(ModelVendor.OPENAI)
+    history = get_session_history("alice")
+    history.relevant_turns("What did I say about my job?")
+"""
+import os
+import sys
+import threading
+from typing import Any
+
+from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.messages import BaseMessage
+from langchain_core.vectorstores import InMemoryVectorStore
+from pydantic import PrivateAttr
+
+# The embedding providers and the shared embedding cache live in 4.context_with_embedding
+EMBEDDING_PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "4.context_with_embedding")
+if EMBEDDING_PROJECT_DIR not in sys.path:
+    sys.path.append(EMBEDDING_PROJECT_DIR)
+
+from embedding_providers import ModelVendor, load_cached_embedding_model  # noqa: E402
+
+
+def format_turn(messages: list[BaseMessage]) -> str:
+    return "\n".join(f"{message.type}: {message.content}" for message in messages)
+
+
+class VectorMemoryChatMessageHistory(ChatMessageHistory):
+    """ChatMessageHistory that indexes every completed turn for similarity search"""
+
+    # ChatMessageHistory is a pydantic model, so every attribute has to be declared as a field
+    embeddings: Any = None
+    # Newest messages that always go into the prompt as-is
+    recent_messages: int = 6
+    # Number of older turns retrieved for each new input
+    top_k: int = 4
+    _lock: Any = PrivateAttr(default_factory=threading.RLock)
+    _index: Any = PrivateAttr(default=None)
+    # Number of messages covered by the index; the rest belong to a turn still in progress
+    _indexed: int = PrivateAttr(default=0)
+
+    def __init__(self, embeddings, recent_messages=6, top_k=4):
+        super().__init__(embeddings=embeddings, recent_messages=recent_messages, top_k=top_k)
+        self._index = InMemoryVectorStore(embeddings)
+
+    def add_message(self, message):
+        self.add_messages([message])
+
+    def add_messages(self, messages):
+        """Add messages and index the turns they complete, with one embedding request"""
+        with self._lock:
+            self.messages.extend(messages)
+            self._index_completed_turns()
+
+    def _index_completed_turns(self):
+        if self._indexed >= len(self.messages):
+            return
+        # A turn starts at a human message; the last turn is complete once it has a reply
+        starts = [i for i in range(self._indexed, len(self.messages)) if self.messages[i].type == "human"]
+        if not starts or starts[0] != self._indexed:
+            starts.insert(0, self._indexed)
+        bounds = list(zip(starts, starts[1:] + [len(self.messages)]))
+        if bounds and self.messages[-1].type == "human":
+            bounds.pop()
+        if not bounds:
+            return
+
+        self._index.add_texts(
+            [format_turn(self.messages[start:end]) for start, end in bounds],
+            metadatas=[{"start": start, "end": end} for start, end in bounds],
+            ids=[str(start) for start, _ in bounds],
+        )
+        self._indexed = bounds[-1][1]
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._index = InMemoryVectorStore(self.embeddings)
+            self._indexed = 0
+
+    def recent_window(self) -> list[BaseMessage]:
+        """The newest messages, which always go into the prompt"""
+        return self.messages[-self.recent_messages:] if self.recent_messages else []
+
+    def relevant_turns(self, query: str) -> list[str]:
+        """The top_k turns before the recent window that are most similar to `query`, oldest first"""
+        with self._lock:
+            window_start = max(0, len(self.messages) - self.recent_messages)
+            # Nothing has left the recent window yet, so there is no need to embed the query
+            if self._indexed == 0 or window_start == 0:
+                return []
+            index = self._index
+        documents = index.similarity_search(
+            query,
+            k=self.top_k,
+            filter=lambda document: document.metadata["end"] <= window_start,
+        )
+        documents.sort(key=lambda document: document.metadata["start"])
+        return [document.page_content for document in documents]
+
+
+def create_vector_memory_factory(model_vendor: ModelVendor = ModelVendor.OPENAI, recent_messages: int = 6, top_k: int = 4):
+    """A get_session_history-style factory; every session shares one cached embedding model"""
+    embeddings = load_cached_embedding_model(model_vendor)
+
+    def create_history(session_id: str) -> VectorMemoryChatMessageHistory:
+        return VectorMemoryChatMessageHistory(embeddings, recent_messages=recent_messages, top_k=top_k)
+
+    return create_history
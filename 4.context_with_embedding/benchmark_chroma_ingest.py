@@ -0,0 +1,108 @@
+"""
+Throughput benchmark for Chroma ingestion: one-request-per-call vs pooled client + concurrent batches.
+
+Runs against a local Chroma HTTP server as a stand-in for Chroma Cloud, so no API keys are needed:
+
+    uv run chroma run --path /tmp/chroma_bench --port 8000
+    CHROMA_HOST=localhost CHROMA_PORT=8000 uv run benchmark_chroma_ingest.py --chunks 10000
+
+Embeddings are random vectors, so only the transport and the server are measured. Clients are
+built outside the timed ingest in both modes; the cost of building one is reported on its own.
+"""
+import argparse
+import os
+import time
+import uuid
+
+import chromadb
+import numpy as np
+
+import store_embeddings_chroma_cloud as cloud
+
+
+def make_records(count: int, dimensions: int):
+    rng = np.random.default_rng(42)
+    ids = [f"chunk-{i}" for i in range(count)]
+    embeddings = rng.random((count, dimensions), dtype=np.float32).tolist()
+    documents = [f"Synthetic fact number {i} about something interesting." for i in range(count)]
+    metadatas = [{"source": "benchmark", "chunk_index": i} for i in range(count)]
+    return ids, embeddings, documents, metadatas
+
+
+def timed_client(build) -> tuple:
+    """(client, seconds it took to build it)"""
+    start = time.perf_counter()
+    client = build()
+    return client, time.perf_counter() - start
+
+
+def run_baseline(records, client) -> float:
+    """Previous behavior: every record in a single-client sequential stream"""
+    ids, embeddings, documents, metadatas = records
+    start = time.perf_counter()
+    collection = client.get_or_create_collection(name=f"bench-baseline-{uuid.uuid4().hex[:8]}", embedding_function=None)
+    # One request at a time, as large as the server allows
+    batch_size = client.get_max_batch_size()
+    for i in range(0, len(ids), batch_size):
+        collection.upsert(
+            ids=ids[i:i + batch_size],
+            embeddings=embeddings[i:i + batch_size],
+            documents=documents[i:i + batch_size],
+            metadatas=metadatas[i:i + batch_size]
+        )
+    elapsed = time.perf_counter() - start
+    client.delete_collection(collection.name)
+    return elapsed
+
+
+def run_pooled(records, client, max_workers: int, max_records: int) -> float:
+    """Shared long-lived client with size-bounded batches sent concurrently"""
+    ids, embeddings, documents, metadatas = records
+    start = time.perf_counter()
+    collection = client.get_or_create_collection(name=f"bench-pooled-{uuid.uuid4().hex[:8]}", embedding_function=None)
+    written = cloud.upsert_in_batches(
+        collection, ids, embeddings, documents, metadatas,
+        max_workers=max_workers,
+        max_records=max_records
+    )
+    elapsed = time.perf_counter() - start
+    assert written == len(ids), f"wrote {written} of {len(ids)} records"
+    client.delete_collection(collection.name)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch-records", type=int, default=cloud.MAX_RECORDS_PER_BATCH)
+    args = parser.parse_args()
+
+    host = os.getenv("CHROMA_HOST")
+    if not host:
+        print("⚠️  Set CHROMA_HOST (and CHROMA_PORT) to a local `chroma run` server")
+        return
+    port = int(os.getenv("CHROMA_PORT", "8000"))
+
+    records = make_records(args.chunks, args.dimensions)
+    print(f"Ingesting {args.chunks} chunks of {args.dimensions} dimensions into {host}:{port}")
+
+    # The original store_to_chroma() built a new client per call: that cost is paid once per
+    # baseline ingest, and once per process with the shared client
+    baseline_client, baseline_setup = timed_client(lambda: chromadb.HttpClient(host=host, port=port))
+    shared_client, shared_setup = timed_client(cloud.get_chroma_client)
+    print(f"client setup: new client {baseline_setup * 1000:.1f} ms per call, "
+          f"shared client {shared_setup * 1000:.1f} ms once per process")
+
+    elapsed = run_baseline(records, baseline_client)
+    print(f"baseline (sequential):              {elapsed:7.2f}s  {args.chunks / elapsed:9.0f} chunks/s")
+
+    for workers in args.workers:
+        elapsed = run_pooled(records, shared_client, workers, args.batch_records)
+        print(f"pooled ({workers:2d} workers, {args.batch_records} per batch): "
+              f"{elapsed:7.2f}s  {args.chunks / elapsed:9.0f} chunks/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+End-to-end benchmark of the prompt_generic_retriever.py RAG chain, with a per-stage latency breakdown.
+
+The chain from load_retrieval_qa_chain() (RetrievalQA + the generic MMR retriever) is run over a
+synthetic corpus and question set with the local providers (MODEL_VENDOR=local: hash-seeded
+embeddings, FakeChatModel), so no API keys or network are needed and runs are repeatable.
+Every question's time is split into:
+- embed_query: embedding the question
+- search: the Chroma query for the MMR candidates (fetch_k)
+- mmr: maximal marginal relevance over the candidates
+- prompt: from the retrieved documents to the LLM call (stuff chain prompt assembly)
+- llm: the fake model call (latency set with --llm-ttft-ms / --llm-tokens-per-second)
+- total: the whole chain.invoke()
+
+For each --concurrency level it reports p50/p95/p99 per stage, throughput and peak RSS. --output
+writes the results as JSON (with the git commit), and --compare prints the change against an
+earlier results file, so a change can be measured across commits:
+
+    uv run benchmark_rag.py --corpus-size 5000 --questions 200 --output before.json
+    uv run benchmark_rag.py --corpus-size 5000 --questions 200 --compare before.json
+"""
+import argparse
+import contextvars
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+from embedding_providers import ModelVendor, load_embedding_model
+
+STAGES = ["embed_query", "search", "mmr", "prompt", "llm", "total"]
+
+_TOPICS = (
+    "language ocean volcano honey octopus planet forest desert glacier river bridge library "
+    "music chess coffee satellite island castle bee whale comet"
+).split()
+_WORDS = (
+    "is known for has the largest oldest smallest a unique history because people discovered "
+    "that it can survive for years without water in cold warm places many scientists believe"
+).split()
+
+# The request being timed on this thread (ThreadPoolExecutor runs one question per thread at a time)
+_current: contextvars.ContextVar[Optional["StageTimer"]] = contextvars.ContextVar("current_timer", default=None)
+
+
+class StageTimer(BaseCallbackHandler):
+    """Stage durations of one chain.invoke(): wrapped calls add to it, callbacks mark the LLM span"""
+
+    def __init__(self):
+        self.durations = {stage: 0.0 for stage in STAGES}
+        self._retrieved_at: Optional[float] = None
+        self._llm_started_at: Optional[float] = None
+
+    def add(self, stage: str, seconds: float):
+        self.durations[stage] += seconds
+
+    def on_retriever_end(self, documents, **kwargs: Any):
+        self._retrieved_at = time.perf_counter()
+
+    def _llm_start(self):
+        self._llm_started_at = time.perf_counter()
+        if self._retrieved_at is not None:
+            self.add("prompt", self._llm_started_at - self._retrieved_at)
+
+    def on_llm_start(self, serialized, prompts, **kwargs: Any):
+        self._llm_start()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs: Any):
+        self._llm_start()
+
+    def on_llm_end(self, response, **kwargs: Any):
+        self.add("llm", time.perf_counter() - self._llm_started_at)
+
+
+def timed(stage: str, function):
+    """function, with its duration added to the current request's StageTimer"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timer = _current.get()
+            if timer is not None:
+                timer.add(stage, time.perf_counter() - start)
+    return wrapper
+
+
+class TimedEmbeddings(Embeddings):
+    """Times embed_query(); ingestion (embed_documents) is not part of a request"""
+
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return timed("embed_query", self.inner.embed_query)(text)
+
+
+def make_corpus(size: int, questions: int, seed: int = 42) -> tuple[list[str], list[str]]:
+    """`size` fact-like chunks and `questions` questions about their topics"""
+    rng = random.Random(seed)
+    chunks = [
+        f"Fact {i}: the {rng.choice(_TOPICS)} " + " ".join(rng.choice(_WORDS) for _ in range(rng.randint(12, 30))) + "."
+        for i in range(size)
+    ]
+    asked = [
+        f"What is interesting about the {rng.choice(_TOPICS)} and {rng.choice(_TOPICS)}? ({i})"
+        for i in range(questions)
+    ]
+    return chunks, asked
+
+
+def build_chain(chunks: list[str]):
+    """The prompt_generic_retriever.py chain over an in-memory Chroma collection of `chunks`"""
+    import langchain_chroma.vectorstores as chroma_vectorstores
+    from langchain_chroma import Chroma
+
+    from prompt_generic_retriever import load_retrieval_qa_chain
+
+    embeddings = TimedEmbeddings(load_embedding_model(ModelVendor.LOCAL))
+    vectorstore = Chroma(collection_name=f"bench-rag-{uuid.uuid4().hex[:8]}", embedding_function=embeddings)
+    start = time.perf_counter()
+    vectorstore.add_texts(chunks)
+    ingest_seconds = time.perf_counter() - start
+
+    # Instrument the two retrieval steps Chroma runs inside max_marginal_relevance_search()
+    collection = vectorstore._collection
+    collection.query = timed("search", collection.query)
+    chroma_vectorstores.maximal_marginal_relevance = timed("mmr", chroma_vectorstores.maximal_marginal_relevance)
+
+    return load_retrieval_qa_chain(ModelVendor.LOCAL, vectorstore=vectorstore, verbose=False), ingest_seconds
+
+
+def ask(chain, question: str) -> dict[str, float]:
+    timer = StageTimer()
+    token = _current.set(timer)
+    start = time.perf_counter()
+    try:
+        chain.invoke(question, config={"callbacks": [timer]})
+    finally:
+        _current.reset(token)
+    timer.durations["total"] = time.perf_counter() - start
+    return timer.durations
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    """p50/p95/p99 in milliseconds"""
+    cuts = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+    return {"p50_ms": round(cuts[49] * 1000, 3), "p95_ms": round(cuts[94] * 1000, 3), "p99_ms": round(cuts[98] * 1000, 3)}
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_level(chain, questions: list[str], concurrency: int) -> dict:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda question: ask(chain, question), questions))
+    wall = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "questions": len(questions),
+        "throughput_qps": round(len(questions) / wall, 2),
+        "stages": {stage: percentiles([result[stage] for result in results]) for stage in STAGES},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_level(level: dict):
+    print(f"\n⚙️  concurrency {level['concurrency']}: {level['throughput_qps']} questions/s, "
+          f"peak RSS {level['peak_rss_mb']} MB")
+    print(f"   {'stage':<12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, cuts in level["stages"].items():
+        print(f"   {stage:<12} {cuts['p50_ms']:>9.2f} {cuts['p95_ms']:>9.2f} {cuts['p99_ms']:>9.2f}")
+
+
+def change(new: float, old: float) -> str:
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+
+def print_comparison(results: dict, baseline: dict):
+    print(f"\n📊 Compared with {baseline.get('commit') or 'baseline'} (negative latency = faster)")
+    if baseline.get("config") != results["config"]:
+        print(f"   ⚠️  Different settings: {baseline.get('config')}")
+    old_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in results["levels"]:
+        old = old_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        print(f"   concurrency {level['concurrency']}: throughput {change(level['throughput_qps'], old['throughput_qps'])}, "
+              f"peak RSS {change(level['peak_rss_mb'], old['peak_rss_mb'])}")
+        for stage in STAGES:
+            new_cuts, old_cuts = level["stages"][stage], old["stages"].get(stage)
+            if old_cuts:
+                print(f"      {stage:<12} p50 {change(new_cuts['p50_ms'], old_cuts['p50_ms']):>8}  "
+                      f"p95 {change(new_cuts['p95_ms'], old_cuts['p95_ms']):>8}  "
+                      f"p99 {change(new_cuts['p99_ms'], old_cuts['p99_ms']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end RAG benchmark with a per-stage latency breakdown")
+    parser.add_argument("--corpus-size", type=int, default=2000, help="Chunks in the synthetic corpus")
+    parser.add_argument("--questions", type=int, default=100, help="Questions per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--llm-ttft-ms", type=float, default=100.0, help="Fake LLM mean time to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=400.0, help="Fake LLM generation speed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier --output file to compare against")
+    args = parser.parse_args()
+
+    # load_llm() builds the fake model from these (see local_providers.py)
+    os.environ["LOCAL_LLM_TTFT_MS"] = str(args.llm_ttft_ms)
+    os.environ["LOCAL_LLM_TOKENS_PER_SECOND"] = str(args.llm_tokens_per_second)
+    os.environ.setdefault("LOCAL_LLM_SEED", str(args.seed))
+
+    chunks, questions = make_corpus(args.corpus_size, args.questions, args.seed)
+    print(f"📚 Ingesting {len(chunks)} synthetic chunks...")
+    chain, ingest_seconds = build_chain(chunks)
+    print(f"   {ingest_seconds:.2f}s")
+    # Warm up imports, the Chroma index and the chain before timing
+    for question in questions[:3]:
+        ask(chain, question)
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {**{key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+                   "llm_latency": os.getenv("LOCAL_LLM_LATENCY", "lognormal"),
+                   "embedding_dimensions": int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "768"))},
+        "ingest_seconds": round(ingest_seconds, 3),
+        "levels": [],
+    }
+    for concurrency in args.concurrency:
+        level = run_level(chain, questions, concurrency)
+        results["levels"].append(level)
+        print_level(level)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print_comparison(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Startup benchmark: how long importing each entry point takes, measured with -X importtime.
+
+Every script is imported in a fresh interpreter (so nothing is already in sys.modules) and
+the -X importtime report is parsed into:
+- wall time of `python -c "import <script>"`, median of --repeat runs
+- cumulative import time and number of modules loaded
+- the packages the script imports directly that cost the most (e.g. langchain_google_genai)
+
+The scripts of 2.usingChain are measured too. No API keys or network are needed; only
+imports run, not main().
+
+    uv run benchmark_startup.py
+    uv run benchmark_startup.py --repeat 5 --top 8
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+ENTRY_POINTS = {
+    HERE: [
+        "main", "prompt", "prompt_generic_retriever", "search_similarity",
+        "store_embeddings", "store_embeddings_chroma_cloud",
+    ],
+    os.path.join(HERE, "..", "2.usingChain"): ["main", "main_lcel", "main_simple"],
+}
+
+
+def parse_importtime(report: str, module: str) -> tuple[int, int, dict[str, int]]:
+    """(microseconds to import module, modules loaded, microseconds per package it imports)"""
+    total = 0
+    modules = 0
+    children: dict[str, int] = {}
+    packages: dict[str, int] = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules += 1
+        # Nesting adds two spaces of indent, and a module is reported after its own imports
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            package = name.strip().split(".")[0]
+            children[package] = children.get(package, 0) + int(cumulative)
+        elif depth == 0:
+            if name.strip() == module:
+                total, packages = int(cumulative), children
+            children = {}
+    return total, modules, packages
+
+
+def measure(directory: str, module: str, repeat: int) -> dict:
+    walls = []
+    report = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=directory, capture_output=True, text=True
+        )
+        walls.append(time.perf_counter() - start)
+        report = result.stderr
+        if result.returncode != 0:
+            return {"error": report.strip().splitlines()[-1]}
+    total, modules, packages = parse_importtime(report, module)
+    return {"wall": statistics.median(walls), "imports": total / 1e6, "modules": modules, "packages": packages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of every entry point")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per script")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest top-level packages shown per script")
+    args = parser.parse_args()
+
+    print(f"{'script':<55} {'wall s':>7} {'imports s':>10} {'modules':>8}  heaviest packages")
+    for directory, modules in ENTRY_POINTS.items():
+        project = os.path.basename(os.path.normpath(directory))
+        for module in modules:
+            result = measure(directory, module, args.repeat)
+            name = f"{project}/{module}.py"
+            if "error" in result:
+                print(f"{name:<55} ❌ {result['error']}")
+                continue
+            heaviest = sorted(result["packages"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+            packages = ", ".join(f"{package} {micros / 1e6:.2f}" for package, micros in heaviest)
+            print(f"{name:<55} {result['wall']:>7.2f} {result['imports']:>10.2f} {result['modules']:>8}  {packages}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Overhead of tracing.py on the prompt_generic_retriever.py RAG chain.
+
+Every question is asked once per mode, in rotating order, over the benchmark_rag.py synthetic
+corpus with the local providers (no API keys):
+- none: no callbacks
+- tracing: TracingCallbackHandler (spans into the ring buffer, histograms and counters)
+- debug: set_debug(True) + verbose=True, as prompt_generic_retriever.py --debug (stdout discarded)
+
+The model answers instantly here, so a request is only the framework, the retrieval and the
+callbacks: the worst case for the relative overhead. The overhead is the median of the per-question
+differences with `none`, reported in microseconds, as a share of that zero-latency request and as a
+share of a request with a model of --llm-ttft-ms / --llm-tokens-per-second (like benchmark_rag.py).
+
+    uv run benchmark_tracing.py
+    uv run benchmark_tracing.py --corpus-size 5000 --questions 500 --output tracing.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+import uuid
+
+from benchmark_rag import make_corpus
+from embedding_providers import ModelVendor, load_embedding_model
+from tracing import Tracer
+
+MODES = ["none", "tracing", "debug"]
+
+
+def build_vectorstore(chunks: list[str]):
+    from langchain_chroma import Chroma
+    vectorstore = Chroma(collection_name=f"bench-tracing-{uuid.uuid4().hex[:8]}",
+                         embedding_function=load_embedding_model(ModelVendor.LOCAL))
+    vectorstore.add_texts(chunks)
+    return vectorstore
+
+
+def build_chain(vectorstore, ttft_ms: float, tokens_per_second: float, verbose: bool = False):
+    from prompt_generic_retriever import load_retrieval_qa_chain
+    # load_llm() builds the fake model from these (see local_providers.py)
+    os.environ["LOCAL_LLM_TTFT_MS"] = str(ttft_ms)
+    os.environ["LOCAL_LLM_TOKENS_PER_SECOND"] = str(tokens_per_second)
+    return load_retrieval_qa_chain(ModelVendor.LOCAL, vectorstore=vectorstore, verbose=verbose)
+
+
+def timed_invoke(chain, question: str, config=None) -> float:
+    start = time.perf_counter()
+    chain.invoke(question, config=config)
+    return time.perf_counter() - start
+
+
+def run_modes(chains: dict, questions: list[str], tracer: Tracer) -> dict[str, list[float]]:
+    """Seconds per question for each mode, the modes rotating so drift hits them alike"""
+    from langchain.globals import set_debug
+    seconds = {mode: [] for mode in MODES}
+    for index, question in enumerate(questions):
+        for offset in range(len(MODES)):
+            mode = MODES[(index + offset) % len(MODES)]
+            if mode == "none":
+                seconds[mode].append(timed_invoke(chains["none"], question))
+            elif mode == "tracing":
+                seconds[mode].append(timed_invoke(chains["none"], question, {"callbacks": [tracer.handler]}))
+            else:
+                set_debug(True)
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        seconds[mode].append(timed_invoke(chains["debug"], question))
+                finally:
+                    set_debug(False)
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overhead of the tracing callback handler on the RAG chain")
+    parser.add_argument("--corpus-size", type=int, default=2000, help="Chunks in the synthetic corpus")
+    parser.add_argument("--questions", type=int, default=300, help="Questions asked per mode")
+    parser.add_argument("--llm-ttft-ms", type=float, default=100.0, help="Model time to first token for the reference request")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=400.0, help="Model speed for the reference request")
+    parser.add_argument("--reference-questions", type=int, default=20, help="Questions to time the reference request")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    os.environ.setdefault("LOCAL_LLM_SEED", str(args.seed))
+
+    chunks, questions = make_corpus(args.corpus_size, args.questions, args.seed)
+    print(f"📚 Ingesting {len(chunks)} synthetic chunks...")
+    vectorstore = build_vectorstore(chunks)
+    chains = {"none": build_chain(vectorstore, 0, 0), "debug": build_chain(vectorstore, 0, 0, verbose=True)}
+    tracer = Tracer(capacity=4096)
+
+    # Warm up imports, the Chroma index and the chain before timing
+    run_modes(chains, questions[:5], tracer)
+    seconds = run_modes(chains, questions, tracer)
+
+    reference_chain = build_chain(vectorstore, args.llm_ttft_ms, args.llm_tokens_per_second)
+    reference = statistics.median(timed_invoke(reference_chain, question)
+                                  for question in questions[:args.reference_questions])
+
+    baseline = statistics.median(seconds["none"])
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "baseline_ms": round(baseline * 1000, 3),
+        "reference_request_ms": round(reference * 1000, 3),
+        "spans_per_request": round(tracer.buffer.recorded / (args.questions + 5)),
+        "modes": {},
+    }
+    print(f"\n⏱️  Request without callbacks: {baseline * 1000:.2f} ms (instant model), "
+          f"{reference * 1000:.1f} ms with a {args.llm_ttft_ms:g} ms TTFT model")
+    print(f"   {results['spans_per_request']} spans per request")
+    print(f"   {'mode':<8} {'p50 ms':>9} {'overhead µs':>12} {'% instant':>10} {'% reference':>12}")
+    for mode in MODES:
+        overhead = statistics.median(with_mode - without for with_mode, without in zip(seconds[mode], seconds["none"]))
+        results["modes"][mode] = {
+            "p50_ms": round(statistics.median(seconds[mode]) * 1000, 3),
+            "overhead_us": round(overhead * 1e6, 1),
+            "overhead_pct_instant": round(overhead / baseline * 100, 2),
+            "overhead_pct_reference": round(overhead / reference * 100, 3),
+        }
+        row = results["modes"][mode]
+        print(f"   {mode:<8} {row['p50_ms']:>9.3f} {row['overhead_us']:>12.1f} "
+              f"{row['overhead_pct_instant']:>9.2f}% {row['overhead_pct_reference']:>11.3f}%")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
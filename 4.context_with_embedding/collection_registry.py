@@ -0,0 +1,212 @@
+"""
+Multi-tenant collection routing with lazy loading and a bounded LRU of open collections.
+
+load_vectorstore() only knows two hardcoded directories (chroma_db_openai, chroma_db_google).
+CollectionRegistry maps tenant IDs to their own Chroma collection instead:
+- a tenant's collection is only opened the first time it is used
+- at most `max_open` collections stay open; the least recently used one is closed first
+- collections that were not used for `idle_timeout` seconds are closed as well
+So memory stays bounded no matter how many tenants exist, and hot tenants never pay the
+cold-open cost again.
+
+Tenant IDs become directory names, so they must match TENANT_ID_PATTERN. An evicted
+collection's client is only closed once no caller holds its vectorstore anymore.
+"""
+import os
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from langchain_core.embeddings import Embeddings
+
+from metadata_index import MetadataIndex, load_metadata_index
+
+if TYPE_CHECKING:
+    import chromadb
+    from langchain_chroma import Chroma
+
+DEFAULT_TENANT = "default"
+
+# Letters, digits, "_", "-" and "." (not first), so an ID can never leave the root directory
+TENANT_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,127}")
+
+
+@dataclass
+class TenantCollection:
+    """Where a tenant's chunks live"""
+    persist_directory: str
+    collection_name: str = "langchain"
+
+
+@dataclass
+class _OpenCollection:
+    client: "chromadb.api.ClientAPI"
+    vectorstore: "Chroma"
+    persist_directory: str
+    # Closes the client once the vectorstore is no longer referenced (or when called)
+    finalizer: weakref.finalize
+    last_used: float = field(default_factory=time.monotonic)
+    metadata_index: MetadataIndex | None = None
+    index_lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class CollectionRegistry:
+    """Maps tenant IDs to Chroma collections and keeps a bounded LRU of the open ones"""
+
+    def __init__(
+            self,
+            embedding_model: Embeddings,
+            vendor_name: str,
+            root_directory: str = "tenants",
+            max_open: int = 32,
+            idle_timeout: float = 600.0):
+        self.embedding_model = embedding_model
+        self.vendor_name = vendor_name
+        self.root_directory = root_directory
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        # The default tenant keeps using the original single-tenant directory
+        self._tenants: dict[str, TenantCollection] = {
+            DEFAULT_TENANT: TenantCollection(persist_directory=f"chroma_db_{vendor_name}")
+        }
+        self._open: OrderedDict[str, _OpenCollection] = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per tenant being opened, so a cold open never blocks other tenants
+        self._opening: dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def register(self, tenant_id: str, persist_directory: str, collection_name: str = "langchain"):
+        """Route a tenant to an explicit directory/collection instead of the default layout"""
+        with self._lock:
+            self._tenants[tenant_id] = TenantCollection(persist_directory, collection_name)
+
+    def tenant_collection(self, tenant_id: str) -> TenantCollection:
+        """Explicit registration wins, otherwise tenants/<tenant_id>/chroma_db_<vendor>"""
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            if not TENANT_ID_PATTERN.fullmatch(tenant_id):
+                raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+            tenant = TenantCollection(
+                persist_directory=os.path.join(self.root_directory, tenant_id, f"chroma_db_{self.vendor_name}")
+            )
+        return tenant
+
+    def get(self, tenant_id: str = DEFAULT_TENANT) -> "Chroma":
+        """Return the tenant's vectorstore, opening it on first use"""
+        return self._get_entry(tenant_id).vectorstore
+
+    def get_metadata_index(self, tenant_id: str = DEFAULT_TENANT) -> MetadataIndex:
+        """The tenant's metadata filter index, loaded together with its collection on first use"""
+        entry = self._get_entry(tenant_id)
+        if entry.metadata_index is None:
+            with entry.index_lock:
+                if entry.metadata_index is None:
+                    entry.metadata_index = load_metadata_index(entry.vectorstore, entry.persist_directory)
+        return entry.metadata_index
+
+    def _get_entry(self, tenant_id: str) -> _OpenCollection:
+        with self._lock:
+            entry = self._hit(tenant_id)
+            if entry is not None:
+                evicted = self._evict_locked()
+            else:
+                opening_lock = self._opening.setdefault(tenant_id, threading.Lock())
+        if entry is not None:
+            self._close_all(evicted)
+            return entry
+
+        with opening_lock:
+            # Another thread may have opened it while we waited
+            with self._lock:
+                entry = self._hit(tenant_id)
+                if entry is not None:
+                    return entry
+                self.misses += 1
+
+            entry = self._open_collection(tenant_id)
+
+            with self._lock:
+                self._open[tenant_id] = entry
+                self._opening.pop(tenant_id, None)
+                evicted = self._evict_locked()
+        self._close_all(evicted)
+        return entry
+
+    def _hit(self, tenant_id: str) -> _OpenCollection | None:
+        entry = self._open.get(tenant_id)
+        if entry is not None:
+            self._open.move_to_end(tenant_id)
+            entry.last_used = time.monotonic()
+            self.hits += 1
+        return entry
+
+    def _open_collection(self, tenant_id: str) -> _OpenCollection:
+        # Loaded with the first collection: chromadb takes most of the import time
+        import chromadb
+        from langchain_chroma import Chroma
+
+        tenant = self.tenant_collection(tenant_id)
+        client = chromadb.PersistentClient(path=tenant.persist_directory)
+        vectorstore = Chroma(
+            client=client,
+            collection_name=tenant.collection_name,
+            embedding_function=self.embedding_model
+        )
+        # The finalizer must not reference the vectorstore, or it would keep it alive
+        finalizer = weakref.finalize(vectorstore, _close_client, client)
+        return _OpenCollection(client=client, vectorstore=vectorstore, persist_directory=tenant.persist_directory,
+                               finalizer=finalizer)
+
+    def _evict_locked(self) -> list[_OpenCollection]:
+        """Pop idle and over-capacity collections; the caller releases them outside the lock"""
+        evicted = []
+        cutoff = time.monotonic() - self.idle_timeout
+        # The OrderedDict is in LRU order, so idle entries are at the front
+        while self._open:
+            tenant_id, entry = next(iter(self._open.items()))
+            if len(self._open) <= self.max_open and entry.last_used >= cutoff:
+                break
+            del self._open[tenant_id]
+            evicted.append(entry)
+        self.evictions += len(evicted)
+        return evicted
+
+    def close_idle(self):
+        """Close every collection that has not been used for idle_timeout seconds"""
+        with self._lock:
+            evicted = self._evict_locked()
+        self._close_all(evicted)
+
+    def close(self):
+        """Close every open collection now, even if a caller still holds its vectorstore (shutdown)"""
+        with self._lock:
+            evicted = list(self._open.values())
+            self._open.clear()
+        for entry in evicted:
+            entry.finalizer()
+
+    @property
+    def open_tenants(self) -> list[str]:
+        with self._lock:
+            return list(self._open)
+
+    @staticmethod
+    def _close_all(entries: list[_OpenCollection]):
+        """Drop the registry's references; each client closes once its vectorstore is released"""
+        for entry in entries:
+            entry.metadata_index = None
+        entries.clear()
+
+
+def _close_client(client: "chromadb.api.ClientAPI"):
+    # PersistentClient.close() releases the SQLite handles (chromadb >= 1.1).
+    # On older chromadb the client is released once the last reference goes away.
+    close = getattr(client, "close", None)
+    if close is not None:
+        close()
@@ -0,0 +1,203 @@
+"""
+Ingest-time near-duplicate detection for document chunks.
+
+RedundantFilterRetriever removes redundant chunks at query time with MMR, which means
+every request pays for a wide fetch (fetch_k candidates) plus a diversity re-rank.
+This module does the work once, while ingesting:
+
+1. Exact duplicates are collapsed by content hash before anything is embedded.
+2. MinHash signatures + LSH banding find candidate near-duplicate pairs on the text
+   without comparing every chunk against every other chunk.
+3. A candidate pair is only merged when the cosine similarity of the two embeddings
+   is above a threshold, so chunks that share wording but mean different things survive.
+
+Only one canonical chunk per cluster is stored. Its metadata keeps a pointer list
+(duplicate_ids) to the chunks that were collapsed into it.
+"""
+import hashlib
+import re
+import zlib
+from dataclasses import dataclass, field
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Mersenne prime used for the MinHash universal hash family (a * x + b) % P. With x, a and b
+# below 2**32, a * x + b < 2**64 never overflows uint64, and % P is a shift and an add.
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class DedupResult:
+    """Canonical chunks ready to be stored, plus the pointer list for every cluster"""
+    documents: list[Document]
+    embeddings: list[list[float]]
+    ids: list[str]
+    # canonical chunk id -> ids of the chunks that were collapsed into it
+    duplicates: dict[str, list[str]] = field(default_factory=dict)
+
+    @property
+    def removed_count(self) -> int:
+        return sum(len(ids) for ids in self.duplicates.values())
+
+
+def chunk_id(document: Document) -> str:
+    """Stable id derived from the chunk text, so re-running the ingest upserts instead of duplicating"""
+    return hashlib.sha1(document.page_content.encode("utf-8")).hexdigest()
+
+
+def shingles(text: str, size: int = 5) -> set[int]:
+    """Hash the character k-grams of the normalized text into 32-bit integers"""
+    normalized = _WHITESPACE.sub(" ", text.lower()).strip()
+    if len(normalized) <= size:
+        return {zlib.crc32(normalized.encode("utf-8"))}
+    return {
+        zlib.crc32(normalized[i:i + size].encode("utf-8"))
+        for i in range(len(normalized) - size + 1)
+    }
+
+
+class MinHashLSH:
+    """MinHash signatures with LSH banding to find candidate near-duplicate pairs"""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # One (a, b) pair per permutation, drawn once so every signature is comparable
+        self._a = rng.integers(1, _MAX_HASH, size=num_perm, dtype=np.uint64, endpoint=True)
+        self._b = rng.integers(0, _MAX_HASH, size=num_perm, dtype=np.uint64, endpoint=True)
+
+    def signature(self, shingle_hashes: set[int]) -> np.ndarray:
+        hashes = np.fromiter(shingle_hashes, dtype=np.uint64, count=len(shingle_hashes))
+        # (len(shingles), num_perm) matrix, then the minimum per permutation
+        products = np.outer(hashes, self._a) + self._b
+        permuted = (products & _MERSENNE_PRIME) + (products >> np.uint64(61))
+        permuted = np.where(permuted >= _MERSENNE_PRIME, permuted - _MERSENNE_PRIME, permuted)
+        return (permuted & _MAX_HASH).min(axis=0)
+
+    def candidate_pairs(self, signatures: list[np.ndarray]) -> set[tuple[int, int]]:
+        """Pairs of indices that collide in at least one band"""
+        pairs = set()
+        for band in range(self.bands):
+            start = band * self.rows
+            buckets: dict[bytes, list[int]] = {}
+            for index, signature in enumerate(signatures):
+                key = signature[start:start + self.rows].tobytes()
+                buckets.setdefault(key, []).append(index)
+            for members in buckets.values():
+                for i in range(len(members)):
+                    for j in range(i + 1, len(members)):
+                        pairs.add((members[i], members[j]))
+        return pairs
+
+    @staticmethod
+    def jaccard(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimated Jaccard similarity between two signatures"""
+        return float(np.mean(first == second))
+
+
+def _find(parents: list[int], index: int) -> int:
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
+
+
+def _cosine(first: np.ndarray, second: np.ndarray) -> float:
+    denominator = np.linalg.norm(first) * np.linalg.norm(second)
+    if denominator == 0:
+        return 0.0
+    return float(np.dot(first, second) / denominator)
+
+
+def deduplicate_documents(
+        documents: list[Document],
+        embedding_model: Embeddings,
+        jaccard_threshold: float = 0.5,
+        cosine_threshold: float = 0.95,
+        lsh: MinHashLSH | None = None) -> DedupResult:
+    """
+    Collapse exact and near-duplicate chunks, embedding every distinct chunk exactly once.
+
+    Args:
+        documents: Chunks as returned by load_documents()
+        embedding_model: Used to embed the distinct chunks (the embeddings are returned for storage)
+        jaccard_threshold: Minimum estimated text similarity for an LSH candidate pair
+        cosine_threshold: Minimum embedding similarity to confirm a candidate pair as a duplicate
+        lsh: MinHash/LSH configuration, defaults to 64 permutations in 16 bands
+
+    Returns:
+        DedupResult with the canonical chunks, their embeddings, ids and pointer lists
+    """
+    lsh = lsh or MinHashLSH()
+
+    # Step 1: exact duplicates share the same content hash, keep the first occurrence
+    unique_docs: list[Document] = []
+    unique_ids: list[str] = []
+    duplicates: dict[str, list[str]] = {}
+    seen: dict[str, str] = {}
+    for position, document in enumerate(documents):
+        doc_id = chunk_id(document)
+        if doc_id in seen:
+            # Identical chunks hash to the same id, so point at the position instead
+            duplicates.setdefault(doc_id, []).append(f"{doc_id}#{position}")
+            continue
+        seen[doc_id] = doc_id
+        unique_docs.append(document)
+        unique_ids.append(doc_id)
+
+    if not unique_docs:
+        return DedupResult(documents=[], embeddings=[], ids=[], duplicates=duplicates)
+
+    # Step 2: embed only the distinct chunks
+    embeddings = embedding_model.embed_documents([doc.page_content for doc in unique_docs])
+    vectors = np.asarray(embeddings, dtype=np.float32)
+
+    # Step 3: LSH candidates confirmed by the estimated Jaccard and the embedding cosine
+    signatures = [lsh.signature(shingles(doc.page_content)) for doc in unique_docs]
+    parents = list(range(len(unique_docs)))
+    for i, j in lsh.candidate_pairs(signatures):
+        if lsh.jaccard(signatures[i], signatures[j]) < jaccard_threshold:
+            continue
+        if _cosine(vectors[i], vectors[j]) < cosine_threshold:
+            continue
+        root_i, root_j = _find(parents, i), _find(parents, j)
+        if root_i != root_j:
+            # The earliest chunk in the source becomes the canonical representative
+            parents[max(root_i, root_j)] = min(root_i, root_j)
+
+    canonical_docs: list[Document] = []
+    canonical_embeddings: list[list[float]] = []
+    canonical_ids: list[str] = []
+    for index, document in enumerate(unique_docs):
+        root = _find(parents, index)
+        if root != index:
+            duplicates.setdefault(unique_ids[root], []).append(unique_ids[index])
+            continue
+        canonical_docs.append(document)
+        canonical_embeddings.append(embeddings[index])
+        canonical_ids.append(unique_ids[index])
+
+    # Chroma metadata values must be scalars, so the pointer list is stored as a joined string
+    for doc_id, document in zip(canonical_ids, canonical_docs):
+        pointers = duplicates.get(doc_id, [])
+        document.metadata = {
+            **document.metadata,
+            "chunk_id": doc_id,
+            "duplicate_count": len(pointers),
+            "duplicate_ids": ",".join(pointers),
+        }
+
+    return DedupResult(
+        documents=canonical_docs,
+        embeddings=canonical_embeddings,
+        ids=canonical_ids,
+        duplicates=duplicates,
+    )
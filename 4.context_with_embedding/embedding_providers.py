@@ -0,0 +1,272 @@
+"""
+Shared embedding provider registry.
+
+Every script used to carry its own ModelVendor enum and an if/elif load_embedding_model().
+This module is the single place that knows, per vendor:
+- how to construct the embedding model
+- the provider's limits: inputs per request, tokens per request, requests and tokens per minute
+- where that vendor's vectors are stored (local directory and Chroma Cloud collection)
+
+load_embedding_model() returns a BatchingEmbeddings wrapper, so callers can pass any number
+of texts: they are split into requests that respect the limits, sent in parallel, rate limited,
+and returned in the original order.
+
+ModelVendor.LOCAL is a deterministic offline provider (hash-seeded vectors of
+LOCAL_EMBEDDING_DIMENSIONS dimensions, 768 by default), so every script can be run and
+benchmarked without API keys or network access; local_providers.py has the matching chat model.
+
+load_cached_embedding_model() adds a persistent embedding cache in front of that wrapper, so a
+text is only ever sent to the vendor once. The cache lives next to this module and is shared by
+every script that imports it, including the conversation memory in 3.memory_management.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Callable
+
+from langchain_core.embeddings import Embeddings
+
+
+class ModelVendor (Enum):
+    OPENAI = "openai"
+    GOOGLE = "google"
+    LOCAL = "local"
+
+
+@dataclass(frozen=True)
+class EmbeddingProvider:
+    vendor: ModelVendor
+    factory: Callable[[], Embeddings]
+    # Maximum number of texts in one embedding request
+    max_batch_size: int
+    # Maximum total tokens across all texts of one request
+    max_tokens_per_request: int
+    # Rate limits; None means unlimited
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+    # Number of requests in flight at the same time
+    max_workers: int = 4
+    persist_directory: str | None = None
+    collection_name: str | None = None
+
+
+class DeterministicEmbeddings(Embeddings):
+    """Offline embedder: each text maps to a fixed unit vector seeded by a hash of the text"""
+
+    def __init__(self, dimensions: int = 768):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> list[float]:
+        # Expand the text hash into as many pseudo-random floats as needed
+        values = []
+        counter = 0
+        while len(values) < self.dimensions:
+            digest = hashlib.blake2b(f"{counter}:{text}".encode("utf-8"), digest_size=64).digest()
+            values.extend((byte - 127.5) / 127.5 for byte in digest)
+            counter += 1
+        values = values[:self.dimensions]
+        norm = math.sqrt(sum(value * value for value in values)) or 1.0
+        return [value / norm for value in values]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+def _openai_embeddings() -> Embeddings:
+    from langchain_openai import OpenAIEmbeddings
+    # One HTTP request per batch handed over by BatchingEmbeddings
+    return OpenAIEmbeddings(chunk_size=EMBEDDING_PROVIDERS[ModelVendor.OPENAI].max_batch_size)
+
+
+def _local_embeddings() -> Embeddings:
+    return DeterministicEmbeddings(int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "768")))
+
+
+def _google_embeddings() -> Embeddings:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(
+        model="models/text-embedding-004"
+    )
+
+
+EMBEDDING_PROVIDERS: dict[ModelVendor, EmbeddingProvider] = {
+    ModelVendor.OPENAI: EmbeddingProvider(
+        vendor=ModelVendor.OPENAI,
+        factory=_openai_embeddings,
+        max_batch_size=2048,
+        max_tokens_per_request=300_000,
+        requests_per_minute=3_000,
+        tokens_per_minute=1_000_000,
+        persist_directory="chroma_db_openai",
+        collection_name="openai_collection",
+    ),
+    ModelVendor.GOOGLE: EmbeddingProvider(
+        vendor=ModelVendor.GOOGLE,
+        factory=_google_embeddings,
+        max_batch_size=100,
+        max_tokens_per_request=20_000,
+        requests_per_minute=1_500,
+        persist_directory="chroma_db_google",
+        collection_name="google_collection",
+    ),
+    ModelVendor.LOCAL: EmbeddingProvider(
+        vendor=ModelVendor.LOCAL,
+        factory=_local_embeddings,
+        max_batch_size=1_000,
+        max_tokens_per_request=1_000_000,
+        persist_directory="chroma_db_local",
+        collection_name="local_collection",
+    ),
+}
+
+
+def register_embedding_provider(provider: EmbeddingProvider):
+    """Add or replace a vendor's provider, e.g. to tune limits for a higher API tier"""
+    EMBEDDING_PROVIDERS[provider.vendor] = provider
+
+
+def get_embedding_provider(model_vendor: ModelVendor) -> EmbeddingProvider:
+    if model_vendor not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unsupported model vendor: {model_vendor}")
+    return EMBEDDING_PROVIDERS[model_vendor]
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # tiktoken downloads the encoding on first use, so it is unavailable on a cold offline machine
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(texts: list[str]) -> list[int]:
+    """Token count per text; cl100k is exact for OpenAI and a close estimate for other vendors"""
+    encoding = _encoding()
+    if encoding is None:
+        # Roughly 4 characters per token for English text
+        return [len(text) // 4 + 1 for text in texts]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+class _RateLimiter:
+    """Token bucket refilled continuously at `per_minute` units per minute"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.available = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: int = 1):
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            time.sleep(wait)
+
+
+class BatchingEmbeddings(Embeddings):
+    """Wraps a vendor's embedding model and enforces that vendor's batching and rate limits"""
+
+    def __init__(self, provider: EmbeddingProvider, inner: Embeddings | None = None):
+        self.provider = provider
+        self.inner = inner if inner is not None else provider.factory()
+        self._request_limiter = _RateLimiter(provider.requests_per_minute) if provider.requests_per_minute else None
+        self._token_limiter = _RateLimiter(provider.tokens_per_minute) if provider.tokens_per_minute else None
+
+    def split_batches(self, texts: list[str]) -> list[tuple[int, int, int]]:
+        """(start, end, tokens) ranges that respect both the batch size and the tokens-per-request limit"""
+        token_counts = count_tokens(texts)
+        batches = []
+        start, tokens = 0, 0
+        for end, text_tokens in enumerate(token_counts):
+            if end > start and (
+                    end - start >= self.provider.max_batch_size
+                    or tokens + text_tokens > self.provider.max_tokens_per_request):
+                batches.append((start, end, tokens))
+                start, tokens = end, 0
+            tokens += text_tokens
+        if start < len(texts):
+            batches.append((start, len(texts), tokens))
+        return batches
+
+    def _throttle(self, tokens: int):
+        if self._request_limiter is not None:
+            self._request_limiter.acquire()
+        if self._token_limiter is not None:
+            self._token_limiter.acquire(tokens)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        batches = self.split_batches(texts)
+
+        def embed_batch(batch: tuple[int, int, int]) -> list[list[float]]:
+            start, end, tokens = batch
+            self._throttle(tokens)
+            return self.inner.embed_documents(texts[start:end])
+
+        if len(batches) == 1:
+            return embed_batch(batches[0])
+        # executor.map keeps the batch order, so the vectors line up with the input texts
+        with ThreadPoolExecutor(max_workers=self.provider.max_workers) as executor:
+            return [vector for vectors in executor.map(embed_batch, batches) for vector in vectors]
+
+    def embed_query(self, text: str) -> list[float]:
+        self._throttle(count_tokens([text])[0])
+        return self.inner.embed_query(text)
+
+
+def default_model_vendor() -> ModelVendor:
+    """Vendor selected with the MODEL_VENDOR environment variable (openai, google or local), google by default"""
+    return ModelVendor(os.getenv("MODEL_VENDOR", ModelVendor.GOOGLE.value).lower())
+
+
+def load_embedding_model(model_vendor: ModelVendor) -> BatchingEmbeddings:
+    return BatchingEmbeddings(get_embedding_provider(model_vendor))
+
+
+# Shared on-disk embedding cache, keyed by vendor and a hash of the text
+EMBEDDING_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache")
+
+
+def load_cached_embedding_model(model_vendor: ModelVendor, cache_dir: str = EMBEDDING_CACHE_DIR) -> Embeddings:
+    """load_embedding_model() behind a persistent cache of document and query embeddings"""
+    from langchain.embeddings import CacheBackedEmbeddings
+    from langchain.storage import LocalFileStore
+
+    return CacheBackedEmbeddings.from_bytes_store(
+        load_embedding_model(model_vendor),
+        LocalFileStore(cache_dir),
+        # Vectors of different vendors are not interchangeable
+        namespace=model_vendor.value,
+        query_embedding_cache=True,
+        key_encoder="blake2b",
+    )
+
+
+def provider_for(embedding_model: Embeddings) -> EmbeddingProvider:
+    """The provider behind an embedding model returned by load_embedding_model() or load_cached_embedding_model()"""
+    # CacheBackedEmbeddings keeps the wrapped model in underlying_embeddings
+    embedding_model = getattr(embedding_model, "underlying_embeddings", embedding_model)
+    if isinstance(embedding_model, BatchingEmbeddings):
+        return embedding_model.provider
+    raise ValueError(f"Unsupported embedding model: {embedding_model}")
@@ -0,0 +1,263 @@
+"""
+Offline chat model and embedder for load tests and benchmarks.
+
+Every pipeline in this repo talks to OpenAI or Google. MODEL_VENDOR=local swaps in:
+- FakeChatModel: a LangChain chat model with a configurable latency distribution (time to
+  first token + tokens per second), real streaming, async support, tool calling and
+  structured output (with_structured_output, response_format), and usage metadata.
+  Answers are deterministic: the same prompt always gets the same words.
+- ModelVendor.LOCAL embeddings (DeterministicEmbeddings in embedding_providers.py):
+  hash-seeded unit vectors of LOCAL_EMBEDDING_DIMENSIONS dimensions
+
+The call sites that pick a model by vendor (load_llm() / load_generative_ai_model() here,
+llm_pool.get_chat_model() in 3.memory_management, llm_provider.load_chat_model() in
+2.usingChain, my-first-langchain/main.py) return these when the vendor is local.
+
+Settings come from the environment, so a whole pipeline can be tuned without code changes:
+
+    MODEL_VENDOR=local                    use the local providers
+    LOCAL_LLM_LATENCY=lognormal           constant, uniform or lognormal
+    LOCAL_LLM_TTFT_MS=300                 mean time to first token
+    LOCAL_LLM_TOKENS_PER_SECOND=60        mean generation speed (0 = instant)
+    LOCAL_LLM_JITTER=0.3                  relative spread of both
+    LOCAL_LLM_RESPONSE_TOKENS=40          words per answer
+    LOCAL_LLM_SEED=42                     makes the latencies reproducible
+    LOCAL_EMBEDDING_DIMENSIONS=768        size of the embedding vectors
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, Literal, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, PrivateAttr
+
+_WORDS = (
+    "the a model answer context value function returns result list data code test input output "
+    "simple fact memory session vector search query token stream chain prompt system user number "
+    "string python example because therefore first second next finally also only every each"
+).split()
+
+# Characters of tool-call JSON per streamed chunk, about one token
+_ARGUMENT_CHUNK = 4
+
+
+def _estimate_tokens(messages: list[BaseMessage]) -> int:
+    return sum(len(str(message.content)) // 4 + 1 for message in messages)
+
+
+def _fill_schema(schema: dict, text: str) -> dict:
+    """Arguments that satisfy a JSON schema: every string field gets the generated text"""
+    values = {}
+    for name, field in schema.get("properties", {}).items():
+        kind = field.get("type")
+        if kind == "string":
+            values[name] = text
+        elif kind == "integer":
+            values[name] = len(text.split())
+        elif kind == "number":
+            values[name] = float(len(text.split()))
+        elif kind == "boolean":
+            values[name] = True
+        elif kind == "array":
+            values[name] = []
+        elif kind == "object":
+            values[name] = {}
+    return values
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic offline chat model with realistic latency and streaming"""
+    latency: Literal["constant", "uniform", "lognormal"] = "lognormal"
+    # Mean time to first token, in milliseconds
+    ttft_ms: float = 300.0
+    # Mean generation speed; 0 means the whole answer arrives at once
+    tokens_per_second: float = 60.0
+    # Relative spread of the time to first token and of the speed
+    jitter: float = 0.3
+    response_tokens: int = 40
+    # Canned answers, used in turn instead of generated words
+    responses: Optional[list[str]] = None
+    seed: Optional[int] = None
+    model_name: str = "fake-chat-model"
+    _rng: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "response_tokens": self.response_tokens, "responses": self.responses}
+
+    def bind_tools(self, tools: list, tool_choice: Optional[Any] = None, **kwargs: Any):
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    def get_num_tokens(self, text: str) -> int:
+        # Same estimate as the usage metadata; the default needs the transformers GPT-2 tokenizer
+        return len(text) // 4 + 1
+
+    # Latency
+
+    def _sample(self, mean: float) -> float:
+        if mean <= 0 or self.latency == "constant" or self.jitter <= 0:
+            return max(mean, 0.0)
+        with self._lock:
+            if self.latency == "uniform":
+                return mean * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+            # Lognormal with the given mean: a long tail of slow responses, like a real API
+            return mean * self._rng.lognormvariate(-self.jitter ** 2 / 2, self.jitter)
+
+    def _delays(self) -> tuple[float, float]:
+        """(seconds to the first token, seconds between tokens) for one response"""
+        first = self._sample(self.ttft_ms) / 1000
+        speed = self._sample(self.tokens_per_second)
+        return first, (1 / speed if speed > 0 else 0.0)
+
+    # Answers
+
+    def _text(self, messages: list[BaseMessage]) -> str:
+        with self._lock:
+            call = self._calls
+            self._calls += 1
+        if self.responses:
+            return self.responses[call % len(self.responses)]
+        prompt = "\n".join(str(message.content) for message in messages)
+        digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest()
+        words = random.Random(int.from_bytes(digest, "big"))
+        return " ".join(words.choice(_WORDS) for _ in range(self.response_tokens))
+
+    def _answer(self, messages: list[BaseMessage], kwargs: dict) -> tuple[str, Optional[dict]]:
+        """(content, tool call) for this request; tools and response_format get schema-shaped JSON"""
+        text = self._text(messages)
+        tools = kwargs.get("tools")
+        if tools:
+            choice = kwargs.get("tool_choice")
+            names = [tool["function"]["name"] for tool in tools]
+            tool = tools[names.index(choice)] if isinstance(choice, str) and choice in names else tools[0]
+            arguments = _fill_schema(tool["function"].get("parameters", {}), text)
+            return "", {"name": tool["function"]["name"], "args": arguments, "id": f"call_{self._calls}"}
+        response_format = kwargs.get("response_format")
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            return json.dumps(_fill_schema(response_format.model_json_schema(), text)), None
+        if isinstance(response_format, dict) and "json_schema" in response_format:
+            return json.dumps(_fill_schema(response_format["json_schema"].get("schema", {}), text)), None
+        return text, None
+
+    def _pieces(self, content: str, tool_call: Optional[dict]) -> list[str]:
+        if tool_call is not None:
+            arguments = json.dumps(tool_call["args"])
+            return [arguments[i:i + _ARGUMENT_CHUNK] for i in range(0, len(arguments), _ARGUMENT_CHUNK)]
+        words = content.split(" ")
+        return [words[0]] + [" " + word for word in words[1:]] if content else []
+
+    def _usage(self, messages: list[BaseMessage], pieces: list[str]) -> dict:
+        input_tokens = _estimate_tokens(messages)
+        return {"input_tokens": input_tokens, "output_tokens": len(pieces), "total_tokens": input_tokens + len(pieces)}
+
+    def _message(self, messages: list[BaseMessage], content: str, tool_call: Optional[dict]) -> AIMessage:
+        return AIMessage(
+            content=content,
+            tool_calls=[tool_call] if tool_call else [],
+            usage_metadata=self._usage(messages, self._pieces(content, tool_call)),
+            response_metadata={"model_name": self.model_name, "finish_reason": "stop"},
+        )
+
+    def _chunk(self, piece: str, tool_call: Optional[dict], first: bool) -> ChatGenerationChunk:
+        if tool_call is None:
+            return ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        return ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[{
+            "name": tool_call["name"] if first else None,
+            "args": piece,
+            "id": tool_call["id"] if first else None,
+            "index": 0,
+        }]))
+
+    def _final_chunk(self, messages: list[BaseMessage], pieces: list[str]) -> ChatGenerationChunk:
+        return ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            usage_metadata=self._usage(messages, pieces),
+            response_metadata={"model_name": self.model_name, "finish_reason": "stop"},
+        ))
+
+    # BaseChatModel
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        content, tool_call = self._answer(messages, kwargs)
+        first, per_token = self._delays()
+        time.sleep(first + per_token * len(self._pieces(content, tool_call)))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, content, tool_call))])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        content, tool_call = self._answer(messages, kwargs)
+        first, per_token = self._delays()
+        await asyncio.sleep(first + per_token * len(self._pieces(content, tool_call)))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, content, tool_call))])
+
+    def _stream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        content, tool_call = self._answer(messages, kwargs)
+        pieces = self._pieces(content, tool_call)
+        first, per_token = self._delays()
+        time.sleep(first)
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(per_token)
+            chunk = self._chunk(piece, tool_call, index == 0)
+            if run_manager and tool_call is None:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        yield self._final_chunk(messages, pieces)
+
+    async def _astream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        content, tool_call = self._answer(messages, kwargs)
+        pieces = self._pieces(content, tool_call)
+        first, per_token = self._delays()
+        await asyncio.sleep(first)
+        for index, piece in enumerate(pieces):
+            if index:
+                await asyncio.sleep(per_token)
+            chunk = self._chunk(piece, tool_call, index == 0)
+            if run_manager and tool_call is None:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        yield self._final_chunk(messages, pieces)
+
+
+def is_local_vendor(default: str = "openai") -> bool:
+    """Whether MODEL_VENDOR selects the local providers"""
+    return os.getenv("MODEL_VENDOR", default).lower() == "local"
+
+
+def load_local_chat_model(**overrides: Any) -> FakeChatModel:
+    """FakeChatModel configured from the LOCAL_LLM_* environment variables"""
+    seed = os.getenv("LOCAL_LLM_SEED")
+    settings = {
+        "latency": os.getenv("LOCAL_LLM_LATENCY", "lognormal"),
+        "ttft_ms": float(os.getenv("LOCAL_LLM_TTFT_MS", "300")),
+        "tokens_per_second": float(os.getenv("LOCAL_LLM_TOKENS_PER_SECOND", "60")),
+        "jitter": float(os.getenv("LOCAL_LLM_JITTER", "0.3")),
+        "response_tokens": int(os.getenv("LOCAL_LLM_RESPONSE_TOKENS", "40")),
+        "seed": int(seed) if seed else None,
+    }
+    settings.update(overrides)
+    return FakeChatModel(**settings)
+
@@ -1,29 +1,26 @@
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
-from langchain.schema import Document
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
-from enum import Enum
+from typing import TYPE_CHECKING
 import os
 
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+from embedding_providers import ModelVendor, default_model_vendor, load_embedding_model, provider_for
+
 # This is an example on how to use the embedding model to store the documents to the vectorstore 
 # and search the vectorstore for the most similar documents to the query
 # See the search_similarity.py and store_embeddings.py for a more modular approach between storing 
 # and searching
 # The prompt.py is an example on how to use the RetrievalQA chain to answer questions based on the context
+# Vendor SDKs, Chroma and the document loaders are imported where they are used, so only the
+# selected vendor's package is loaded (see benchmark_startup.py)
 
 load_dotenv()
 
-class ModelVendor (Enum):
-    OPENAI = "openai"
-    GOOGLE = "google"
-
 def load_documents(file_path):
+    from langchain_community.document_loaders import TextLoader
     loader = TextLoader(file_path)
     return loader.load_and_split(
         text_splitter=get_text_splitter()
@@ -31,23 +28,19 @@ def load_documents(file_path):
 
 def load_generative_ai_model(model_vendor: ModelVendor):
     if model_vendor == ModelVendor.OPENAI:
+        from langchain_openai import ChatOpenAI
         return ChatOpenAI(model="gpt-4o-mini", temperature=0)
     elif model_vendor == ModelVendor.GOOGLE:
+        from langchain_google_genai import ChatGoogleGenerativeAI
         return ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
-    else:
-        raise ValueError(f"Unsupported model vendor: {model_vendor}")
-
-def load_embedding_model(model_vendor: ModelVendor):
-    if model_vendor == ModelVendor.OPENAI:
-        return OpenAIEmbeddings()
-    elif model_vendor == ModelVendor.GOOGLE:
-        return GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004"
-        )
+    elif model_vendor == ModelVendor.LOCAL:
+        from local_providers import load_local_chat_model
+        return load_local_chat_model()
     else:
         raise ValueError(f"Unsupported model vendor: {model_vendor}")
 
 def get_text_splitter():
+    from langchain.text_splitter import CharacterTextSplitter
     return CharacterTextSplitter(
         separator="\n",
         chunk_size=200, 
@@ -56,13 +49,9 @@ def get_text_splitter():
 
 def store_to_chroma(
         documents: list[Document], 
-        embedding_model: Embeddings) -> Chroma:
-    if isinstance(embedding_model, OpenAIEmbeddings):
-        persist_directory = "chroma_db_openai"
-    elif isinstance(embedding_model, GoogleGenerativeAIEmbeddings):
-        persist_directory = "chroma_db_google"
-    else:
-        raise ValueError(f"Unsupported embedding model: {embedding_model}")
+        embedding_model: Embeddings) -> "Chroma":
+    from langchain_chroma import Chroma
+    persist_directory = provider_for(embedding_model).persist_directory
 
     vectorstore = Chroma.from_documents(
         documents=documents,
@@ -73,7 +62,8 @@ def store_to_chroma(
 
 def main():
     print("Hello from 4-context-with-embedding!")
-    llm = load_generative_ai_model(ModelVendor.GOOGLE)
+    model_vendor = default_model_vendor()
+    llm = load_generative_ai_model(model_vendor)
     # result = llm.invoke("What is the capital of France?")
     # print("Raw result: ", result)
     # print("Result: ", result.content)
@@ -84,7 +74,7 @@ def main():
     #     print("--------------------------------")
 
     # Initialize the embedding model
-    embedding_model = load_embedding_model(ModelVendor.GOOGLE)
+    embedding_model = load_embedding_model(model_vendor)
     emb = embedding_model.embed_query("What is the capital of France?")
     print("Embedding length: ", len(emb))
     # print("Embedding: ", emb)
@@ -0,0 +1,345 @@
+"""
+Precomputed metadata filter index for Chroma collections.
+
+Every chunk gets structured metadata at ingest time (source, chunk_index, ingested_at, tenant, tag_*).
+MetadataIndex keeps one posting bitmap per (field, value) pair of the low-cardinality fields
+(source, tenant, tag_*), where bit i is set when the i-th chunk id has that value. Every other
+field (chunk_id, chunk_index, duplicate_ids, ingested_at, ...) is kept as a sparse column of
+position -> value, sorted on demand for range operators, so a field with a distinct value per
+chunk costs O(N) instead of N bitmaps of N bits. Filter expressions use Chroma's `where` syntax,
+so the same expression can be evaluated here or handed to Chroma unchanged:
+
+    {"source": "facts.txt"}
+    {"tenant": {"$in": ["acme", "globex"]}}
+    {"$and": [{"tag_science": True}, {"ingested_at": {"$gte": 1735689600}}]}
+
+filtered_search() resolves the filter against the bitmaps BEFORE any vector is scored:
+- the matches are counted before any id is extracted
+- an empty match returns immediately without touching the vector index
+- a selective match fetches only the matching embeddings and scores exactly those chunks
+- a broad match is delegated to Chroma's own filtered query
+"""
+import bisect
+import json
+import os
+from typing import TYPE_CHECKING
+
+import numpy as np
+from langchain_core.documents import Document
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+INDEX_FILE_NAME = "metadata_index.json"
+
+# Fields that get one posting bitmap per value: few distinct values, used as filters
+BITMAP_FIELDS = ("source", "tenant")
+BITMAP_FIELD_PREFIXES = ("tag_",)
+
+_RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte"}
+
+
+def _value_key(value):
+    """Posting key of a metadata value: True == 1 in a dict, so booleans get their own keys"""
+    return ("bool", value) if isinstance(value, bool) else value
+
+
+def _stored_value(key):
+    return key[1] if isinstance(key, tuple) else key
+
+
+def _set_bit(bitset: bytearray, position: int):
+    byte = position >> 3
+    if byte >= len(bitset):
+        bitset.extend(bytes(byte + 1 - len(bitset)))
+    bitset[byte] |= 1 << (position & 7)
+
+
+def _bitmap(positions) -> int:
+    """Bitmap with these positions set, built in a byte buffer instead of one big-int OR per bit"""
+    bitset = bytearray()
+    for position in positions:
+        _set_bit(bitset, position)
+    return int.from_bytes(bitset, "little")
+
+
+def _bit_positions(bits: int) -> np.ndarray:
+    """Positions of the set bits, unpacked from the bitmap's bytes in one pass"""
+    data = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(data, bitorder="little"))
+
+
+def is_bitmap_field(field: str) -> bool:
+    return field in BITMAP_FIELDS or field.startswith(BITMAP_FIELD_PREFIXES)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class MetadataIndex:
+    """Posting bitmaps (Python ints used as bitsets) for the bitmap fields, sparse columns for the rest"""
+
+    def __init__(
+            self,
+            ids: list[str] | None = None,
+            postings: dict[str, dict] | None = None,
+            columns: dict[str, dict] | None = None):
+        self.ids: list[str] = ids or []
+        self._positions = {doc_id: position for position, doc_id in enumerate(self.ids)}
+        # field -> value -> bitmap, for the bitmap fields
+        self.postings: dict[str, dict] = postings or {}
+        # field -> position -> value, for every other field
+        self.columns: dict[str, dict[int, object]] = columns or {}
+        # field -> sorted numeric values (bitmap fields) or (values, positions) arrays (columns),
+        # used for range operators
+        self._sorted_values: dict[str, object] = {}
+
+    @classmethod
+    def build(cls, ids: list[str], metadatas: list[dict]) -> "MetadataIndex":
+        index = cls()
+        index.add(ids, metadatas)
+        return index
+
+    @classmethod
+    def from_chroma(cls, vectorstore: "Chroma") -> "MetadataIndex":
+        """Rebuild the index from the metadata already stored in a Chroma collection"""
+        stored = vectorstore.get(include=["metadatas"])
+        return cls.build(stored["ids"], stored["metadatas"])
+
+    @property
+    def all_bits(self) -> int:
+        return (1 << len(self.ids)) - 1
+
+    def add(self, ids: list[str], metadatas: list[dict]):
+        """Add chunks to the index; re-adding a known id replaces its postings"""
+        # The last metadata wins when an id is given twice
+        latest = dict(zip(ids, metadatas))
+        replaced = bytearray()
+        replaced_positions = []
+        # (field, value key) -> positions to set
+        additions: dict[tuple, list[int]] = {}
+        # field -> (position, value key) pairs for the column fields
+        column_values: dict[str, list[tuple]] = {}
+        for doc_id, metadata in latest.items():
+            position = self._positions.get(doc_id)
+            if position is None:
+                position = len(self.ids)
+                self.ids.append(doc_id)
+                self._positions[doc_id] = position
+            else:
+                _set_bit(replaced, position)
+                replaced_positions.append(position)
+            for field, value in (metadata or {}).items():
+                if is_bitmap_field(field):
+                    additions.setdefault((field, _value_key(value)), []).append(position)
+                else:
+                    column_values.setdefault(field, []).append((position, _value_key(value)))
+
+        # Clear every replaced position from the columns, and from every posting in one pass
+        for column in self.columns.values():
+            for position in replaced_positions:
+                column.pop(position, None)
+        if replaced:
+            mask = ~int.from_bytes(replaced, "little")
+            for values in self.postings.values():
+                for value in list(values):
+                    values[value] &= mask
+                    if not values[value]:
+                        del values[value]
+
+        for field, pairs in column_values.items():
+            self.columns.setdefault(field, {}).update(pairs)
+        for (field, value), positions in additions.items():
+            values = self.postings.setdefault(field, {})
+            values[value] = values.get(value, 0) | _bitmap(positions)
+        self._sorted_values.clear()
+
+    def resolve(self, where: dict | None) -> int:
+        """Evaluate a Chroma-style `where` expression to a bitmap of matching chunk positions"""
+        if not where:
+            return self.all_bits
+        bits = self.all_bits
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    bits &= self.resolve(clause)
+            elif key == "$or":
+                any_bits = 0
+                for clause in condition:
+                    any_bits |= self.resolve(clause)
+                bits &= any_bits
+            else:
+                bits &= self._resolve_field(key, condition)
+        return bits
+
+    def _resolve_field(self, field: str, condition) -> int:
+        if field in self.columns:
+            return self._resolve_column(field, self.columns[field], condition)
+        values = self.postings.get(field, {})
+        if not isinstance(condition, dict):
+            return values.get(_value_key(condition), 0)
+
+        bits = self.all_bits
+        for operator, operand in condition.items():
+            if operator == "$eq":
+                bits &= values.get(_value_key(operand), 0)
+            elif operator == "$ne":
+                bits &= self.all_bits & ~values.get(_value_key(operand), 0)
+            elif operator == "$in":
+                bits &= self._union(values, operand)
+            elif operator == "$nin":
+                bits &= self.all_bits & ~self._union(values, operand)
+            elif operator in _RANGE_OPERATORS:
+                bits &= self._resolve_range(field, values, operator, operand)
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+        return bits
+
+    def _resolve_column(self, field: str, column: dict, condition) -> int:
+        """Same operators as the bitmap fields, evaluated on a position -> value column"""
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        bits = self.all_bits
+        for operator, operand in condition.items():
+            if operator in ("$eq", "$ne"):
+                key = _value_key(operand)
+                matches = _bitmap(position for position, value in column.items() if value == key)
+            elif operator in ("$in", "$nin"):
+                keys = {_value_key(value) for value in operand}
+                matches = _bitmap(position for position, value in column.items() if value in keys)
+            elif operator in _RANGE_OPERATORS:
+                matches = self._resolve_column_range(field, column, operator, operand)
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            bits &= self.all_bits & ~matches if operator in ("$ne", "$nin") else matches
+        return bits
+
+    def _resolve_column_range(self, field: str, column: dict, operator: str, operand) -> int:
+        if field not in self._sorted_values:
+            pairs = sorted((value, position) for position, value in column.items() if _is_number(value))
+            self._sorted_values[field] = ([value for value, _ in pairs], [position for _, position in pairs])
+        sorted_values, positions = self._sorted_values[field]
+        if operator in ("$gt", "$gte"):
+            start = (bisect.bisect_right if operator == "$gt" else bisect.bisect_left)(sorted_values, operand)
+            return _bitmap(positions[start:])
+        end = (bisect.bisect_left if operator == "$lt" else bisect.bisect_right)(sorted_values, operand)
+        return _bitmap(positions[:end])
+
+    @staticmethod
+    def _union(values: dict, operands) -> int:
+        bits = 0
+        for operand in operands:
+            bits |= values.get(_value_key(operand), 0)
+        return bits
+
+    def _resolve_range(self, field: str, values: dict, operator: str, operand) -> int:
+        if field not in self._sorted_values:
+            self._sorted_values[field] = sorted(value for value in values if _is_number(value))
+        sorted_values = self._sorted_values[field]
+        # Binary search to the boundary, then only OR the bitmaps on the matching side
+        if operator in ("$gt", "$gte"):
+            start = (bisect.bisect_right if operator == "$gt" else bisect.bisect_left)(sorted_values, operand)
+            selected = sorted_values[start:]
+        else:
+            end = (bisect.bisect_left if operator == "$lt" else bisect.bisect_right)(sorted_values, operand)
+            selected = sorted_values[:end]
+        bits = 0
+        for value in selected:
+            bits |= values[value]
+        return bits
+
+    def ids_for(self, bits: int) -> list[str]:
+        """Chunk ids of the positions set in the bitmap"""
+        return [self.ids[position] for position in _bit_positions(bits)]
+
+    def save(self, path: str):
+        # JSON object keys must be strings, so every value is stored with its bitmap as a pair
+        postings = {
+            field: [[_stored_value(value), format(bits, "x")] for value, bits in values.items()]
+            for field, values in self.postings.items()
+        }
+        columns = {
+            field: [[position, _stored_value(value)] for position, value in column.items()]
+            for field, column in self.columns.items()
+        }
+        with open(path, "w") as f:
+            json.dump({"ids": self.ids, "postings": postings, "columns": columns}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "MetadataIndex":
+        with open(path, "r") as f:
+            data = json.load(f)
+        postings = {
+            field: {_value_key(value): int(bits, 16) for value, bits in pairs}
+            for field, pairs in data["postings"].items()
+        }
+        columns = {
+            field: {position: _value_key(value) for position, value in pairs}
+            for field, pairs in data.get("columns", {}).items()
+        }
+        # Files saved before the columns existed have bitmaps for every field: move those to columns
+        for field in [field for field in postings if not is_bitmap_field(field)]:
+            column = columns.setdefault(field, {})
+            for value, bits in postings.pop(field).items():
+                column.update((int(position), value) for position in _bit_positions(bits))
+        return cls(ids=data["ids"], postings=postings, columns=columns)
+
+
+def load_metadata_index(vectorstore: "Chroma", persist_directory: str) -> MetadataIndex:
+    """Load the index saved next to the Chroma files, rebuilding it from the collection if missing"""
+    path = os.path.join(persist_directory, INDEX_FILE_NAME)
+    if os.path.exists(path):
+        return MetadataIndex.load(path)
+    index = MetadataIndex.from_chroma(vectorstore)
+    index.save(path)
+    return index
+
+
+def filtered_search(
+        vectorstore: "Chroma",
+        metadata_index: MetadataIndex,
+        query: str,
+        k: int = 4,
+        filter: dict | None = None,
+        exact_scan_limit: int = 2000) -> list[tuple[Document, float]]:
+    """
+    Similarity search restricted to the chunks matching `filter`, returned with Chroma's
+    default distance (squared L2, lower is more similar) like similarity_search_with_score().
+
+    The filter is resolved against the posting bitmaps first. When it matches at most
+    `exact_scan_limit` chunks, only those chunks are fetched and scored, so a filter that
+    matches 1% of the corpus scores 1% of the vectors. Broader filters are passed to Chroma.
+    """
+    if not filter:
+        return vectorstore.similarity_search_with_score(query, k=k)
+
+    bits = metadata_index.resolve(filter)
+    if not bits:
+        return []
+
+    # Count first: the ids are only extracted for a match small enough to scan exactly
+    if bits.bit_count() > exact_scan_limit:
+        return vectorstore.similarity_search_with_score(query, k=k, filter=filter)
+
+    matching_ids = metadata_index.ids_for(bits)
+
+    candidates = vectorstore.get(ids=matching_ids, include=["embeddings", "documents", "metadatas"])
+    if not candidates["ids"]:
+        return []
+    query_vector = np.asarray(vectorstore.embeddings.embed_query(query), dtype=np.float32)
+    matrix = np.asarray(candidates["embeddings"], dtype=np.float32)
+    distances = np.sum((matrix - query_vector) ** 2, axis=1)
+
+    top = np.argsort(distances)[:k]
+    return [
+        (
+            Document(
+                id=candidates["ids"][i],
+                page_content=candidates["documents"][i],
+                metadata=candidates["metadatas"][i] or {},
+            ),
+            float(distances[i]),
+        )
+        for i in top
+    ]
@@ -1,57 +1,38 @@
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
-from langchain_google_genai import GoogleGenerativeAI
-from langchain_openai import OpenAI
-from langchain.chains import RetrievalQA
-from langchain.globals import set_debug
+import argparse
 
+from dotenv import load_dotenv
+
+from embedding_providers import ModelVendor, default_model_vendor, get_embedding_provider, load_embedding_model
 from redundant_filter_retriever import RedundantFilterRetriever
 
-set_debug(True)
-
-from dotenv import load_dotenv
-from enum import Enum
+# Chroma, RetrievalQA and the vendor SDKs are imported where they are used, so only the
+# selected vendor's package is loaded (see benchmark_startup.py)
 
 load_dotenv()
 
-class ModelVendor (Enum):
-    OPENAI = "openai"
-    GOOGLE = "google"
-
-def load_embedding_model(model_vendor: ModelVendor):
-    if model_vendor == ModelVendor.OPENAI:
-        return OpenAIEmbeddings()
-    elif model_vendor == ModelVendor.GOOGLE:
-        return GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004"
-        )
-    else:
-        raise ValueError(f"Unsupported model vendor: {model_vendor}")
-    
 def load_vectorstore(model_vendor: ModelVendor):
-    if model_vendor == ModelVendor.OPENAI:
-        return Chroma(
-            embedding_function=load_embedding_model(model_vendor),
-            persist_directory="chroma_db_openai"
-        )
-    elif model_vendor == ModelVendor.GOOGLE:
-        return Chroma(
-            embedding_function=load_embedding_model(model_vendor),
-            persist_directory="chroma_db_google"
-        )
+    from langchain_chroma import Chroma
+    return Chroma(
+        embedding_function=load_embedding_model(model_vendor),
+        persist_directory=get_embedding_provider(model_vendor).persist_directory
+    )
     
 def load_llm(model_vendor: ModelVendor):
     if model_vendor == ModelVendor.OPENAI:
+        from langchain_openai import OpenAI
         return OpenAI(
             model="gpt-4o-mini",
             temperature=0
         )
     elif model_vendor == ModelVendor.GOOGLE:
+        from langchain_google_genai import GoogleGenerativeAI
         return GoogleGenerativeAI(
             model="gemini-2.5-flash",
             temperature=0
         )
+    elif model_vendor == ModelVendor.LOCAL:
+        from local_providers import load_local_chat_model
+        return load_local_chat_model()
     else:
         raise ValueError(f"Unsupported model vendor: {model_vendor}")
     
@@ -102,6 +83,7 @@ def load_retrieval_qa_chain(model_vendor: ModelVendor):
         chroma=vectorstore
     )
 
+    from langchain.chains import RetrievalQA
     return RetrievalQA.from_chain_type(
         llm=llm,
         # chain_type="map_reduce",
@@ -112,8 +94,24 @@ def load_retrieval_qa_chain(model_vendor: ModelVendor):
         verbose=True
     )
 
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--question", type=str, help="Answer one question and exit")
+    parser.add_argument("--debug", action="store_true", help="Log every chain and LLM call (set_debug)")
+    return parser.parse_args()
+
 def main():
-    retrieval_qa_chain = load_retrieval_qa_chain(ModelVendor.GOOGLE)
+    args = parse_args()
+    if args.debug:
+        from langchain.globals import set_debug
+        set_debug(True)
+
+    retrieval_qa_chain = load_retrieval_qa_chain(default_model_vendor())
+
+    if args.question:
+        result = retrieval_qa_chain.invoke(args.question)
+        print(f"AI answer: {result['result']}")
+        return
     
     print("RAG Question-Answering System")
     print("-" * 30)
@@ -1,34 +1,15 @@
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
-from langchain_google_genai import GoogleGenerativeAI
-from langchain_openai import OpenAI
-from langchain.chains import RetrievalQA
-from langchain.globals import set_debug
+import argparse
 
-from redundant_filter_retriever_generic import RedundantFilterRetriever
+from dotenv import load_dotenv
 
-set_debug(True)
+from embedding_providers import ModelVendor, default_model_vendor, get_embedding_provider, load_embedding_model
+from redundant_filter_retriever_generic import RedundantFilterRetriever
 
-from dotenv import load_dotenv
-from enum import Enum
+# Chroma, RetrievalQA and the vendor SDKs are imported where they are used, so only the
+# selected vendor's package is loaded (see benchmark_startup.py)
 
 load_dotenv()
 
-class ModelVendor (Enum):
-    OPENAI = "openai"
-    GOOGLE = "google"
-
-def load_embedding_model(model_vendor: ModelVendor):
-    if model_vendor == ModelVendor.OPENAI:
-        return OpenAIEmbeddings()
-    elif model_vendor == ModelVendor.GOOGLE:
-        return GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004"
-        )
-    else:
-        raise ValueError(f"Unsupported model vendor: {model_vendor}")
-    
 def load_vectorstore(model_vendor: ModelVendor):
     """
     Load vectorstore - this could be any VectorStore implementation:
@@ -38,28 +19,28 @@ def load_vectorstore(model_vendor: ModelVendor):
     - Qdrant
     - Any other VectorStore that supports as_retriever() with MMR
     """
-    if model_vendor == ModelVendor.OPENAI:
-        return Chroma(
-            embedding_function=load_embedding_model(model_vendor),
-            persist_directory="chroma_db_openai"
-        )
-    elif model_vendor == ModelVendor.GOOGLE:
-        return Chroma(
-            embedding_function=load_embedding_model(model_vendor),
-            persist_directory="chroma_db_google"
-        )
+    from langchain_chroma import Chroma
+    return Chroma(
+        embedding_function=load_embedding_model(model_vendor),
+        persist_directory=get_embedding_provider(model_vendor).persist_directory
+    )
     
 def load_llm(model_vendor: ModelVendor):
     if model_vendor == ModelVendor.OPENAI:
+        from langchain_openai import OpenAI
         return OpenAI(
             model="gpt-4o-mini",
             temperature=0
         )
     elif model_vendor == ModelVendor.GOOGLE:
+        from langchain_google_genai import GoogleGenerativeAI
         return GoogleGenerativeAI(
             model="gemini-2.5-flash",
             temperature=0
         )
+    elif model_vendor == ModelVendor.LOCAL:
+        from local_providers import load_local_chat_model
+        return load_local_chat_model()
     else:
         raise ValueError(f"Unsupported model vendor: {model_vendor}")
     
@@ -99,9 +80,11 @@ def load_llm(model_vendor: ModelVendor):
 #   - It will keep doing it until all the result from vector database is exercised, then that will be the final result.
 #   - The final result can be multiple results from the previous result in the series.
 
-def load_retrieval_qa_chain(model_vendor: ModelVendor):
+def load_retrieval_qa_chain(model_vendor: ModelVendor, vectorstore=None, verbose: bool = False):
+    """RetrievalQA over the vendor's stored vectors, or over `vectorstore` (e.g. in benchmark_rag.py)"""
     llm = load_llm(model_vendor)
-    vectorstore = load_vectorstore(model_vendor)
+    if vectorstore is None:
+        vectorstore = load_vectorstore(model_vendor)
     
     # This generic redundant filter retriever works with ANY vectorstore implementation
     # that supports as_retriever() with MMR - including Chroma, Pinecone, FAISS, etc.
@@ -111,6 +94,7 @@ def load_retrieval_qa_chain(model_vendor: ModelVendor):
         vectorstore=vectorstore  # Can be ANY VectorStore implementation
     )
 
+    from langchain.chains import RetrievalQA
     return RetrievalQA.from_chain_type(
         llm=llm,
         # chain_type="map_reduce",
@@ -118,11 +102,56 @@ def load_retrieval_qa_chain(model_vendor: ModelVendor):
         # chain_type="refine",
         # retriever=vectorstore.as_retriever(k=4),  # Standard retriever
         retriever=redundant_filter_retriever,  # Generic MMR retriever
-        verbose=True
+        verbose=verbose
     )
 
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--question", type=str, help="Answer one question and exit")
+    parser.add_argument("--debug", action="store_true", help="Log every chain and LLM call (set_debug)")
+    parser.add_argument("--trace", action="store_true",
+                        help="Print span timings, tokens and retrieved documents per question (tracing.py)")
+    parser.add_argument("--export-spans", metavar="FILE", help="With --trace, write the spans as OTLP/JSON on exit")
+    parser.add_argument("--export-metrics", metavar="FILE",
+                        help="With --trace, write Prometheus metrics on exit")
+    return parser.parse_args()
+
+def ask(retrieval_qa_chain, question: str, tracer=None) -> str:
+    if tracer is None:
+        return retrieval_qa_chain.invoke(question)["result"]
+    result = retrieval_qa_chain.invoke(question, config={"callbacks": [tracer.handler]})
+    from tracing import format_trace
+    print(f"⏱️  {format_trace(tracer.last_trace())}")
+    return result["result"]
+
+def export_traces(tracer, args):
+    if args.export_spans:
+        import json
+        with open(args.export_spans, "w", encoding="utf-8") as file:
+            json.dump(tracer.otlp_json(), file)
+        print(f"💾 Spans written to {args.export_spans}")
+    if args.export_metrics:
+        with open(args.export_metrics, "w", encoding="utf-8") as file:
+            file.write(tracer.prometheus_text())
+        print(f"💾 Metrics written to {args.export_metrics}")
+
 def main():
-    retrieval_qa_chain = load_retrieval_qa_chain(ModelVendor.GOOGLE)
+    args = parse_args()
+    if args.debug:
+        from langchain.globals import set_debug
+        set_debug(True)
+    tracer = None
+    if args.trace:
+        from tracing import Tracer
+        tracer = Tracer()
+
+    retrieval_qa_chain = load_retrieval_qa_chain(default_model_vendor(), verbose=args.debug)
+
+    if args.question:
+        print(f"AI answer: {ask(retrieval_qa_chain, args.question, tracer)}")
+        if tracer:
+            export_traces(tracer, args)
+        return
     
     print("RAG Question-Answering System with Generic MMR Retriever")
     print("=" * 60)
@@ -137,6 +166,8 @@ def main():
         
         if user_question.lower() in ['quit', 'exit', 'q']:
             print("Goodbye!")
+            if tracer:
+                export_traces(tracer, args)
             break
             
         if not user_question:
@@ -144,8 +175,8 @@ def main():
             continue
             
         try:
-            result = retrieval_qa_chain.invoke(user_question)
-            print(f"\nAI answer: {result['result']}")
+            answer = ask(retrieval_qa_chain, user_question, tracer)
+            print(f"\nAI answer: {answer}")
         except Exception as e:
             print(f"Error processing question: {e}")
 
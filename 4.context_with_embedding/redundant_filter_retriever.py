@@ -1,19 +1,30 @@
 from langchain.embeddings.base import Embeddings
-from langchain_chroma import Chroma
 from langchain.schema import BaseRetriever, Document
+from langchain_core.vectorstores import VectorStore
+
+from metadata_index import MetadataIndex
 
 class RedundantFilterRetriever(BaseRetriever):
     # Let the embedding model be passed in, so it can use many different embedding models
     embeddings: Embeddings
-    chroma: Chroma
+    # A Chroma vectorstore; typed as VectorStore so importing this module does not load langchain_chroma
+    chroma: VectorStore
+    # Optional metadata filter in Chroma's where syntax, e.g. {"tenant": "acme"}
+    filter: dict | None = None
+    # Optional precomputed filter index, used to skip the vector search when nothing matches the filter
+    metadata_index: MetadataIndex | None = None
 
     def get_relevant_documents(self, query: str) -> list[Document]:
+        if self.filter and self.metadata_index is not None and not self.metadata_index.resolve(self.filter):
+            return []
         # Use the standard MMR search method that works across vectorstore implementations
         # This is more portable than using Chroma-specific max_marginal_relevance_search_by_vector
+        # Chroma applies the where filter before scoring the candidates
         return self.chroma.max_marginal_relevance_search(
             query=query,
             lambda_mult=0.8,
-            k=4  # Number of documents to return
+            k=4,  # Number of documents to return
+            filter=self.filter
         )
     
 
@@ -18,6 +18,8 @@ class RedundantFilterRetriever(BaseRetriever):
     # Accept any VectorStore implementation, not just Chroma
     embeddings: Embeddings  # Kept for backward compatibility but not directly used
     vectorstore: VectorStore
+    # Optional metadata filter, passed to the vectorstore search (e.g. {"source": "facts.txt"})
+    filter: dict | None = None
 
     def get_relevant_documents(self, query: str) -> list[Document]:
         """
@@ -36,10 +38,7 @@ class RedundantFilterRetriever(BaseRetriever):
         # This is the most portable way to get MMR functionality across implementations
         mmr_retriever = self.vectorstore.as_retriever(
             search_type="mmr",
-            search_kwargs={
-                "lambda_mult": 0.8,  # Controls diversity vs relevance (0=max diversity, 1=max relevance)
-                "k": 4  # Number of documents to return
-            }
+            search_kwargs=self._search_kwargs()
         )
         return mmr_retriever.invoke(query)
     
@@ -56,9 +55,15 @@ class RedundantFilterRetriever(BaseRetriever):
         # Use the async retriever interface
         mmr_retriever = self.vectorstore.as_retriever(
             search_type="mmr",
-            search_kwargs={
-                "lambda_mult": 0.8,
-                "k": 4
-            }
+            search_kwargs=self._search_kwargs()
         )
-        return await mmr_retriever.ainvoke(query)
\ No newline at end of file
+        return await mmr_retriever.ainvoke(query)
+
+    def _search_kwargs(self) -> dict:
+        search_kwargs = {
+            "lambda_mult": 0.8,  # Controls diversity vs relevance (0=max diversity, 1=max relevance)
+            "k": 4  # Number of documents to return
+        }
+        if self.filter:
+            search_kwargs["filter"] = self.filter
+        return search_kwargs
\ No newline at end of file
@@ -1,53 +1,65 @@
-from langchain_google_genai import GoogleGenerativeAI
-from langchain_openai import OpenAIEmbeddings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from typing import TYPE_CHECKING
+
 from langchain_core.documents import Document
-from langchain_chroma import Chroma
-from enum import Enum
 from dotenv import load_dotenv
 
+from collection_registry import CollectionRegistry
+from embedding_providers import ModelVendor, default_model_vendor, get_embedding_provider, load_embedding_model
+from metadata_index import MetadataIndex, filtered_search, load_metadata_index
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
 load_dotenv()
 
-class ModelVendor (Enum):
-    OPENAI = "openai"
-    GOOGLE = "google"
-
-# Load the embedding model
-def load_embedding_model(model_vendor: ModelVendor):
-    if model_vendor == ModelVendor.OPENAI:
-        return OpenAIEmbeddings()
-    elif model_vendor == ModelVendor.GOOGLE:
-        return GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004"
-        )
-    else:
-        raise ValueError(f"Unsupported model vendor: {model_vendor}")
+# One collection registry per vendor, created on first use
+_registries: dict[ModelVendor, CollectionRegistry] = {}
 
+def get_collection_registry(model_vendor: ModelVendor) -> CollectionRegistry:
+    if model_vendor not in _registries:
+        _registries[model_vendor] = CollectionRegistry(
+            embedding_model=load_embedding_model(model_vendor),
+            vendor_name=model_vendor.value
+        )
+    return _registries[model_vendor]
 
 # Load the vectorstore from the persist directory based on the model vendor
-def load_vectorstore(model_vendor: ModelVendor):
-    if model_vendor == ModelVendor.OPENAI:
-        return Chroma(
-            embedding_function=load_embedding_model(model_vendor),
-            persist_directory="chroma_db_openai"
-        )
-    elif model_vendor == ModelVendor.GOOGLE:
-        return Chroma(
-            embedding_function=load_embedding_model(model_vendor),
-            persist_directory="chroma_db_google"
-        )
-    else:
-        raise ValueError(f"Unsupported model vendor: {model_vendor}")
+# With a tenant_id the tenant's own collection is opened lazily and kept in the registry's LRU
+def load_vectorstore(model_vendor: ModelVendor, tenant_id: str | None = None):
+    if tenant_id is not None:
+        return get_collection_registry(model_vendor).get(tenant_id)
+    # Loaded here, it takes most of this script's import time
+    from langchain_chroma import Chroma
+    return Chroma(
+        embedding_function=load_embedding_model(model_vendor),
+        persist_directory=get_embedding_provider(model_vendor).persist_directory
+    )
     
 # Search the vectorstore for the most similar documents to the query
-def search_similarity(query: str, vectorstore: Chroma):
-    results = vectorstore.similarity_search(query, k=6)
+# The optional filter uses Chroma's where syntax, e.g. {"source": "facts.txt"} or {"tag_science": True}.
+# With a metadata index the filter is resolved before scoring, so only the matching chunks are scored.
+def search_similarity(
+        query: str,
+        vectorstore: "Chroma",
+        k: int = 6,
+        filter: dict | None = None,
+        metadata_index: MetadataIndex | None = None):
+    if filter and metadata_index is not None:
+        return [doc for doc, _ in filtered_search(vectorstore, metadata_index, query, k=k, filter=filter)]
+    results = vectorstore.similarity_search(query, k=k, filter=filter)
     return results
 
 def main():
     print("Search similarity!")
-    vectorstore = load_vectorstore(ModelVendor.GOOGLE)
-    results = search_similarity("What is interesting fact about the English language?", vectorstore)
+    model_vendor = default_model_vendor()
+    vectorstore = load_vectorstore(model_vendor)
+    metadata_index = load_metadata_index(vectorstore, get_embedding_provider(model_vendor).persist_directory)
+    results = search_similarity(
+        "What is interesting fact about the English language?",
+        vectorstore,
+        filter={"source": "facts.txt"},
+        metadata_index=metadata_index
+    )
     for result in results:
         print("Result: ", result.page_content)
         print("--------------------------------")
@@ -1,74 +1,110 @@
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
-from langchain.schema import Document
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
-from enum import Enum
+from typing import TYPE_CHECKING
 import os
+import time
 
-load_dotenv()
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+from dedup import deduplicate_documents
+from embedding_providers import default_model_vendor, load_cached_embedding_model, provider_for
+from metadata_index import INDEX_FILE_NAME, MetadataIndex, load_metadata_index
 
-class ModelVendor (Enum):
-    OPENAI = "openai"
-    GOOGLE = "google"
+load_dotenv()
 
-def load_documents(file_path):
+def load_documents(file_path, tenant: str = "default", tags: tuple[str, ...] = ()):
+    # langchain_community is only loaded when documents are actually read
+    from langchain_community.document_loaders import TextLoader
     loader = TextLoader(file_path)
-    return loader.load_and_split(
+    documents = loader.load_and_split(
         text_splitter=get_text_splitter()
     )
+    # Structured metadata on every chunk, so searches can be restricted by source, date, tenant or tag.
+    # Chroma metadata values must be scalars, so each tag becomes its own boolean field (tag_<name>).
+    ingested_at = int(time.time())
+    for chunk_index, document in enumerate(documents):
+        document.metadata.update({
+            "chunk_index": chunk_index,
+            "ingested_at": ingested_at,
+            "tenant": tenant,
+            **{f"tag_{tag}": True for tag in tags},
+        })
+    return documents
 
 # def load_generative_ai_model(model_vendor: ModelVendor):
 #     if model_vendor == ModelVendor.OPENAI:
+#         from langchain_openai import ChatOpenAI
 #         return ChatOpenAI(model="gpt-4o-mini", temperature=0)
 #     elif model_vendor == ModelVendor.GOOGLE:
+#         from langchain_google_genai import ChatGoogleGenerativeAI
 #         return ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
 #     else:
 #         raise ValueError(f"Unsupported model vendor: {model_vendor}")
 
-def load_embedding_model(model_vendor: ModelVendor):
-    if model_vendor == ModelVendor.OPENAI:
-        return OpenAIEmbeddings()
-    elif model_vendor == ModelVendor.GOOGLE:
-        return GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004"
-        )
-    else:
-        raise ValueError(f"Unsupported model vendor: {model_vendor}")
-
 def get_text_splitter():
+    from langchain.text_splitter import CharacterTextSplitter
     return CharacterTextSplitter(
         separator="\n",
         chunk_size=200, 
         chunk_overlap=0
     )
 
-def store_to_chroma(documents: list[Document], embedding_model: Embeddings) -> Chroma:
-    if isinstance(embedding_model, OpenAIEmbeddings):
-        persist_directory = "chroma_db_openai"
-    elif isinstance(embedding_model, GoogleGenerativeAIEmbeddings):
-        persist_directory = "chroma_db_google"
-    else:
-        raise ValueError(f"Unsupported embedding model: {embedding_model}")
+def store_to_chroma(
+        documents: list[Document],
+        embedding_model: Embeddings,
+        persist_directory: str | None = None) -> "Chroma":
+    # chromadb and langchain_chroma take most of the import time, so they are loaded here
+    import chromadb
+    from langchain_chroma import Chroma
 
-    vectorstore = Chroma.from_documents(
-        documents=documents,
-        embedding=embedding_model,
-        persist_directory=persist_directory
+    # A tenant's directory comes from CollectionRegistry.tenant_collection(), otherwise use the vendor default
+    if persist_directory is None:
+        persist_directory = provider_for(embedding_model).persist_directory
+
+    # Collapse near-duplicate chunks once at ingest time instead of filtering them with MMR on
+    # every query. Every distinct chunk is embedded exactly once and the embeddings are reused below.
+    dedup_result = deduplicate_documents(documents, embedding_model)
+    print(f"Dedup: {len(documents)} chunks -> {len(dedup_result.documents)} canonical "
+          f"({dedup_result.removed_count} duplicates collapsed)")
+
+    # Upsert with content-hash ids, so running this script again does not create duplicate records
+    client = chromadb.PersistentClient(path=persist_directory)
+    # "langchain" is the collection name Chroma() opens when none is given
+    collection = client.get_or_create_collection(name="langchain", embedding_function=None)
+    batch_size = client.get_max_batch_size()
+    for start in range(0, len(dedup_result.ids), batch_size):
+        end = start + batch_size
+        collection.upsert(
+            ids=dedup_result.ids[start:end],
+            embeddings=dedup_result.embeddings[start:end],
+            documents=[doc.page_content for doc in dedup_result.documents[start:end]],
+            metadatas=[doc.metadata for doc in dedup_result.documents[start:end]]
+        )
+
+    vectorstore = Chroma(
+        client=client,
+        embedding_function=embedding_model
     )
+
+    # Keep the metadata filter index next to the Chroma files in sync with what was just upserted.
+    # Without a saved index it is rebuilt from the collection, which already holds these chunks.
+    index_path = os.path.join(persist_directory, INDEX_FILE_NAME)
+    if os.path.exists(index_path):
+        metadata_index = MetadataIndex.load(index_path)
+        metadata_index.add(dedup_result.ids, [doc.metadata for doc in dedup_result.documents])
+        metadata_index.save(index_path)
+    else:
+        load_metadata_index(vectorstore, persist_directory)
     return vectorstore
 
 def main():
     print("Store embeddings to Chroma!")
     fact_doc = load_documents("facts.txt")
 
-    # Initialize the embedding model
-    embedding_model = load_embedding_model(ModelVendor.GOOGLE)
+    # Initialize the embedding model; unchanged chunks are served from the shared embedding cache
+    embedding_model = load_cached_embedding_model(default_model_vendor())
 
     # Store the documents to Chroma
     vectorstore = store_to_chroma(fact_doc, embedding_model)
@@ -1,24 +1,33 @@
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
-from langchain.schema import Document
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
-from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+import json
 import os
-import chromadb
+import random
+import threading
+import time
+import httpx
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+from dedup import deduplicate_documents
+from embedding_providers import default_model_vendor, load_cached_embedding_model, provider_for
 
 load_dotenv()
 
-class ModelVendor (Enum):
-    OPENAI = "openai"
-    GOOGLE = "google"
+# Chroma Cloud rejects writes with more records than this in a single request
+MAX_RECORDS_PER_BATCH = 300
+# Keep every request body well under the server's payload limit
+MAX_BYTES_PER_BATCH = 4 * 1024 * 1024
+# Status codes worth retrying: rate limited or a temporary server-side failure
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
 
 def load_documents(file_path):
+    # langchain_community is only loaded when documents are actually read
+    from langchain_community.document_loaders import TextLoader
     loader = TextLoader(file_path)
     return loader.load_and_split(
         text_splitter=get_text_splitter()
@@ -26,51 +35,135 @@ def load_documents(file_path):
 
 # def load_generative_ai_model(model_vendor: ModelVendor):
 #     if model_vendor == ModelVendor.OPENAI:
+#         from langchain_openai import ChatOpenAI
 #         return ChatOpenAI(model="gpt-4o-mini", temperature=0)
 #     elif model_vendor == ModelVendor.GOOGLE:
+#         from langchain_google_genai import ChatGoogleGenerativeAI
 #         return ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
 #     else:
 #         raise ValueError(f"Unsupported model vendor: {model_vendor}")
 
-def load_embedding_model(model_vendor: ModelVendor):
-    if model_vendor == ModelVendor.OPENAI:
-        return OpenAIEmbeddings()
-    elif model_vendor == ModelVendor.GOOGLE:
-        return GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004"
-        )
-    else:
-        raise ValueError(f"Unsupported model vendor: {model_vendor}")
-
 def get_text_splitter():
+    from langchain.text_splitter import CharacterTextSplitter
     return CharacterTextSplitter(
         separator="\n",
         chunk_size=200, 
         chunk_overlap=0
     )
 
-def store_to_chroma(documents: list[Document], embedding_model: Embeddings) -> Chroma:
+# One long-lived client per process. The client keeps an httpx connection pool with keep-alive,
+# so every upsert after the first one reuses an open (TLS) connection instead of reconnecting.
+_chroma_client = None
+_chroma_client_lock = threading.Lock()
+
+def get_chroma_client():
+    """Process-wide Chroma client. Set CHROMA_HOST (and CHROMA_PORT) to use a local `chroma run` server instead of Chroma Cloud"""
+    global _chroma_client
+    with _chroma_client_lock:
+        if _chroma_client is None:
+            # Loaded on first use: chromadb takes most of the import time
+            import chromadb
+            if os.getenv("CHROMA_HOST"):
+                _chroma_client = chromadb.HttpClient(
+                    host=os.getenv("CHROMA_HOST"),
+                    port=int(os.getenv("CHROMA_PORT", "8000"))
+                )
+            else:
+                _chroma_client = chromadb.CloudClient(
+                    tenant=os.getenv("CHROMA_TENANT_ID"),
+                    database=os.getenv("CHROMA_DATABASE_NAME"),
+                    api_key=os.getenv("CHROMA_API_KEY")
+                )
+        return _chroma_client
+
+def _record_size(document: str, embedding: list[float], metadata: dict) -> int:
+    """Approximate JSON size of one record: text + floats + metadata"""
+    return len(document.encode("utf-8")) + 20 * len(embedding) + len(json.dumps(metadata or {}))
+
+def iter_batches(
+        ids: list[str],
+        embeddings: list[list[float]],
+        documents: list[str],
+        metadatas: list[dict],
+        max_records: int = MAX_RECORDS_PER_BATCH,
+        max_bytes: int = MAX_BYTES_PER_BATCH):
+    """Split records into batches bounded by both record count and approximate payload size"""
+    start = 0
+    size = 0
+    for end in range(len(ids)):
+        record_size = _record_size(documents[end], embeddings[end], metadatas[end])
+        if end > start and (end - start >= max_records or size + record_size > max_bytes):
+            yield ids[start:end], embeddings[start:end], documents[start:end], metadatas[start:end]
+            start, size = end, 0
+        size += record_size
+    if start < len(ids):
+        yield ids[start:], embeddings[start:], documents[start:], metadatas[start:]
+
+def is_transient_error(error: Exception) -> bool:
+    """Connection problems, timeouts, rate limiting and 5xx responses are worth retrying"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    code = getattr(error, "code", None)
+    if callable(code) and code() in TRANSIENT_STATUS_CODES:
+        return True
+    # chromadb re-raises unknown HTTP errors as a plain Exception while handling the HTTPStatusError
+    status_error = error if isinstance(error, httpx.HTTPStatusError) else error.__context__
+    return isinstance(status_error, httpx.HTTPStatusError) and status_error.response.status_code in TRANSIENT_STATUS_CODES
+
+def upsert_with_retry(collection, batch, max_retries: int = 5, base_delay: float = 0.5):
+    """Upsert one batch, retrying transient failures with exponential backoff and jitter"""
+    ids, embeddings, documents, metadatas = batch
+    for attempt in range(max_retries + 1):
+        try:
+            collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+            return len(ids)
+        except Exception as e:
+            if attempt == max_retries or not is_transient_error(e):
+                raise
+            delay = base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"Upsert of {len(ids)} records failed ({e}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+def upsert_in_batches(
+        collection,
+        ids: list[str],
+        embeddings: list[list[float]],
+        documents: list[str],
+        metadatas: list[dict],
+        max_workers: int = 8,
+        max_records: int = MAX_RECORDS_PER_BATCH,
+        max_bytes: int = MAX_BYTES_PER_BATCH) -> int:
+    """Send size-bounded batches concurrently over the shared client; returns the number of records written"""
+    batches = iter_batches(ids, embeddings, documents, metadatas, max_records, max_bytes)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return sum(executor.map(lambda batch: upsert_with_retry(collection, batch), batches))
+
+def store_to_chroma(documents: list[Document], embedding_model: Embeddings) -> "Chroma":
+    from langchain_chroma import Chroma
+
     # Determine collection name
-    if isinstance(embedding_model, OpenAIEmbeddings):
-        collection_name = "openai_collection"
-    elif isinstance(embedding_model, GoogleGenerativeAIEmbeddings):
-        collection_name = "google_collection"
-    else:
-        raise ValueError(f"Unsupported embedding model: {embedding_model}")
-
-    # Create Chroma Cloud client
-    chroma_client = chromadb.CloudClient(
-        tenant=os.getenv("CHROMA_TENANT_ID"),
-        database=os.getenv("CHROMA_DATABASE_NAME"),
-        api_key=os.getenv("CHROMA_API_KEY")
+    collection_name = provider_for(embedding_model).collection_name
+
+    # Reuse the process-wide client instead of creating a new one per call
+    chroma_client = get_chroma_client()
+    collection = chroma_client.get_or_create_collection(name=collection_name, embedding_function=None)
+
+    # Embed each distinct chunk once, then upsert with content-hash ids in concurrent batches
+    dedup_result = deduplicate_documents(documents, embedding_model)
+    written = upsert_in_batches(
+        collection,
+        ids=dedup_result.ids,
+        embeddings=dedup_result.embeddings,
+        documents=[doc.page_content for doc in dedup_result.documents],
+        metadatas=[doc.metadata for doc in dedup_result.documents]
     )
-    
+    print(f"Upserted {written} chunks ({dedup_result.removed_count} duplicates collapsed)")
+
     # Create Chroma vectorstore with cloud client
-    vectorstore = Chroma.from_documents(
-        documents=documents,
-        embedding=embedding_model,
+    vectorstore = Chroma(
         client=chroma_client,
-        collection_name=collection_name
+        collection_name=collection_name,
+        embedding_function=embedding_model
     )
     return vectorstore
 
@@ -78,8 +171,8 @@ def main():
     print("Store embeddings to Chroma!")
     fact_doc = load_documents("facts.txt")
 
-    # Initialize the embedding model
-    embedding_model = load_embedding_model(ModelVendor.GOOGLE)
+    # Initialize the embedding model; unchanged chunks are served from the shared embedding cache
+    embedding_model = load_cached_embedding_model(default_model_vendor())
 
     # Store the documents to Chroma
     vectorstore = store_to_chroma(fact_doc, embedding_model)
@@ -0,0 +1,153 @@
+"""
+Tests for the batching and retry helpers of store_embeddings_chroma_cloud.py, driven by a fake
+collection that fails a given number of times before it accepts an upsert. They check that:
+- iter_batches() respects the record count and payload size limits exactly at their boundaries
+- a single record larger than max_bytes is sent on its own instead of being dropped or looping
+- connection errors, 429 and 5xx responses are retried until the upsert succeeds
+- a 400 response, or any other non-transient error, is raised after a single attempt
+
+No Chroma server or API key is needed.
+
+    uv run test_store_embeddings_chroma_cloud.py
+"""
+import httpx
+
+from store_embeddings_chroma_cloud import _record_size, iter_batches, upsert_in_batches, upsert_with_retry
+
+
+class FakeCollection:
+    """Raises the queued errors one per upsert call, then records the upserts"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.attempts = 0
+        self.upserted: list[str] = []
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        self.upserted.extend(ids)
+
+
+class FakeChromaError(Exception):
+    """Like chromadb's ChromaError: the HTTP status is exposed through code()"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+    def code(self) -> int:
+        return self.status_code
+
+
+def make_records(count: int, document: str = "fact"):
+    ids = [f"chunk-{i}" for i in range(count)]
+    embeddings = [[0.5, 0.25] for _ in range(count)]
+    documents = [document for _ in range(count)]
+    metadatas = [{"chunk_index": i} for i in range(count)]
+    return ids, embeddings, documents, metadatas
+
+
+def status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://localhost:8000/api/v2/upsert")
+    response = httpx.Response(status_code, request=request)
+    return httpx.HTTPStatusError(f"status {status_code}", request=request, response=response)
+
+
+def chroma_http_error(status_code: int) -> Exception:
+    """What chromadb raises for an HTTP error it has no type for: a plain Exception with the HTTPStatusError as context"""
+    try:
+        try:
+            raise status_error(status_code)
+        except httpx.HTTPStatusError:
+            raise Exception(f"chroma error {status_code}")
+    except Exception as e:
+        return e
+
+
+def batch_sizes(batches) -> list[int]:
+    return [len(ids) for ids, _, _, _ in batches]
+
+
+def test_batches_split_at_max_records():
+    assert batch_sizes(iter_batches(*make_records(7), max_records=3)) == [3, 3, 1]
+    assert batch_sizes(iter_batches(*make_records(6), max_records=3)) == [3, 3]
+    assert batch_sizes(iter_batches(*make_records(0), max_records=3)) == []
+
+
+def test_batches_split_at_max_bytes():
+    records = make_records(5)
+    ids, embeddings, documents, metadatas = records
+    size = _record_size(documents[0], embeddings[0], metadatas[0])
+    # Two records fill a batch exactly; a third would go over
+    assert batch_sizes(iter_batches(*records, max_bytes=2 * size)) == [2, 2, 1]
+    assert batch_sizes(iter_batches(*records, max_bytes=2 * size - 1)) == [1, 1, 1, 1, 1]
+
+
+def test_batches_keep_every_record_in_order():
+    records = make_records(10)
+    batches = list(iter_batches(*records, max_records=4))
+    for position, column in enumerate(records):
+        assert [value for batch in batches for value in batch[position]] == column
+
+
+def test_oversized_record_gets_its_own_batch():
+    ids, embeddings, documents, metadatas = make_records(3)
+    documents[1] = "x" * 10_000
+    small = _record_size(documents[0], embeddings[0], metadatas[0])
+    batches = list(iter_batches(ids, embeddings, documents, metadatas, max_bytes=4 * small))
+    assert [batch[0] for batch in batches] == [["chunk-0"], ["chunk-1"], ["chunk-2"]]
+
+
+def test_transient_errors_are_retried_until_the_upsert_succeeds():
+    errors = [
+        httpx.ConnectError("connection refused"),
+        status_error(503),
+        chroma_http_error(502),
+        FakeChromaError(429),
+    ]
+    collection = FakeCollection(errors)
+    batch = next(iter_batches(*make_records(3)))
+    assert upsert_with_retry(collection, batch, base_delay=0) == 3
+    assert collection.attempts == len(errors) + 1
+    assert collection.upserted == ["chunk-0", "chunk-1", "chunk-2"]
+
+
+def test_client_errors_are_not_retried():
+    for error in (status_error(400), chroma_http_error(400), FakeChromaError(400), ValueError("bad metadata")):
+        collection = FakeCollection([error])
+        try:
+            upsert_with_retry(collection, next(iter_batches(*make_records(1))), base_delay=0)
+        except Exception as e:
+            assert e is error
+        else:
+            raise AssertionError(f"expected {error!r} to be raised")
+        assert collection.attempts == 1
+        assert collection.upserted == []
+
+
+def test_retries_give_up_after_max_retries():
+    collection = FakeCollection([httpx.ConnectError("connection refused")] * 3)
+    try:
+        upsert_with_retry(collection, next(iter_batches(*make_records(1))), max_retries=2, base_delay=0)
+    except httpx.ConnectError:
+        pass
+    else:
+        raise AssertionError("expected the last ConnectError to be raised")
+    assert collection.attempts == 3
+
+
+def test_upsert_in_batches_counts_every_record():
+    collection = FakeCollection()
+    records = make_records(25)
+    assert upsert_in_batches(collection, *records, max_workers=4, max_records=4) == 25
+    assert sorted(collection.upserted) == sorted(records[0])
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+    print(f"\n{len(tests)} tests passed")
@@ -0,0 +1,379 @@
+"""
+Low-overhead tracing for chains, retrievers and LLM calls.
+
+set_debug(True) and verbose=True print every payload to stdout: expensive, and they give no
+numbers. TracingCallbackHandler records one span per run instead:
+
+- span timings (perf_counter_ns), the run's name and kind (chain, retriever, llm), its parent
+  and trace, errors
+- LLM input/output tokens (usage_metadata or the provider's token_usage), cache hits (with
+  TracedCache in front of the LLM cache) and the number of retrieved documents
+- spans go into SpanBuffer, a ring buffer of preallocated arrays: recording a span is a few
+  array stores, nothing is copied or formatted on the request path, memory stays bounded
+- per-(kind, name) latency histograms and counters are kept cumulatively for Prometheus
+
+Export:
+- Tracer.otlp_json(): the buffered spans as OTLP/JSON (OpenTelemetry), e.g. to POST to a
+  collector's /v1/traces endpoint
+- Tracer.prometheus_text(): histograms and counters in the Prometheus text exposition format
+
+    tracer = Tracer(capacity=4096)
+    set_llm_cache(TracedCache(InMemoryCache(), tracer))      # optional, counts cache hits
+    chain.invoke(question, config={"callbacks": [tracer.handler]})
+    print(tracer.prometheus_text())
+
+See benchmark_tracing.py for the overhead per request.
+"""
+import bisect
+import itertools
+import threading
+import time
+from array import array
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import BaseCallbackHandler
+
+CHAIN, RETRIEVER, LLM = 0, 1, 2
+KIND_NAMES = ("chain", "retriever", "llm")
+# Span flags
+ERROR, CACHE_HIT = 1, 2
+
+# Latency histogram buckets in seconds, from sub-millisecond chain steps to slow LLM calls
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# The LLM run in progress in this context, so TracedCache can mark it as a cache hit
+_current_llm_run: ContextVar[Optional[UUID]] = ContextVar("current_llm_run", default=None)
+
+
+class SpanBuffer:
+    """The last `capacity` spans, stored column-wise in arrays allocated up front"""
+
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self.names: list[Optional[str]] = [None] * capacity
+        self.span_ids: list[Optional[UUID]] = [None] * capacity
+        self.parent_ids: list[Optional[UUID]] = [None] * capacity
+        self.trace_ids: list[Optional[UUID]] = [None] * capacity
+        self.kinds = array("b", bytes(capacity))
+        self.flags = array("b", bytes(capacity))
+        self.start_ns = array("q", bytes(8 * capacity))
+        self.end_ns = array("q", bytes(8 * capacity))
+        self.input_tokens = array("q", bytes(8 * capacity))
+        self.output_tokens = array("q", bytes(8 * capacity))
+        self.documents = array("q", bytes(8 * capacity))
+        # next() on itertools.count is atomic, so concurrent writers get distinct slots
+        self._sequence = itertools.count()
+        self.recorded = 0
+
+    def record(self, kind: int, name: str, span_id: UUID, parent_id: Optional[UUID], trace_id: UUID,
+               start_ns: int, end_ns: int, flags: int = 0, input_tokens: int = 0, output_tokens: int = 0,
+               documents: int = 0):
+        sequence = next(self._sequence)
+        slot = sequence % self.capacity
+        self.kinds[slot] = kind
+        self.names[slot] = name
+        self.span_ids[slot] = span_id
+        self.parent_ids[slot] = parent_id
+        self.trace_ids[slot] = trace_id
+        self.start_ns[slot] = start_ns
+        self.end_ns[slot] = end_ns
+        self.flags[slot] = flags
+        self.input_tokens[slot] = input_tokens
+        self.output_tokens[slot] = output_tokens
+        self.documents[slot] = documents
+        self.recorded = max(self.recorded, sequence + 1)
+
+    def spans(self) -> list[dict]:
+        """The buffered spans, oldest first"""
+        count = min(self.recorded, self.capacity)
+        first = self.recorded - count
+        spans = []
+        for sequence in range(first, self.recorded):
+            slot = sequence % self.capacity
+            spans.append({
+                "kind": KIND_NAMES[self.kinds[slot]],
+                "name": self.names[slot],
+                "span_id": self.span_ids[slot],
+                "parent_id": self.parent_ids[slot],
+                "trace_id": self.trace_ids[slot],
+                "start_ns": self.start_ns[slot],
+                "end_ns": self.end_ns[slot],
+                "error": bool(self.flags[slot] & ERROR),
+                "cache_hit": bool(self.flags[slot] & CACHE_HIT),
+                "input_tokens": self.input_tokens[slot],
+                "output_tokens": self.output_tokens[slot],
+                "documents": self.documents[slot],
+            })
+        return spans
+
+
+class Tracer:
+    """Span buffer, cumulative metrics and the callback handler that feeds them"""
+
+    def __init__(self, capacity: int = 4096, service_name: str = "context-with-embedding"):
+        self.buffer = SpanBuffer(capacity)
+        self.service_name = service_name
+        # perf_counter_ns() + offset = Unix time in nanoseconds
+        self._unix_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self._lock = threading.Lock()
+        # (kind, name) -> bucket counts (+ overflow), sum of seconds, count
+        self._histograms: dict[tuple[int, str], list] = {}
+        self.counters: dict[str, int] = defaultdict(int)
+        self.handler = TracingCallbackHandler(self)
+
+    def _observe(self, kind: int, name: str, seconds: float, flags: int, input_tokens: int, output_tokens: int,
+                 documents: int):
+        key = (kind, name)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(DURATION_BUCKETS) + 1), 0.0, 0]
+            histogram[0][bisect.bisect_left(DURATION_BUCKETS, seconds)] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            if flags & ERROR:
+                self.counters[f"errors:{KIND_NAMES[kind]}"] += 1
+            if kind == LLM:
+                self.counters["llm_input_tokens"] += input_tokens
+                self.counters["llm_output_tokens"] += output_tokens
+            elif kind == RETRIEVER:
+                self.counters["retrieved_documents"] += documents
+
+    def count_cache_lookup(self, hit: bool):
+        with self._lock:
+            self.counters["llm_cache_hits" if hit else "llm_cache_misses"] += 1
+        if hit:
+            run_id = _current_llm_run.get()
+            if run_id is not None:
+                self.handler.mark_cache_hit(run_id)
+
+    def last_trace(self) -> list[dict]:
+        """Spans of the most recently finished trace (its root ends last)"""
+        spans = self.buffer.spans()
+        if not spans:
+            return []
+        trace_id = spans[-1]["trace_id"]
+        return [span for span in spans if span["trace_id"] == trace_id]
+
+    # Export
+
+    def otlp_json(self) -> dict:
+        """Buffered spans as an OTLP/JSON ExportTraceServiceRequest"""
+        spans = []
+        for span in self.buffer.spans():
+            attributes = [{"key": "langchain.kind", "value": {"stringValue": span["kind"]}}]
+            if span["kind"] == "llm":
+                attributes += [
+                    {"key": "gen_ai.usage.input_tokens", "value": {"intValue": str(span["input_tokens"])}},
+                    {"key": "gen_ai.usage.output_tokens", "value": {"intValue": str(span["output_tokens"])}},
+                    {"key": "langchain.cache_hit", "value": {"boolValue": span["cache_hit"]}},
+                ]
+            elif span["kind"] == "retriever":
+                attributes.append({"key": "retrieval.documents", "value": {"intValue": str(span["documents"])}})
+            otlp_span = {
+                "traceId": span["trace_id"].hex,
+                # The random half of the run id (LangChain's run ids may start with a timestamp)
+                "spanId": span["span_id"].hex[16:],
+                "name": span["name"],
+                # SPAN_KIND_CLIENT for calls to the model provider, SPAN_KIND_INTERNAL otherwise
+                "kind": 3 if span["kind"] == "llm" else 1,
+                "startTimeUnixNano": str(span["start_ns"] + self._unix_offset_ns),
+                "endTimeUnixNano": str(span["end_ns"] + self._unix_offset_ns),
+                "attributes": attributes,
+                # STATUS_CODE_ERROR / STATUS_CODE_UNSET
+                "status": {"code": 2 if span["error"] else 0},
+            }
+            if span["parent_id"] is not None:
+                otlp_span["parentSpanId"] = span["parent_id"].hex[16:]
+            spans.append(otlp_span)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]}
+
+    def prometheus_text(self) -> str:
+        """Histograms and counters in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = {key: (list(buckets), total, count) for key, (buckets, total, count) in self._histograms.items()}
+            counters = dict(self.counters)
+        lines = [
+            "# HELP langchain_span_duration_seconds Duration of chain, retriever and LLM runs",
+            "# TYPE langchain_span_duration_seconds histogram",
+        ]
+        for (kind, name), (buckets, total, count) in sorted(histograms.items()):
+            labels = f'kind="{KIND_NAMES[kind]}",name="{_escape(name)}"'
+            cumulative = 0
+            for bound, bucket in zip(DURATION_BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f'langchain_span_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'langchain_span_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"langchain_span_duration_seconds_sum{{{labels}}} {total}")
+            lines.append(f"langchain_span_duration_seconds_count{{{labels}}} {count}")
+        lines += [
+            "# HELP langchain_llm_tokens_total LLM tokens by direction",
+            "# TYPE langchain_llm_tokens_total counter",
+            f'langchain_llm_tokens_total{{direction="input"}} {counters.get("llm_input_tokens", 0)}',
+            f'langchain_llm_tokens_total{{direction="output"}} {counters.get("llm_output_tokens", 0)}',
+            "# HELP langchain_llm_cache_lookups_total LLM cache lookups (TracedCache)",
+            "# TYPE langchain_llm_cache_lookups_total counter",
+            f'langchain_llm_cache_lookups_total{{result="hit"}} {counters.get("llm_cache_hits", 0)}',
+            f'langchain_llm_cache_lookups_total{{result="miss"}} {counters.get("llm_cache_misses", 0)}',
+            "# HELP langchain_retrieved_documents_total Documents returned by retrievers",
+            "# TYPE langchain_retrieved_documents_total counter",
+            f"langchain_retrieved_documents_total {counters.get('retrieved_documents', 0)}",
+            "# HELP langchain_span_errors_total Runs that raised",
+            "# TYPE langchain_span_errors_total counter",
+        ]
+        for kind in KIND_NAMES:
+            lines.append(f'langchain_span_errors_total{{kind="{kind}"}} {counters.get(f"errors:{kind}", 0)}')
+        return "\n".join(lines) + "\n"
+
+
+def format_trace(spans: list[dict]) -> str:
+    """One line per trace: retriever and LLM spans with their counts, then the root"""
+    parts = []
+    for span in spans:
+        milliseconds = (span["end_ns"] - span["start_ns"]) / 1e6
+        if span["kind"] == "retriever":
+            parts.append(f"{span['name']} {milliseconds:.1f} ms ({span['documents']} docs)")
+        elif span["kind"] == "llm":
+            cached = ", cached" if span["cache_hit"] else ""
+            parts.append(f"{span['name']} {milliseconds:.1f} ms "
+                         f"({span['input_tokens']}→{span['output_tokens']} tokens{cached})")
+    roots = [span for span in spans if span["parent_id"] is None]
+    if roots:
+        parts.append(f"total {(roots[-1]['end_ns'] - roots[-1]['start_ns']) / 1e6:.1f} ms")
+    return " · ".join(parts)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _token_usage(response) -> tuple[int, int]:
+    """(input, output) tokens of an LLMResult: usage_metadata of the messages, else llm_output"""
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not (input_tokens or output_tokens) and response.llm_output:
+        usage = response.llm_output.get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Turns callback events into spans; does not look at inputs or outputs beyond counts"""
+
+    # Called directly, also from async runs: no executor hop and the caller's context is kept
+    run_inline = True
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        # run_id -> [kind, name, parent_id, trace_id, start_ns, flags]
+        self._runs: dict[UUID, list] = {}
+
+    def _start(self, kind: int, serialized: Optional[dict], run_id: UUID, parent_run_id: Optional[UUID],
+               name: Optional[str]):
+        parent = self._runs.get(parent_run_id) if parent_run_id is not None else None
+        if name is None:
+            name = (serialized or {}).get("name") or ((serialized or {}).get("id") or ["unknown"])[-1]
+        trace_id = parent[3] if parent is not None else (parent_run_id or run_id)
+        self._runs[run_id] = [kind, name, parent_run_id, trace_id, time.perf_counter_ns(), 0]
+
+    def _end(self, run_id: UUID, flags: int = 0, input_tokens: int = 0, output_tokens: int = 0, documents: int = 0):
+        end_ns = time.perf_counter_ns()
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        kind, name, parent_id, trace_id, start_ns, run_flags = run
+        flags |= run_flags
+        self.tracer.buffer.record(kind, name, run_id, parent_id, trace_id, start_ns, end_ns, flags,
+                                  input_tokens, output_tokens, documents)
+        self.tracer._observe(kind, name, (end_ns - start_ns) / 1e9, flags, input_tokens, output_tokens, documents)
+
+    def mark_cache_hit(self, run_id: UUID):
+        run = self._runs.get(run_id)
+        if run is not None:
+            run[5] |= CACHE_HIT
+
+    # Chains
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                       name: Optional[str] = None, **kwargs: Any):
+        self._start(CHAIN, serialized, run_id, parent_run_id, name)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, ERROR)
+
+    # Retrievers
+
+    def on_retriever_start(self, serialized, query, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                           name: Optional[str] = None, **kwargs: Any):
+        self._start(RETRIEVER, serialized, run_id, parent_run_id, name)
+
+    def on_retriever_end(self, documents, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, ERROR)
+
+    # LLMs and chat models
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                     name: Optional[str] = None, **kwargs: Any):
+        self._start(LLM, serialized, run_id, parent_run_id, name)
+        _current_llm_run.set(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                            name: Optional[str] = None, **kwargs: Any):
+        self._start(LLM, serialized, run_id, parent_run_id, name)
+        _current_llm_run.set(run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        input_tokens, output_tokens = _token_usage(response)
+        self._end(run_id, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, ERROR)
+
+
+class TracedCache(BaseCache):
+    """An LLM cache that reports its hits and misses to a Tracer"""
+
+    def __init__(self, inner: BaseCache, tracer: Tracer):
+        self.inner = inner
+        self.tracer = tracer
+
+    def lookup(self, prompt: str, llm_string: str):
+        result = self.inner.lookup(prompt, llm_string)
+        self.tracer.count_cache_lookup(result is not None)
+        return result
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        self.inner.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.inner.clear(**kwargs)
+
+    async def alookup(self, prompt: str, llm_string: str):
+        result = await self.inner.alookup(prompt, llm_string)
+        self.tracer.count_cache_lookup(result is not None)
+        return result
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val) -> None:
+        await self.inner.aupdate(prompt, llm_string, return_val)
+
+    async def aclear(self, **kwargs: Any) -> None:
+        await self.inner.aclear(**kwargs)
@@ -4,7 +4,7 @@ This demonstrates the portability of the generic implementation.
 """
 
 from redundant_filter_retriever_generic import RedundantFilterRetriever
-from langchain_openai import OpenAIEmbeddings
+from embedding_providers import default_model_vendor, load_embedding_model
 from langchain_core.documents import Document
 
 # Example documents for testing
@@ -23,7 +23,7 @@ def example_with_chroma():
     print("=== Example with Chroma ===")
     
     # Create Chroma vectorstore
-    embeddings = OpenAIEmbeddings()
+    embeddings = load_embedding_model(default_model_vendor())
     vectorstore = Chroma.from_documents(sample_docs, embeddings)
     
     # Create generic retriever
@@ -49,7 +49,7 @@ def example_with_faiss():
     print("=== Example with FAISS ===")
     
     # Create FAISS vectorstore
-    embeddings = OpenAIEmbeddings()
+    embeddings = load_embedding_model(default_model_vendor())
     vectorstore = FAISS.from_documents(sample_docs, embeddings)
     
     # Create generic retriever - same code as Chroma!
@@ -108,8 +108,8 @@ def demonstrate_portability():
     print()
 
 if __name__ == "__main__":
-    # Note: These examples require OpenAI API key for embeddings
-    # You can run them individually if you have the required dependencies
+    # Note: These examples embed with the MODEL_VENDOR vendor (see embedding_providers.py);
+    # MODEL_VENDOR=local needs no API key. You can run them individually if you have the required dependencies
     
     demonstrate_portability()
     
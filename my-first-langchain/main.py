@@ -1,25 +1,39 @@
 import os
+import sys
 from dotenv import load_dotenv
-from langchain_openai import OpenAI
 
 # Load environment variables from .env file
 load_dotenv()
 
+# MODEL_VENDOR=local uses the offline fake chat model from 4.context_with_embedding/local_providers.py
+LOCAL_PROVIDERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "4.context_with_embedding")
+if LOCAL_PROVIDERS_DIR not in sys.path:
+    sys.path.append(LOCAL_PROVIDERS_DIR)
+
+from local_providers import is_local_vendor, load_local_chat_model  # noqa: E402
+
+def load_llm():
+    if is_local_vendor():
+        return load_local_chat_model()
+    from langchain_openai import OpenAI
+    return OpenAI(model="gpt-3.5-turbo-instruct", temperature=0.2)
+
 def main():
     print("Hello from my-first-langchain!")
     
-    # Check if OpenAI API key is set
+    # Check if OpenAI API key is set (the local vendor needs none)
     api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+    if not api_key and not is_local_vendor():
         print("⚠️  OpenAI API key not found!")
         print("Please set your OPENAI_API_KEY environment variable:")
         print("export OPENAI_API_KEY='your-api-key-here'")
         return
     
     try:
-        llm = OpenAI(model="gpt-3.5-turbo-instruct", temperature=0.2)
+        llm = load_llm()
         response = llm.invoke("What is the capital of France?")
-        print(f"🤖 AI Response: {response}")
+        # The completion model returns a string, a chat model a message
+        print(f"🤖 AI Response: {getattr(response, 'content', response)}")
     except Exception as e:
         print(f"❌ Error: {e}")
 